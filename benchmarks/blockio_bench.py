@@ -0,0 +1,72 @@
+"""
+Random page reads from one block file with a growing number of io threads,
+the old locked seek + read against BlockIO's pread.
+
+    python benchmarks/blockio_bench.py [--pages 50000] [--reads 100000] [--threads 1,2,4,8,16]
+
+Drop the page cache first (echo 3 > /proc/sys/vm/drop_caches) to measure the disk instead of memory.
+"""
+import argparse
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from threading import Lock
+
+from xxdb.engine.disk.blockio import BlockIO
+
+PAGE_SIZE = 2048
+
+
+class LockedBlockIO:
+    """the seek + read BlockIO of xxdb 2.3.0"""
+
+    def __init__(self, fpath: Path, page_size: int):
+        self._page_size = page_size
+        self._fio = fpath.open('r+b', buffering=0)
+        self._lock = Lock()
+
+    def read_page(self, pageid: int) -> bytes:
+        with self._lock:
+            self._fio.seek(BlockIO.META_PAGE_SIZE + pageid * self._page_size)
+            return self._fio.read(self._page_size)
+
+
+def run(bio, pageids: list[int], n_threads: int) -> float:
+    chunks = [pageids[i::n_threads] for i in range(n_threads)]
+
+    def worker(chunk):
+        for pageid in chunk:
+            bio.read_page(pageid)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(n_threads) as executor:
+        list(executor.map(worker, chunks))
+    return len(pageids) / (time.perf_counter() - t0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=50_000)
+    parser.add_argument("--reads", type=int, default=100_000)
+    parser.add_argument("--threads", default="1,2,4,8,16")
+    parser.add_argument("--dir", default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp_dir:
+        fpath = Path(tmp_dir) / "bench.dat.xxdb"
+        bio = BlockIO(fpath, PAGE_SIZE)
+        bio.write_pages([(pageid, bytes(PAGE_SIZE)) for pageid in range(args.pages)])
+        locked_bio = LockedBlockIO(fpath, PAGE_SIZE)
+
+        pageids = [random.randrange(args.pages) for _ in range(args.reads)]
+        print(f"{'threads':<10}{'seek+read (reads/s)':>22}{'pread (reads/s)':>18}")
+        for n_threads in map(int, args.threads.split(",")):
+            print(f"{n_threads:<10}{run(locked_bio, pageids, n_threads):>22.0f}{run(bio, pageids, n_threads):>18.0f}")
+
+        bio.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Memory and lookup latency of the indexes, by default of the in memory ones: HashTable (a dict)
+against CompactIndex (sorted arrays + a dict of the recent inserts).
+
+    python benchmarks/index_bench.py [--keys 1000000] [--lookups 200000] [--key-size 8]
+                                     [--types hashtable compact sqlite mmap_hash lsm]
+
+Memory is what tracemalloc sees held by the index after opening it.
+"""
+import argparse
+import random
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from xxdb.engine.index import IndexConfig, getIndex
+
+
+def make_index(typ: str, dpath: Path, key_size: int):
+    return getIndex("bench", dpath, IndexConfig(typ=typ, key_size=key_size, value_size=4))  # type: ignore
+
+
+def run(typ: str, keys: list[int], lookups: list[int], key_size: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dpath:
+        dpath = Path(tmp_dpath)
+
+        idx = make_index(typ, dpath, key_size)
+        t0 = time.perf_counter()
+        for value, key in enumerate(keys):
+            idx[key] = value
+        insert_rate = len(keys) / (time.perf_counter() - t0)
+        idx.close()
+
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        idx = make_index(typ, dpath, key_size)
+        open_time = time.perf_counter() - t0
+        nbytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        t0 = time.perf_counter()
+        for key in lookups:
+            idx[key]
+        lookup_ns = (time.perf_counter() - t0) / len(lookups) * 1e9
+        idx.close()
+
+    print(
+        f"{typ:>10}: {nbytes / 1024 / 1024:8.1f} MB ({nbytes / len(keys):6.1f} B/key)  "
+        f"lookup {lookup_ns:6.0f} ns  insert {insert_rate:8.0f}/s  open {open_time:6.2f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=200_000)
+    parser.add_argument("--key-size", type=int, default=8, choices=[4, 8])
+    parser.add_argument(
+        "--types",
+        nargs="+",
+        default=["hashtable", "compact"],
+        choices=["hashtable", "compact", "sqlite", "mmap_hash", "lsm"],
+    )
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    key_max = (1 << (args.key_size * 8)) - 1
+    keys = list({rng.randint(0, key_max) for _ in range(args.keys)})
+    # half hits, half misses
+    lookups = [rng.choice(keys) if i % 2 else rng.randint(0, key_max) for i in range(args.lookups)]
+
+    for typ in args.types:
+        run(typ, keys, lookups, args.key_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+DB.put_many / DB.get_many against a gather of DB.put / DB.get, the way the ws BULK_PUT handler
+did it, for a batch of records spread over many keys.
+
+    python benchmarks/many_bench.py [--keys 2000] [--batch 2000] [--batches 5] [--max-pages 5000] [--wal]
+
+With --max-pages below --keys the batches read pages back in, the eviction dominates then.
+"""
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from xxdb.engine.db import DB, create, InstanceSettings
+
+
+def open_db(dpath: Path, max_pages: int, wal: bool) -> DB:
+    cfg_fpath = dpath / "bench.json"
+    cfg_fpath.write_text(json.dumps({"disk": {"page_size": 1024}}))
+    meta_dpath = create("bench", cfg_fpath)
+    return DB(
+        "bench",
+        meta_dpath,
+        InstanceSettings(prometheus={"enable": False}, buffer_pool={"max_pages": max_pages}, wal={"enable": wal}),
+    )
+
+
+async def run(args, many: bool) -> tuple[float, float]:
+    rng = random.Random(0)
+    batches = [
+        [(rng.randrange(args.keys), b"x" * rng.randrange(10, 40)) for _ in range(args.batch)]
+        for _ in range(args.batches)
+    ]
+    key_batches = [[rng.randrange(args.keys) for _ in range(args.batch // 5)] for _ in range(args.batches)]
+
+    with tempfile.TemporaryDirectory() as tmp_dpath:
+        db = open_db(Path(tmp_dpath), args.max_pages, args.wal)
+        await db.init()
+        t0 = time.perf_counter()
+        for items in batches:
+            if many:
+                await db.put_many(items)
+            else:
+                await asyncio.gather(*[db.put(key, value) for key, value in items])
+        put_t = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for keys in key_batches:
+            if many:
+                await db.get_many(keys)
+            else:
+                await asyncio.gather(*[db.get(key) for key in keys])
+        get_t = time.perf_counter() - t0
+        await db.close()
+
+    return args.batch * args.batches / put_t, args.batch // 5 * args.batches / get_t
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--keys", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=2000)
+    parser.add_argument("--batches", type=int, default=5)
+    parser.add_argument("--max-pages", type=int, default=5000)
+    parser.add_argument("--wal", action="store_true")
+    args = parser.parse_args()
+
+    for name, many in (("gather", False), ("many", True)):
+        puts, gets = asyncio.run(run(args, many))
+        print(f"{name:7} put {puts:10.0f} records/s  get {gets:10.0f} keys/s")
+
+
+if __name__ == "__main__":
+    main()
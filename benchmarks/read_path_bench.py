@@ -0,0 +1,91 @@
+"""
+Memory allocated by the read path of a cold page: the disk read (BlockIO -> Page), then
+DB.get(mode="bytes") (Page.retrieve) and DB.get(mode="raw") (Page.dumps_data).
+
+    python benchmarks/read_path_bench.py [--pages 2000] [--page-size 2048] [--record-size 20] [--count-pages 200]
+
+Per page: the peak of the memory tracemalloc sees allocated during the step, beyond what is
+held before and after it (the copies made on the way), the time taken, and the count of the
+blocks the step allocated that its result holds (tracemalloc snapshots taken around it, on the
+first --count-pages pages; the blocks freed within the step are in the bytes, not the count).
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from xxdb.engine.config import DiskConfig
+from xxdb.engine.disk import getDisk, Page
+from xxdb.engine.disk.blockio import BlockIO
+
+
+def measure(step, n: int) -> tuple[float, float]:
+    transient = 0
+    t0 = time.perf_counter()
+    for i in range(n):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        result = step(i)
+        current, peak = tracemalloc.get_traced_memory()
+        transient += peak - max(before, current)
+        del result
+    return transient / n, (time.perf_counter() - t0) / n
+
+
+def count_blocks(step, n: int) -> float:
+    def held(step) -> int:
+        blocks = 0
+        for i in range(n):
+            before = tracemalloc.take_snapshot()
+            result = step(i)
+            after = tracemalloc.take_snapshot()
+            blocks += sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+            del result, before, after
+        return blocks
+
+    # less the blocks of the snapshots themselves
+    return (held(step) - held(lambda i: None)) / n
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--page-size", type=int, default=2048)
+    parser.add_argument("--record-size", type=int, default=20)
+    parser.add_argument("--count-pages", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dpath:
+        config = DiskConfig(typ="singlefile", page_size=args.page_size)
+        disk = getDisk("bench", Path(tmp_dpath), config)
+        pages = [disk.new_page() for _ in range(args.pages)]
+        for page in pages:
+            while page.free_size > args.record_size + 2:
+                page.append(b"x" * args.record_size)
+        await disk.write_pages(pages)
+        del pages
+
+        await disk.close()
+
+        bio = BlockIO(Path(tmp_dpath) / "bench.dat.xxdb", args.page_size)
+        tracemalloc.start()
+        loaded: list[Page] = []
+        nbytes, t = measure(lambda i: loaded.append(Page(bio.read_page(i), i, config.page_format)), args.pages)
+        blocks = count_blocks(lambda i: Page(bio.read_page(i), i, config.page_format), args.count_pages)
+        print(f"{'read_page:':12} {nbytes:8.0f} B copied  {t * 1e6:6.1f} us  {blocks:6.1f} blocks")
+
+        for name, step in (
+            ("retrieve", lambda i: loaded[i].retrieve()),
+            ("dumps_data", lambda i: loaded[i].dumps_data()),
+        ):
+            nbytes, t = measure(step, args.pages)
+            blocks = count_blocks(step, args.count_pages)
+            print(f"{name + ':':12} {nbytes:8.0f} B copied  {t * 1e6:6.1f} us  {blocks:6.1f} blocks")
+        tracemalloc.stop()
+        bio.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+"""
+Replay a synthetic page access trace against the buffer pool replacers.
+
+    python benchmarks/replacer_bench.py [--pool 10000] [--pages 200000] [--accesses 1000000]
+"""
+import argparse
+import itertools
+import random
+import time
+
+from xxdb.engine.buffer.replacer import getReplacer
+
+
+class Page:
+    __slots__ = ()
+    evictable = True
+
+
+def skewed_trace(n_pages: int, n_accesses: int, skew: float = 1.0, seed: int = 0) -> list[int]:
+    rnd = random.Random(seed)
+    cum_weights = list(itertools.accumulate(1 / (i + 1) ** skew for i in range(n_pages)))
+    pageids = list(range(n_pages))
+    rnd.shuffle(pageids)
+    return rnd.choices(pageids, cum_weights=cum_weights, k=n_accesses)
+
+
+def scan_trace(n_pages: int, n_accesses: int, scan_every: int, seed: int = 0) -> list[int]:
+    """skewed accesses over a hot set, interrupted by readers touching every cold page once"""
+    n_hot = n_pages // 10
+    hot = skewed_trace(n_hot, n_accesses, seed=seed)
+    trace = []
+    cold = n_hot
+    for i in range(0, n_accesses, scan_every):
+        trace += hot[i : i + scan_every]
+        scan_len = scan_every // 2
+        trace += [n_hot + (cold + j) % (n_pages - n_hot) for j in range(scan_len)]
+        cold += scan_len
+    return trace
+
+
+def replay(typ: str, trace: list[int], pool_size: int, params: dict) -> tuple[float, float]:
+    replacer = getReplacer(typ, pool_size, params)
+    pool: dict[int, Page] = {}
+    page = Page()
+    hits = 0
+    evict_time = 0.0
+
+    for pageid in trace:
+        if pageid in pool:
+            hits += 1
+        else:
+            if len(pool) >= pool_size:
+                t0 = time.perf_counter()
+                victim = replacer.evict(pool, ())
+                evict_time += time.perf_counter() - t0
+                del pool[victim]
+            pool[pageid] = page
+        replacer.record_access(pageid)
+
+    return hits / len(trace), evict_time
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pool", type=int, default=10_000)
+    parser.add_argument("--pages", type=int, default=200_000)
+    parser.add_argument("--accesses", type=int, default=1_000_000)
+    parser.add_argument("--replacers", default="fifo,lru,lru-2,arc")
+    parser.add_argument("--correlated-period", type=int, default=0)
+    args = parser.parse_args()
+    params = {"correlated_period": args.correlated_period}
+
+    traces = {
+        "skewed": skewed_trace(args.pages, args.accesses),
+        "hot+scan": scan_trace(args.pages, args.accesses, scan_every=args.pool * 5),
+    }
+
+    print(f"{'trace':<12}{'replacer':<10}{'hit ratio':>10}{'evict time(s)':>15}")
+    for trace_name, trace in traces.items():
+        for typ in args.replacers.split(","):
+            hit_ratio, evict_time = replay(typ, trace, args.pool, params)
+            print(f"{trace_name:<12}{typ:<10}{hit_ratio:>10.4f}{evict_time:>15.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Schema.pack / Schema.unpack against the per-column loop they replaced, and Schema.unpack_columns
+against unpacking the dicts and gathering their columns (with the memory the result holds), and
+the unpack and the records cut down to a projection of the columns.
+
+    python benchmarks/schema_bench.py [--records 100000]
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from xxdb.engine.schema import Schema, SchemasConfig
+
+SCHEMAS = [
+    # a time series point: fixed size columns
+    {
+        "name": "point",
+        "code": 1,
+        "columns": [
+            {"name": "ts", "num": 0, "typ": "fixed32"},
+            {"name": "value", "num": 1, "typ": "double"},
+            {"name": "min", "num": 2, "typ": "float"},
+            {"name": "max", "num": 3, "typ": "float"},
+        ],
+    },
+    # an event: varints and strings
+    {
+        "name": "event",
+        "code": 2,
+        "columns": [
+            {"name": "ts", "num": 0, "typ": "fixed32"},
+            {"name": "uid", "num": 1, "typ": "uint64"},
+            {"name": "typ", "num": 2, "typ": "uint32"},
+            {"name": "delta", "num": 3, "typ": "sint64"},
+            {"name": "text", "num": 4, "typ": "string"},
+        ],
+    },
+]
+
+
+# the codecs before they were compiled
+def loop_unpack(schema: Schema, data_bytes: bytes) -> dict:
+    schema_code = data_bytes[0]
+    pos = 1
+    data = {}
+    for schema_col in schema._cols[schema_code]:
+        result, pos = schema_col.decode(data_bytes, pos)
+        data[schema_col.name] = result
+    data["schema_"] = schema._schema_name_map[schema_code]
+    return data
+
+
+def loop_pack(schema: Schema, raw_data: dict, name: str) -> bytes:
+    schema_code = schema._schema_code_map[name]
+    data = bytearray()
+    data += schema_code.to_bytes(1, "little")
+    for schema_col in schema._cols[schema_code]:
+        schema_col.encode(data.__iadd__, raw_data[schema_col.name])
+    return bytes(data)
+
+
+def records(name: str, n: int) -> list[dict]:
+    rng = random.Random(0)
+    if name == "point":
+        return [{"ts": 1700000000 + i, "value": rng.random(), "min": 0.5, "max": 1.5} for i in range(n)]
+    return [
+        {
+            "ts": 1700000000 + i,
+            "uid": rng.randrange(1 << 40),
+            "typ": rng.randrange(10),
+            "delta": rng.randrange(-1000, 1000),
+            "text": "x" * rng.randrange(40),
+        }
+        for i in range(n)
+    ]
+
+
+def timed(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t0) / n * 1e6
+
+
+def dicts_to_columns(schema: Schema, packed: list[bytes]) -> dict[str, list]:
+    docs = [schema.unpack(b) for b in packed]
+    return {name: [doc[name] for doc in docs] for name in docs[0]}
+
+
+def held(fn) -> int:
+    tracemalloc.start()
+    result = fn()
+    nbytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=100000)
+    args = parser.parse_args()
+
+    schema = Schema(SchemasConfig.parse_obj(SCHEMAS))
+    for name in ("point", "event"):
+        docs = records(name, args.records)
+        packed = [schema.pack(doc, name) for doc in docs]
+        assert packed == [loop_pack(schema, doc, name) for doc in docs]
+        assert [schema.unpack(b) for b in packed] == [loop_unpack(schema, b) for b in packed]
+
+        n = len(docs)
+        results = {
+            "pack loop": timed(lambda: [loop_pack(schema, doc, name) for doc in docs], n),
+            "pack": timed(lambda: [schema.pack(doc, name) for doc in docs], n),
+            "unpack loop": timed(lambda: [loop_unpack(schema, b) for b in packed], n),
+            "unpack": timed(lambda: [schema.unpack(b) for b in packed], n),
+            "dict columns": timed(lambda: dicts_to_columns(schema, packed), n),
+            "columns": timed(lambda: schema.unpack_columns(packed), n),
+        }
+        for step, us in results.items():
+            print(f"{name:6} {step:12} {us:6.2f} us/record")
+        projection = ["ts"] if name == "point" else ["ts", "typ"]
+        unpack, project = schema.unpacker(projection), schema.projector(projection)
+        us = timed(lambda: [unpack(b) for b in packed], n)
+        print(f"{name:6} {'unpack ' + ','.join(projection):12} {us:6.2f} us/record")
+        nbytes = sum(map(len, packed)), sum(len(project(b)) for b in packed)
+        print(f"{name:6} {'projected':12} {nbytes[0] / n:6.1f} -> {nbytes[1] / n:.1f} B/record")
+        for step, fn in (
+            ("dict columns", lambda: dicts_to_columns(schema, packed)),
+            ("columns", lambda: schema.unpack_columns(packed)),
+        ):
+            print(f"{name:6} {step:12} {held(fn) / n:6.1f} B/record held")
+
+
+if __name__ == "__main__":
+    main()
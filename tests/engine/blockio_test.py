@@ -0,0 +1,121 @@
+import asyncio
+from threading import Lock
+
+from xxdb.engine.capped_array import CappedArray
+from xxdb.engine.config import DiskConfig
+from xxdb.engine.disk import getDisk
+from xxdb.engine.disk.blockio import BlockIO
+
+
+def test_blockio(tmp_path):
+    bio = BlockIO(tmp_path / "test.dat.xxdb", 16)
+    assert bio.page_len == 0
+
+    bio.write_pages([(0, b"0" * 16), (1, b"1" * 16), (3, b"3" * 16)])
+    bio.write_page(2, b"2" * 16)
+    assert bio.page_len == 4
+    assert [bio.read_page(i) for i in range(4)] == [b"0" * 16, b"1" * 16, b"2" * 16, b"3" * 16]
+
+    bio.close()
+
+
+def test_singlefile(tmp_path):
+    async def main():
+        config = DiskConfig(typ="singlefile", page_size=512)
+        disk = getDisk("test", tmp_path, config)
+        pages = [disk.new_page() for _ in range(3)]
+        pages[1].append(b"hello")
+        await disk.write_pages(pages)
+        await disk.close()
+
+        disk = getDisk("test", tmp_path, config)
+        assert disk.new_page().id == 3
+        page = await disk.read_page(1)
+        assert page.retrieve() == [b"hello"]
+        await disk.close()
+
+    asyncio.run(main())
+
+
+def test_mmapfile(tmp_path):
+    async def main():
+        # grows by 2 pages at a time
+        config = DiskConfig(typ="mmap", page_size=512, params={"grow_size": 1024 / 1024 / 1024})
+        disk = getDisk("test", tmp_path, config)
+        pages = [disk.new_page() for _ in range(5)]
+        for page in pages:
+            page.append(f"page {page.id}".encode())
+        await disk.write_pages(pages)
+        await disk.close()
+
+        disk = getDisk("test", tmp_path, config)
+        assert disk.new_page().id == 5
+        page = await disk.read_page(3)
+        assert page.retrieve() == [b"page 3"]
+        page.append(b"again")
+        await disk.write_page(page)
+        await disk.close()
+
+        # the same file can be opened as a singlefile disk
+        disk = getDisk("test", tmp_path, DiskConfig(typ="singlefile", page_size=512))
+        page = await disk.read_page(3)
+        assert page.retrieve() == [b"page 3", b"again"]
+        await disk.close()
+
+    asyncio.run(main())
+
+
+def test_mmapfile_msync(tmp_path):
+    class CountingLock:
+        def __init__(self):
+            self.lock, self.acquired = Lock(), 0
+
+        def __enter__(self):
+            self.acquired += 1
+            self.lock.acquire()
+
+        def __exit__(self, *exc):
+            self.lock.release()
+
+    async def main():
+        disk = getDisk("test", tmp_path, DiskConfig(typ="mmap", page_size=512))
+        disk.MSYNC_CHUNK_SIZE = 4096
+        disk._resize_lock = lock = CountingLock()
+        pages = [disk.new_page() for _ in range(20)]
+        await disk.write_pages(pages)
+        # one run of 20 pages, 10240 bytes, the lock is taken per 4096 of them
+        await disk.flush()
+        assert lock.acquired == 3
+        await disk.close()
+
+    asyncio.run(main())
+
+
+def test_page_format(tmp_path):
+    async def main():
+        config = DiskConfig(typ="singlefile", page_size=512, page_format=1)
+        disk = getDisk("test", tmp_path, config)
+        page = disk.new_page()
+        for i in range(100):
+            page.append(b"%d" % i)
+        await disk.write_pages([page])
+        await disk.close()
+
+        config = DiskConfig(typ="singlefile", page_size=512, page_format=2)
+        disk = getDisk("test", tmp_path, config)
+        page = await disk.read_page(0)
+        assert page.data_format == 1
+        assert page.dumps_data() == CappedArray.DumpsRaw([b"%d" % i for i in range(100)], 2)
+        # converted once dirty, in the 1 byte sizes more records fit
+        page.append(b"x" * 200)
+        assert page.data_format == 2
+        assert page.retrieve() == [b"%d" % i for i in range(100)] + [b"x" * 200]
+        await disk.write_pages([page])
+        await disk.close()
+
+        disk = getDisk("test", tmp_path, config)
+        page = await disk.read_page(0)
+        assert page.data_format == 2 and len(page.retrieve()) == 101
+        await disk.close()
+
+    asyncio.run(main())
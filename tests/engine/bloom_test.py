@@ -0,0 +1,54 @@
+from xxdb.engine.index import IndexConfig, getIndex
+from xxdb.engine.index.bloom import BloomIndex
+from xxdb.engine.index.hashtable import HashTable
+
+
+class CountingIndex(HashTable):
+    lookups = 0
+
+    def __getitem__(self, key):
+        self.lookups += 1
+        return super().__getitem__(key)
+
+
+def test_bloom_index(tmp_path):
+    ht_fpath, bloom_fpath = tmp_path / "test.ht.idx.xxdb", tmp_path / "test.bloom.idx.xxdb"
+
+    inner = CountingIndex(ht_fpath, 8, 4)
+    idx = BloomIndex(inner, bloom_fpath, capacity=100)
+    for i in range(1000):
+        idx[i * 7919] = i
+    # grown past the capacity
+    assert idx._capacity >= 1000
+    assert all(idx[i * 7919] == i for i in range(1000))
+    assert inner.lookups == 1000
+
+    for i in range(10000):
+        assert idx[i * 7919 + 1] is None
+    assert idx.negatives + idx.false_positives == 10000
+    assert idx.false_positive_rate < 0.05
+    assert inner.lookups == 1000 + idx.false_positives
+    idx.close()
+
+    # loaded as saved
+    idx = BloomIndex(HashTable(ht_fpath, 8, 4), bloom_fpath, capacity=100)
+    bits = bytes(idx._filter.bits)
+    assert all(idx[i * 7919] == i for i in range(1000))
+    idx[1000 * 7919] = 1000
+    idx.flush()
+
+    # not closed, the filter on disk is behind the index and rebuilt
+    idx = BloomIndex(HashTable(ht_fpath, 8, 4), bloom_fpath, capacity=100)
+    assert bytes(idx._filter.bits) != bits
+    assert all(idx[i * 7919] == i for i in range(1001))
+    idx.close()
+
+
+def test_get_index(tmp_path):
+    config = IndexConfig(typ="sqlite", key_size=8, value_size=4, params={"bloom": {"bits_per_key": 16}})
+    idx = getIndex("test", tmp_path, config)
+    assert isinstance(idx, BloomIndex) and idx._bits_per_key == 16
+    idx[1] = 1
+    assert idx[1] == 1 and idx[2] is None
+    idx.close()
+    assert (tmp_path / "test.bloom.idx.xxdb").exists()
@@ -0,0 +1,175 @@
+import asyncio
+
+import pytest
+
+from xxdb.engine.buffer import BufferPoolManager, BufferPool, BufferPoolFullError
+from xxdb.engine.config import BufferPoolConfig, DiskConfig
+from xxdb.engine.disk import getDisk
+
+
+def get_bpm(tmp_path, name="test", buffer_pool=None, **config):
+    disk = getDisk(name, tmp_path, DiskConfig(typ="multifile", page_size=512, params={"block_size": 1}))
+    return BufferPoolManager(disk, BufferPoolConfig(**config), buffer_pool)
+
+
+def test_cleaner(tmp_path):
+    async def main():
+        bpm = get_bpm(tmp_path, max_pages=10, replacer="lru", cleaner_low_watermark=0.2, cleaner_high_watermark=0.5)
+
+        pageids = []
+        for i in range(50):
+            pageid = bpm.new_page()
+            async with bpm.fetch_page(pageid) as page:
+                page.append(b"%d" % i)
+            pageids.append(pageid)
+            await asyncio.sleep(0)
+
+        # the cleaner has written the dirty pages out in the background
+        await asyncio.sleep(0.1)
+        assert bpm.buffer_pool.headroom >= bpm.buffer_pool.low_watermark
+
+        for i, pageid in enumerate(pageids):
+            async with bpm.fetch_page(pageid) as page:
+                assert page.retrieve() == [b"%d" % i]
+            assert len(bpm.pool) <= 10
+
+        await bpm.close()
+
+    asyncio.run(main())
+
+
+def test_pool_full(tmp_path):
+    async def main():
+        bpm = get_bpm(tmp_path, max_pages=2)
+        pageids = [bpm.new_page() for _ in range(3)]
+        await bpm.flush_all()
+        for pageid in list(bpm.pool):
+            bpm._pool_remove(pageid)
+
+        async with bpm.fetch_page(pageids[0]), bpm.fetch_page(pageids[1]):
+            with pytest.raises(BufferPoolFullError):
+                async with bpm.fetch_page(pageids[2]):
+                    ...
+
+        async with bpm.fetch_page(pageids[2]):
+            ...
+        assert len(bpm.pool) == 2
+
+        await bpm.close()
+
+    asyncio.run(main())
+
+
+def test_cleaner_error(tmp_path):
+    async def main():
+        bpm = get_bpm(tmp_path, max_pages=2, replacer="lru", cleaner_low_watermark=0, cleaner_high_watermark=0.5)
+        pageids = [bpm.new_page() for _ in range(3)]
+        await bpm.flush_all()
+        bpm._pool_remove(pageids[2])
+        for pageid in pageids[:2]:
+            async with bpm.fetch_page(pageid) as page:
+                page.append(b"dirty")
+
+        # both pages are dirty, only the cleaner (not clean_only) gets to pick one
+        def evict(pool, wait_list):
+            if wait_list._clean_only:
+                return None
+            raise RuntimeError("replacer failed")
+
+        # the cleaner fails, the fetch waiting for it gets an error instead of hanging
+        bpm.replacer.evict = evict
+        with pytest.raises(BufferPoolFullError):
+            await asyncio.wait_for(bpm._load_page(pageids[2]), 1)
+        del bpm.replacer.evict
+
+        # the write of the cleaner fails, the page it picked stays in the pool
+        write_pages = bpm.disk.write_pages
+
+        async def fail_write_pages(pages):
+            raise OSError("disk failed")
+
+        bpm.disk.write_pages = fail_write_pages
+        async with bpm.fetch_page(pageids[1]):
+            with pytest.raises(BufferPoolFullError):
+                await asyncio.wait_for(bpm._load_page(pageids[2]), 1)
+        assert pageids[0] in bpm.pool and bpm.pool[pageids[0]].is_dirty
+        # and can be evicted again once the disk is back
+        bpm.disk.write_pages = write_pages
+        async with bpm.fetch_page(pageids[1]):
+            async with bpm.fetch_page(pageids[2]):
+                ...
+        assert pageids[0] not in bpm.pool
+        await bpm.close()
+
+    asyncio.run(main())
+
+
+def test_flush_all(tmp_path):
+    async def main():
+        bpm = get_bpm(tmp_path, max_pages=10_000)
+        pageids = [bpm.new_page() for _ in range(3000)]
+        for pageid in reversed(pageids):
+            async with bpm.fetch_page(pageid) as page:
+                page.append(pageid.to_bytes(4, "little"))
+
+        await bpm.flush_all()
+        assert not bpm.dirty_pageids
+        # 2048 pages fit in a 1MB block file
+        assert [bio.page_len for bio in bpm.disk._block_list] == [2048, 952]
+
+        for pageid in pageids:
+            page = await bpm.disk.read_page(pageid)
+            assert page.retrieve() == [pageid.to_bytes(4, "little")]
+
+        await bpm.close()
+
+    asyncio.run(main())
+
+
+def test_max_bytes(tmp_path):
+    async def main():
+        bpm = get_bpm(tmp_path, max_bytes=20 * 1024, cleaner_low_watermark=0.1, cleaner_high_watermark=0.2)
+        pageids = [bpm.new_page() for _ in range(100)]
+        for pageid in pageids:
+            async with bpm.fetch_page(pageid) as page:
+                page.append(b"x" * 400)
+            await asyncio.sleep(0)
+
+        for pageid in pageids:
+            async with bpm.fetch_page(pageid) as page:
+                assert page.retrieve() == [b"x" * 400]
+            assert bpm.buffer_pool.used_bytes <= 20 * 1024
+        assert bpm.used_bytes == sum(page.nbytes for page in bpm.pool.values())
+
+        await bpm.close()
+
+    asyncio.run(main())
+
+
+def test_shared_pool(tmp_path):
+    async def main():
+        buffer_pool = BufferPool(BufferPoolConfig(max_pages=10, replacer="lru"))
+        bpm1 = get_bpm(tmp_path, "db1", buffer_pool)
+        bpm2 = get_bpm(tmp_path, "db2", buffer_pool)
+
+        pageids = [bpm1.new_page() for _ in range(10)]
+        await bpm1.flush_all()
+
+        # pages of db1 make room for the hot db2
+        for _ in range(8):
+            async with bpm2.fetch_page(bpm2.new_page()) as page:
+                page.append(b"db2")
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.1)
+        assert len(bpm2.pool) == 8
+        assert len(bpm1.pool) + len(bpm2.pool) == buffer_pool.used_pages <= 10
+
+        async with bpm1.fetch_page(pageids[0]) as page:
+            assert page.retrieve() == []
+
+        await bpm1.close()
+        assert buffer_pool.used_pages == len(bpm2.pool)
+        await bpm2.close()
+        assert buffer_pool.used_pages == 0
+
+    asyncio.run(main())
@@ -1,4 +1,5 @@
 from xxdb.engine.capped_array import CappedArray
+from xxdb.engine.disk import Page
 
 
 def test():
@@ -17,3 +18,83 @@ def test():
     arr2.append(b'2' * 11)
     arr2.append(b'3' * 21)
     assert arr2.retrieve() == [b'22222222222', b'333333333333333333333']
+
+
+def test_wrap_around():
+    arr = CappedArray(b'', 16)
+    for i in range(100):
+        arr.append(b'%d' % i)
+        # the records wrap around the end of the buffer, dumped in order
+        assert CappedArray.RetrieveFromRaw(arr.dumps_data()) == arr.retrieve()
+    assert arr.retrieve() == [b'96', b'97', b'98', b'99']
+
+    arr2 = CappedArray(arr.dumps_data(), 16)
+    arr2.append(b'abcdef')
+    assert arr2.retrieve() == [b'98', b'99', b'abcdef']
+
+
+def test_varint_format():
+    arr = CappedArray(b'', 300, data_format=2)
+    arr.append(b'a' * 5)
+    arr.append(b'b' * 200)
+    # 1 + 5, 2 + 200
+    assert len(arr.dumps_data()) == 208
+    assert CappedArray.RetrieveFromRaw(arr.dumps_data(), 2) == [b'a' * 5, b'b' * 200]
+
+    for i in range(50):
+        arr.append(b'%d' % i * 10)
+        assert arr.retrieve() == CappedArray.RetrieveFromRaw(arr.dumps_data(), 2)
+    arr.append(b'c' * 250)
+    assert arr.retrieve()[-1] == b'c' * 250
+
+    data_list = arr.retrieve()
+    arr.convert(1)
+    assert arr.retrieve() == CappedArray.RetrieveFromRaw(arr.dumps_data(), 1) == data_list
+
+
+def test_index():
+    arr = CappedArray(b'', 40, data_format=2)
+    for i in range(10):
+        arr.append(b'%d' % i)
+    assert arr.count() == 10
+    for i in range(10, 100):
+        # the index is kept up through the wraps
+        arr.append(b'%d' % i * (i % 3))
+        raw_data, spans = arr._spans()
+        assert [bytes(raw_data[i:j]) for i, j in spans] == arr.retrieve()
+        raw_data, spans = arr._spans(arr.count() - 2)
+        assert [bytes(raw_data[i:j]) for i, j in spans] == arr.retrieve()[-2:]
+
+    arr.convert(1)
+    assert arr.count() == len(arr.retrieve())
+
+
+def test_convert_page():
+    page = Page(bytes(256 - Page.FOOTER.size) + Page.FOOTER.pack(0, 0, Page.MAGIC_FOOTS[1]), 0, data_format=1)
+    for i in range(5):
+        page.append(b"%d" % i)
+    page.target_format = 2
+    page.append(b"5")
+    # converted to the varint format on the append, the lsn only counts the append
+    assert page.data_format == 2 and page.lsn == 6
+    assert page.select(after=5) == ([b"5"], 6)
+
+
+def test_merge_delta():
+    # a page from before the lsn counted appends, one record and lsn 0
+    legacy = CappedArray(b'', 256 - Page.FOOTER.size)
+    legacy.append(b"old")
+    raw = legacy.dumps_data()
+    page = Page(raw + bytes(legacy.free_size) + Page.FOOTER.pack(0, len(raw), Page.MAGIC_FOOTS[1]), 0)
+    page.append(b"0")
+    kept, cursor = page.select()
+    assert (kept, cursor) == ([b"old", b"0"], 1)
+
+    page.append(b"1")
+    records, first, cursor = page.delta(cursor)
+    # its records are numbered from 0, the delta still merges
+    assert (records, first, cursor) == ([b"1"], 0, 2)
+    assert Page.merge_delta(1, kept, records, first, cursor) == [b"old", b"0", b"1"]
+
+    # the page lost appends the reader saw, the records are all of them
+    assert Page.merge_delta(5, kept, [b"old", b"0", b"1"], 0, 2) == [b"old", b"0", b"1"]
@@ -0,0 +1,35 @@
+from xxdb.engine.index.compact import CompactIndex
+from xxdb.engine.index.hashtable import HashTable
+
+
+def test_compact_index(tmp_path):
+    log_fpath, snapshot_fpath = tmp_path / "test.ht.idx.xxdb", tmp_path / "test.compact.idx.xxdb"
+
+    idx = CompactIndex(log_fpath, snapshot_fpath, 8, 4, min_delta=100)
+    idx[10] = 10
+    assert idx[10] == 10
+    assert idx[12] is None
+    for i in range(1000, 0, -1):
+        idx[i * 7919] = i
+    assert len(idx._delta) < 100
+    assert idx[10] == 10
+    assert idx[7919] == 1 and idx[1000 * 7919] == 1000
+    assert idx[7918] is None and 7920 not in idx
+    idx.close()
+
+    idx = CompactIndex(log_fpath, snapshot_fpath, 8, 4, min_delta=100)
+    assert len(idx) == 1001
+    assert idx[500 * 7919] == 500
+    for i in range(1001, 1050):
+        idx[i * 7919] = i
+    idx.flush()
+    # not closed, the log after the snapshot is replayed
+    idx = CompactIndex(log_fpath, snapshot_fpath, 8, 4, min_delta=100)
+    assert len(idx) == 1050
+    assert idx[1049 * 7919] == 1049
+    assert sorted(idx) == sorted([10] + [i * 7919 for i in range(1, 1050)])
+    idx.close()
+
+    # the same log as HashTable
+    ht = HashTable(log_fpath, 8, 4)
+    assert len(ht) == 1050 and ht[1049 * 7919] == 1049
@@ -0,0 +1,202 @@
+import asyncio
+import json
+
+from xxdb.engine.capped_array import CappedArray
+from xxdb.engine.config import InstanceSettings
+from xxdb.engine.db import DB, create
+
+
+def open_db(tmp_path, page_size=512, schemas=None) -> DB:
+    cfg_fpath = tmp_path / "test.json"
+    cfg_fpath.write_text(json.dumps({"disk": {"page_size": page_size}, "schemas": schemas}))
+    meta_dpath = create("test", cfg_fpath)
+    return DB("test", meta_dpath, InstanceSettings(prometheus={"enable": False}))
+
+
+def test_get_range(tmp_path):
+    async def main():
+        db = open_db(tmp_path)
+        await db.init()
+        assert await db.get(1, limit=3) is None
+
+        for i in range(100):
+            await db.put(1, b"%d" % i)
+        records = await db.get(1)
+        # the oldest are gone, the page holds 100 appends
+        n = len(records)
+        assert records == [b"%d" % i for i in range(100 - n, 100)]
+
+        assert await db.get(1, limit=3, reverse=True) == [b"99", b"98", b"97"]
+        assert await db.get(1, limit=3) == records[:3]
+        assert await db.get(1, after=97) == [b"97", b"98", b"99"]
+        assert await db.get(1, after=97, reverse=True, with_cursor=True) == ([b"99", b"98", b"97"], 100)
+        # paging through
+        after, pages = 90, []
+        while 1:
+            page, after = await db.get(1, limit=4, after=after, with_cursor=True)
+            if not page:
+                break
+            pages.append(page)
+        assert pages == [[b"90", b"91", b"92", b"93"], [b"94", b"95", b"96", b"97"], [b"98", b"99"]]
+        assert after == 100
+        # a cursor older than the page starts from its oldest record
+        assert await db.get(1, limit=2, after=0) == records[:2]
+
+        raw = await db.get(1, mode="raw", limit=2, reverse=True)
+        assert CappedArray.RetrieveFromRaw(raw, db.data_format) == [b"99", b"98"]
+        await db.close()
+
+    asyncio.run(main())
+
+
+def test_get_since(tmp_path):
+    async def main():
+        db = open_db(tmp_path)
+        await db.init()
+        assert await db.get_since(1, 0) is None
+
+        for i in range(5):
+            await db.put(1, b"%d" % i)
+        assert await db.get_since(1, 0) == ([b"0", b"1", b"2", b"3", b"4"], 1, 5)
+        assert await db.get_since(1, 5) == (None, 0, 5)
+        await db.put(1, b"5")
+        assert await db.get_since(1, 5) == ([b"5"], 1, 6)
+        raw, first, cursor = await db.get_since(1, 3, mode="raw")
+        assert CappedArray.RetrieveFromRaw(raw, db.data_format) == [b"3", b"4", b"5"]
+        # the page lost appends the reader saw, all of them
+        assert await db.get_since(1, 9) == ([b"0", b"1", b"2", b"3", b"4", b"5"], 1, 6)
+
+        # the oldest are dropped
+        for i in range(6, 200):
+            await db.put(1, b"%d" % i)
+        records, first, cursor = await db.get_since(1, 150)
+        assert cursor == 200 and first > 1
+        assert records == [b"%d" % i for i in range(150, 200)]
+        assert await db.get(1) == [b"%d" % i for i in range(first - 1, 200)]
+        await db.close()
+
+    asyncio.run(main())
+
+
+def test_get_columns(tmp_path):
+    schemas = [
+        {
+            "name": "event",
+            "code": 1,
+            "columns": [
+                {"name": "ts", "num": 0, "typ": "fixed32"},
+                {"name": "text", "num": 1, "typ": "string"},
+                {"name": "uid", "num": 2, "typ": "uint64"},
+            ],
+        }
+    ]
+
+    async def main():
+        db = open_db(tmp_path, schemas=schemas)
+        await db.init()
+        for i in range(5):
+            await db.put(1, {"ts": i, "text": "x" * 30, "uid": i * 7}, schema="event")
+
+        assert await db.get(1, "dict", columns=["uid"], limit=2, reverse=True) == [
+            {"uid": 28, "schema_": "event"},
+            {"uid": 21, "schema_": "event"},
+        ]
+        columns = await db.get(1, "columns", columns=["ts", "uid"])
+        assert list(columns) == ["ts", "uid", "schema_"] and list(columns["uid"]) == [0, 7, 14, 21, 28]
+        # cut down to the columns
+        records = await db.get(1, "bytes", columns=["ts"])
+        assert all(len(data) == 5 for data in records)
+        raw = await db.get(1, "raw", columns=["ts"])
+        assert CappedArray.RetrieveFromRaw(raw, db.data_format) == records
+        await db.close()
+
+    asyncio.run(main())
+
+
+def test_get_where(tmp_path):
+    schemas = [
+        {
+            "name": "event",
+            "code": 1,
+            "columns": [
+                {"name": "ts", "num": 0, "typ": "fixed32"},
+                {"name": "uid", "num": 1, "typ": "uint64"},
+            ],
+        }
+    ]
+
+    async def main():
+        db = open_db(tmp_path, schemas=schemas)
+        await db.init()
+        for i in range(20):
+            await db.put(1, {"ts": i, "uid": i % 4}, schema="event")
+
+        records = await db.get(1, "dict", where="uid == 1 and ts > 2")
+        assert [r["ts"] for r in records] == [5, 9, 13, 17]
+        # limit counts the matches, the cursor is the last record looked at
+        records, cursor = await db.get(1, "dict", where="uid == 1", limit=2, with_cursor=True)
+        assert [r["ts"] for r in records] == [1, 5] and cursor == 6
+        records, cursor = await db.get(1, "dict", where="uid == 1", limit=2, after=cursor, with_cursor=True)
+        assert [r["ts"] for r in records] == [9, 13] and cursor == 14
+        records, cursor = await db.get(1, "dict", where="uid == 1", limit=2, after=cursor, with_cursor=True)
+        assert [r["ts"] for r in records] == [17] and cursor == 20
+        assert await db.get(1, "dict", where="uid == 3", limit=2, reverse=True, columns=["ts"]) == [
+            {"ts": 19, "schema_": "event"},
+            {"ts": 15, "schema_": "event"},
+        ]
+        assert await db.get(1, where="ts > 100") == []
+        await db.close()
+
+    asyncio.run(main())
+
+
+def test_many(tmp_path):
+    async def main():
+        db = open_db(tmp_path)
+        await db.init()
+        await db.put(1, b"a")
+        # 3 keys with pages, 2 new ones, 2 records of key 5
+        lsns = await db.put_many([(1, b"b"), (5, b"c"), (2, b"d"), (5, b"e"), (3, b"f")])
+        assert lsns == [2, 1, 1, 2, 1]
+        assert await db.get_many([5, 1, 4, 2]) == [[b"c", b"e"], [b"a", b"b"], None, [b"d"]]
+        assert await db.get_many([1, 5], limit=1, reverse=True) == [[b"b"], [b"e"]]
+        await db.close()
+
+        # more pages than the pool holds, they are written out and read back in batches
+        db = DB("test", tmp_path / "test", InstanceSettings(prometheus={"enable": False}, buffer_pool={"max_pages": 8}))
+        await db.init()
+        items = [(key, b"%d-%d" % (key, i)) for i in range(3) for key in range(100)]
+        await db.put_many(items)
+        before = {1: [b"a", b"b"], 2: [b"d"], 3: [b"f"], 5: [b"c", b"e"]}
+        keys = list(range(100, -1, -1))
+        results = await db.get_many(keys)
+        assert results[0] is None
+        for key, records in zip(keys[1:], results[1:]):
+            assert records == before.get(key, []) + [b"%d-%d" % (key, i) for i in range(3)]
+        await db.close()
+
+    asyncio.run(main())
+
+
+def test_put_many_concurrent_put(tmp_path):
+    async def main():
+        db = open_db(tmp_path)
+        await db.init()
+        for key in range(50):
+            await db.put(key, b"a")
+        await db.close()
+        # the pages of the 50 keys are read back, key 999 gets a page from the put meanwhile
+        db = DB("test", tmp_path / "test", InstanceSettings(prometheus={"enable": False}))
+        await db.init()
+
+        async def put():
+            await asyncio.sleep(0)
+            await db.put(999, b"x")
+
+        _, lsns = await asyncio.gather(put(), db.put_many([(key, b"b") for key in range(50)] + [(999, b"y")]))
+        assert lsns == [2] * 50 + [2]
+        assert await db.get(999) == [b"x", b"y"]
+        assert await db.get_many([0, 49]) == [[b"a", b"b"], [b"a", b"b"]]
+        await db.close()
+
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+import asyncio
+
+from xxdb.engine.config import IOConfig
+from xxdb.engine.disk import IOScheduler
+from xxdb.engine.disk.blockio import BlockIO
+
+
+def page(i: int) -> bytes:
+    return bytes([i % 256]) * 16
+
+
+def test_merge_reads(tmp_path):
+    async def main():
+        bio = BlockIO(tmp_path / "test.dat.xxdb", 16)
+        bio.write_pages([(i, page(i)) for i in range(10)])
+        sched = IOScheduler(IOConfig(workers=1))
+        batches = []
+
+        @sched.on("read")
+        def on_read(pages, wait_time, service_time):
+            batches.append(pages)
+
+        results = await asyncio.gather(*[sched.read(bio, i) for i in (3, 1, 2, 0, 8, 9)])
+        assert results == [page(i) for i in (3, 1, 2, 0, 8, 9)]
+        # one request, two preads
+        assert batches == [6]
+
+        await sched.close()
+        bio.close()
+
+    asyncio.run(main())
+
+
+def test_reads_before_writes(tmp_path):
+    async def main():
+        bio = BlockIO(tmp_path / "test.dat.xxdb", 16)
+        bio.write_pages([(i, page(i)) for i in range(200)])
+        sched = IOScheduler(IOConfig(workers=1))
+        order = []
+
+        @sched.on("read")
+        def on_read(pages, wait_time, service_time):
+            order.append("read")
+
+        @sched.on("write")
+        def on_write(pages, wait_time, service_time):
+            order.append("write")
+
+        write = asyncio.create_task(sched.write(bio, [(i, page(i + 1)) for i in range(0, 200, 2)]))
+        await asyncio.sleep(0)
+        # queued after the writes, served first
+        await sched.read(bio, 199)
+        await write
+        assert order == ["read", "write"]
+        assert bio.read_pages(0, 3) == [page(1), page(1), page(3)]
+
+        await sched.close()
+        bio.close()
+
+    asyncio.run(main())
+
+
+def test_backpressure(tmp_path):
+    async def main():
+        bio = BlockIO(tmp_path / "test.dat.xxdb", 16)
+        sched = IOScheduler(IOConfig(workers=2, queue_depth=4))
+
+        async def check_queue():
+            while 1:
+                assert sched.write_queue_len <= 4
+                await asyncio.sleep(0)
+
+        checker = asyncio.create_task(check_queue())
+        write = asyncio.create_task(sched.write(bio, [(i, page(i)) for i in range(100)]))
+        await asyncio.sleep(0)
+        # served from the queued write
+        assert await sched.read(bio, 2) == page(2)
+        await write
+        checker.cancel()
+
+        assert await sched.read(bio, 42) == page(42)
+        assert bio.page_len == 100
+
+        await sched.close()
+        bio.close()
+
+    asyncio.run(main())
+
+
+def test_bulk_write(tmp_path):
+    async def main():
+        bio = BlockIO(tmp_path / "test.dat.xxdb", 16)
+        sched = IOScheduler(IOConfig(workers=1))
+        sched.BULK_BATCH_PAGES = 200
+        batches = []
+
+        @sched.on("write")
+        def on_write(pages, wait_time, service_time):
+            batches.append(pages)
+
+        write = asyncio.create_task(sched.write(bio, [(i, page(i)) for i in range(300)]))
+        await asyncio.sleep(0)
+        # in flight: read from the write, the later write of a page lands after it
+        assert await sched.read(bio, 250) == page(250)
+        await sched.write(bio, [(10, page(0))])
+        await write
+        # not queued, 2 bulk batches and the write of page 10
+        assert batches == [200, 100, 1]
+        assert bio.read_pages(9, 3) == [page(9), page(0), page(11)]
+
+        await sched.close()
+        bio.close()
+
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+import heapq
+import os
+import random
+import threading
+import time
+
+import pytest
+
+from xxdb.engine.index import lsm
+from xxdb.engine.index.lsm import LsmIndex
+
+
+def wait_idle(idx: LsmIndex):
+    while idx._immutables or idx._compaction():
+        time.sleep(0.01)
+
+
+def test_lsm_index(tmp_path):
+    rng = random.Random(0)
+    keys = list({rng.randint(0, 1 << 62) for _ in range(20000)})
+    params = dict(memtable_size=1000, run_size=2000, l0_runs=2, level_ratio=2)
+
+    idx = LsmIndex(tmp_path, "test", 8, 4, **params)
+    for value, key in enumerate(keys[:15000]):
+        idx[key] = value
+    assert idx[keys[0]] == 0
+    wait_idle(idx)
+    # merged down past level 1
+    assert len(idx._levels) >= 3 and len(idx._levels[0].runs) < 2
+    for level in idx._levels[1:]:
+        assert all(a.max_key < b.min_key for a, b in zip(level.runs, level.runs[1:]))
+    assert len(idx) == 15000
+    assert all(idx[key] == value for value, key in enumerate(keys[:15000]))
+    assert all(idx[key] is None for key in keys[15000:])
+    idx.close()
+
+    idx = LsmIndex(tmp_path, "test", 8, 4, **params)
+    assert len(idx) == 15000
+    for value, key in enumerate(keys[15000:], 15000):
+        idx[key] = value
+    idx.flush()
+    wait_idle(idx)
+    # not closed, the memtable is replayed from its log
+    idx = LsmIndex(tmp_path, "test", 8, 4, **params)
+    assert len(idx) == 20000
+    assert all(idx[key] == value for value, key in enumerate(keys))
+    assert sorted(idx) == sorted(keys)
+    idx.close()
+
+    # the runs of the merges are removed
+    idx = LsmIndex(tmp_path, "test", 8, 4, **params)
+    runs = {run.id for level in idx._levels for run in level.runs}
+    assert len(list(tmp_path.glob("test.lsm.*.run.idx.xxdb"))) == len(runs)
+    idx.close()
+
+
+def test_background_error(tmp_path):
+    idx = LsmIndex(tmp_path, "test", 8, 4, memtable_size=10)
+    idx._error = OSError("disk full")
+    # the freeze raises the error of the background thread, the writes after it too
+    for key in range(9):
+        idx[key] = key
+    with pytest.raises(Exception, match="lsm background thread failed"):
+        idx[9] = 9
+    with pytest.raises(Exception, match="lsm background thread failed"):
+        idx[10] = 10
+
+
+def test_flush_frozen_logs(tmp_path, monkeypatch):
+    idx = LsmIndex(tmp_path, "test", 8, 4, memtable_size=10)
+    # the background thread does not get to write the runs
+    written = threading.Event()
+    write_memtable = idx._write_memtable
+    monkeypatch.setattr(idx, "_write_memtable", lambda *args: written.wait(10) and write_memtable(*args))
+    synced = []
+    fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: synced.append(os.readlink(f"/proc/self/fd/{fd}")) or fsync(fd))
+
+    for key in range(15):
+        idx[key] = key
+    assert len(idx._immutables) == 1
+    idx.flush()
+    # the log of the frozen memtable too
+    assert str(idx._log_fpath(0)) in synced and str(idx._log_fpath(1)) in synced
+
+    reopened = LsmIndex(tmp_path, "test", 8, 4, memtable_size=100)
+    assert all(reopened[key] == key for key in range(15))
+    reopened.close()
+    written.set()
+    idx.close()
+
+
+def test_write_during_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(lsm, "MERGE_CHUNK", 4)
+    # the first compaction takes a while, until released
+    released = threading.Event()
+    compacting = threading.Event()
+    merge = heapq.merge
+
+    def slow_merge(*iterables, key=None):
+        compacting.set()
+        for i, item in enumerate(merge(*iterables, key=key)):
+            if i:
+                released.wait(0.02)
+            yield item
+        compacting.clear()
+
+    monkeypatch.setattr(heapq, "merge", slow_merge)
+    idx = LsmIndex(tmp_path, "test", 8, 4, memtable_size=100, l0_runs=2, max_immutables=1)
+    for key in range(200):
+        idx[key] = key
+    assert compacting.wait(10)
+    # the memtables are written between the merge chunks, the puts don't wait for the compaction
+    for key in range(200, 600):
+        idx[key] = key
+    assert compacting.is_set()
+    released.set()
+    wait_idle(idx)
+    assert all(idx[key] == key for key in range(600))
+    idx.close()
@@ -0,0 +1,51 @@
+import pytest
+
+from xxdb.engine.index.mmap_hash import MmapHash
+
+
+def test_mmap_hash(tmp_path):
+    idx = MmapHash(tmp_path, "test", 8, 4, initial_capacity=16)
+    idx[0] = 0
+    idx[10] = 10
+    assert idx[0] == 0
+    assert idx[10] == 10
+    assert idx[12] is None
+    idx.close()
+
+    idx = MmapHash(tmp_path, "test", 8, 4, initial_capacity=16)
+    assert idx[10] == 10
+
+    # resizes several times
+    for i in range(100, 10000):
+        idx[i * 7919] = i
+        assert idx[i * 7919] == i
+    assert len(idx) == 9902
+    assert idx[100 * 7919] == 100
+    assert idx[9999 * 7919] == 9999
+    assert 0 in idx and 12 not in idx
+
+    # stop in the middle of a resize
+    while idx._old is None:
+        idx[len(idx) * 7919 + 1] = 1
+    n = len(idx)
+    idx._table.close()
+    idx._old.close()
+
+    idx = MmapHash(tmp_path, "test", 8, 4)
+    assert idx._old is not None
+    assert len(idx) == n
+    assert sorted(idx) == sorted(set(idx))
+    assert len(list(idx)) == n
+    assert idx[5000 * 7919] == 5000
+    idx.flush()
+    while idx._old is not None:
+        idx.flush()
+    assert len(idx) == n
+    assert len(list(tmp_path.glob("test.*.mh.idx.xxdb"))) == 1
+    idx.close()
+
+
+def test_max_load(tmp_path):
+    for max_load in (0, 1, 1.5):
+        with pytest.raises(Exception, match="max_load"):
+            MmapHash(tmp_path, "test", 8, 4, max_load=max_load)
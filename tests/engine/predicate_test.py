@@ -0,0 +1,55 @@
+import pytest
+
+from xxdb.engine.predicate import Predicate
+from xxdb.engine.schema import Schema, SchemasConfig
+
+
+def test_predicate():
+    predicate = Predicate('ts > 100 and (uid in (1, 2) or not text != "a")')
+    assert predicate.columns == {"ts", "uid", "text"}
+    source = predicate.source(
+        {"ts": "a", "uid": "b", "text": "c"}, {"ts": "fixed32", "uid": "uint64", "text": "string"}
+    )
+    assert eval(source, {"a": 101, "b": 2, "c": "b"}) is True
+    assert eval(source, {"a": 101, "b": 3, "c": "a"}) is True
+    assert eval(source, {"a": 100, "b": 2, "c": "a"}) is False
+    # the schema does not have text
+    assert predicate.source({"ts": "a", "uid": "b"}, {"ts": "fixed32", "uid": "uint64"}).endswith("or (not False)))")
+
+    for text in ("ts + 1 > 2", "len(text) > 1", "ts in [1]", "ts == (1, 2)", "ts is None", "ts", "ts >"):
+        with pytest.raises(Exception, match="bad predicate"):
+            Predicate(text)
+    with pytest.raises(Exception, match="ts compared with 'a'"):
+        Predicate("ts == 'a'").source({"ts": "a"}, {"ts": "fixed32"})
+
+
+def test_matcher():
+    schema = Schema(
+        SchemasConfig.parse_obj(
+            [
+                {
+                    "name": "event",
+                    "code": 1,
+                    "columns": [
+                        {"name": "ts", "num": 0, "typ": "fixed32"},
+                        {"name": "text", "num": 1, "typ": "string"},
+                        {"name": "uid", "num": 2, "typ": "uint64"},
+                    ],
+                },
+                {"name": "point", "code": 2, "columns": [{"name": "ts", "num": 0, "typ": "fixed32"}]},
+            ]
+        )
+    )
+    events = [schema.pack({"ts": i, "text": "x" * i, "uid": i % 3}, "event") for i in range(10)]
+    points = [schema.pack({"ts": i}, "point") for i in range(10)]
+
+    match = schema.matcher("ts >= 5 and uid == 1 or text == 'xx'")
+    assert [schema.unpack(data)["ts"] for data in events if match(data)] == [2, 7]
+    # a memoryview of the record does too
+    assert [match(memoryview(data)) for data in events] == [match(data) for data in events]
+    # the points have no uid and text
+    assert not any(map(match, points))
+    assert sum(map(schema.matcher("ts < 3"), events + points)) == 6
+
+    with pytest.raises(Exception, match="column other not found"):
+        schema.matcher("other > 1")
@@ -0,0 +1,112 @@
+from xxdb.engine.buffer.replacer import getReplacer, LruReplacer
+
+
+class FakePage:
+    def __init__(self):
+        self.pin_cnt = 0
+
+    @property
+    def evictable(self):
+        return self.pin_cnt == 0
+
+
+def test_lru():
+    replacer = getReplacer("lru")
+    assert isinstance(replacer, LruReplacer)
+
+    pool = {pageid: FakePage() for pageid in range(4)}
+    for pageid in (0, 1, 2, 3, 0):
+        replacer.record_access(pageid)
+
+    assert replacer.evict(pool, ()) == 1
+    del pool[1]
+
+    # pinned and in-flight pages are skipped, but keep their position
+    pool[2].pin_cnt = 1
+    assert replacer.evict(pool, {3}) == 0
+    del pool[0]
+
+    pool[2].pin_cnt = 0
+    assert replacer.evict(pool, ()) == 2
+    del pool[2]
+    assert replacer.evict(pool, ()) == 3
+    del pool[3]
+    assert replacer.evict(pool, ()) is None
+
+
+def test_lru_forgets_pages_left_the_pool():
+    replacer = LruReplacer()
+    pool = {pageid: FakePage() for pageid in range(3)}
+    for pageid in range(3):
+        replacer.record_access(pageid)
+
+    del pool[0]
+    assert replacer.evict(pool, ()) == 1
+    assert len(replacer._order) == 1
+
+
+def test_lruk():
+    replacer = getReplacer("lru-2", 4)
+    pool = {pageid: FakePage() for pageid in range(4)}
+
+    # 0 and 1 are referenced twice, 2 and 3 once
+    for pageid in (0, 1, 0, 1, 2, 3):
+        replacer.record_access(pageid)
+
+    # pages with less than k references go first, in lru order
+    assert replacer.evict(pool, ()) == 2
+    del pool[2]
+    pool[3].pin_cnt = 1
+    assert replacer.evict(pool, ()) == 0
+    del pool[0]
+
+    # an evicted page keeps its history when it comes back
+    pool[0] = FakePage()
+    replacer.record_access(0)
+    pool[3].pin_cnt = 0
+    assert replacer.evict(pool, ()) == 3
+    del pool[3]
+    assert replacer.evict(pool, ()) == 1
+
+
+def test_lruk_correlated_period():
+    replacer = getReplacer("lru-2", 4, {"correlated_period": 2})
+    pool = {pageid: FakePage() for pageid in range(3)}
+
+    # back to back accesses are a single reference
+    for pageid in (0, 0, 1, 2, 1):
+        replacer.record_access(pageid)
+
+    # 2 is still in its correlated period, 0 is not
+    assert replacer.evict(pool, ()) == 0
+    del pool[0]
+    # nothing else is eligible, fall back to the best candidate
+    assert replacer.evict(pool, ()) == 1
+
+
+def test_arc():
+    replacer = getReplacer("arc", 2)
+    pool = {}
+
+    def access(pageid):
+        if pageid not in pool:
+            if len(pool) >= 2:
+                del pool[replacer.evict(pool, ())]
+            pool[pageid] = FakePage()
+        replacer.record_access(pageid)
+
+    # 0 is seen twice, so a stream of new pages churns t1 only
+    for pageid in (0, 0, 1, 2, 3):
+        access(pageid)
+    assert 0 in pool
+    assert replacer.target == 0
+
+    # a hit in the recency ghost list grows the target of t1
+    access(2)
+    assert replacer.target == 1
+
+    # ghost lists stay bounded by the capacity
+    for pageid in range(10, 100):
+        access(pageid)
+    assert len(replacer._t1) + len(replacer._b1) <= 2
+    assert len(replacer._t1) + len(replacer._t2) + len(replacer._b1) + len(replacer._b2) <= 4
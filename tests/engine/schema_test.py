@@ -1,3 +1,8 @@
+from array import array
+
+import pytest
+from pb_encoding.encoder import PackField
+
 from xxdb.engine.schema import Schema, SchemasConfig
 
 
@@ -29,3 +34,121 @@ def test():
     data = schema.pack(doc1_in, "test_schema1")
     doc1_out = {"ts": 1, "uid": 1, "text": "hello", "schema_": "test_schema1"}
     assert schema.unpack(data) == doc1_out
+
+
+def test_codecs():
+    types = ["int32", "sint64", "fixed32", "double", "uint64", "string", "sfixed64", "float", "bytes", "sint32"]
+    columns = [{"name": f"c{i}", "num": i, "typ": typ} for i, typ in enumerate(types)]
+    schema = Schema(SchemasConfig.parse_obj([{"name": "s", "code": 3, "columns": columns}]))
+
+    for values in (
+        [1, -1, 7, 0.5, 1 << 60, "hi", -5, 1.5, b"\x00", 63],
+        [-1, 1 << 40, 1 << 31, -2.5, 200, "é" * 100, 1 << 62, -0.25, b"b" * 300, -9000],
+    ):
+        doc = {col["name"]: value for col, value in zip(columns, values)}
+        data = schema.pack(doc, "s")
+        # as pb_encoding encodes the columns one by one
+        assert data == b"\x03" + b"".join(PackField(typ, value) for typ, value in zip(types, values))
+        assert schema.unpack(data) == {**doc, "schema_": "s"}
+
+    with pytest.raises(Exception, match="column c3 not found"):
+        schema.pack({"c0": 1, "c1": 1, "c2": 1}, "s")
+
+
+def test_unpack_columns():
+    schema = Schema(
+        SchemasConfig.parse_obj(
+            [
+                {
+                    "name": "point",
+                    "code": 1,
+                    "columns": [
+                        {"name": "ts", "num": 0, "typ": "fixed32"},
+                        {"name": "value", "num": 1, "typ": "double"},
+                    ],
+                },
+                {
+                    "name": "event",
+                    "code": 2,
+                    "columns": [
+                        {"name": "ts", "num": 0, "typ": "fixed32"},
+                        {"name": "text", "num": 1, "typ": "string"},
+                    ],
+                },
+            ]
+        )
+    )
+    assert schema.unpack_columns([]) == {"schema_": []}
+
+    points = [schema.pack({"ts": i, "value": i / 2}, "point") for i in range(5)]
+    columns = schema.unpack_columns(points)
+    assert columns == {"ts": array("I", range(5)), "value": array("d", [0, 0.5, 1, 1.5, 2]), "schema_": ["point"] * 5}
+
+    events = [schema.pack({"ts": i, "text": "x" * i}, "event") for i in range(3)]
+    columns = schema.unpack_columns(events)
+    assert columns["ts"] == array("I", range(3)) and columns["text"] == ["", "x", "xx"]
+
+    # the columns of all the schemas, None for the records without one
+    columns = schema.unpack_columns([points[0], events[1], points[2]])
+    assert columns == {
+        "ts": array("I", [0, 1, 2]),
+        "value": [0, None, 1],
+        "text": [None, "x", None],
+        "schema_": ["point", "event", "point"],
+    }
+    data_list = points + events
+    columns = schema.unpack_columns(data_list)
+    assert [schema.unpack(data) for data in data_list] == [
+        {name: column[i] for name, column in columns.items() if column[i] is not None} for i in range(len(data_list))
+    ]
+
+
+def test_projection():
+    schema = Schema(
+        SchemasConfig.parse_obj(
+            [
+                {
+                    "name": "event",
+                    "code": 1,
+                    "columns": [
+                        {"name": "ts", "num": 0, "typ": "fixed32"},
+                        {"name": "uid", "num": 1, "typ": "uint64"},
+                        {"name": "text", "num": 2, "typ": "string"},
+                        {"name": "value", "num": 3, "typ": "double"},
+                        {"name": "delta", "num": 4, "typ": "sint32"},
+                    ],
+                },
+                {
+                    "name": "point",
+                    "code": 2,
+                    "columns": [
+                        {"name": "ts", "num": 0, "typ": "fixed32"},
+                        {"name": "value", "num": 1, "typ": "double"},
+                    ],
+                },
+            ]
+        )
+    )
+    data_list = [
+        schema.pack({"ts": i, "uid": i << 30, "text": "x" * i * 50, "value": i / 4, "delta": -i}, "event")
+        for i in range(4)
+    ] + [schema.pack({"ts": 9, "value": 0.5}, "point")]
+
+    for columns in (["ts"], ["uid", "delta"], ["text"], ["value", "ts"], []):
+        expected = [
+            {k: v for k, v in schema.unpack(data).items() if k in columns or k == "schema_"} for data in data_list
+        ]
+        assert [schema.unpack(data, columns) for data in data_list] == expected
+        project = schema.projector(columns)
+        projected = [project(data) for data in data_list]
+        assert [schema.unpack(data, columns, projected=True) for data in projected] == expected
+        assert schema.unpack_columns(projected, columns, projected=True) == schema.unpack_columns(data_list, columns)
+
+    # only the bytes of the columns are left
+    assert len(schema.projector(["ts"])(data_list[3])) == 1 + 4
+    assert schema.unpack_columns(data_list[-1:] * 3, ["value"]) == {
+        "value": array("d", [0.5] * 3),
+        "schema_": ["point"] * 3,
+    }
+    with pytest.raises(Exception, match="column other not found"):
+        schema.unpack(data_list[0], ["ts", "other"])
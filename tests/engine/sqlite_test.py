@@ -1,3 +1,5 @@
+import pytest
+
 from xxdb.engine.index import getIndex, IndexConfig
 
 
@@ -8,3 +10,36 @@ def test(tmp_path):
     assert idx[1] == 1
     assert idx[2] is None
     assert 1 in idx
+
+
+def test_batch(tmp_path):
+    config = IndexConfig(**{"typ": "sqlite", "key_size": 8, "value_size": 8, "params": {"batch_size": 100}})
+    idx = getIndex("test", tmp_path, config)
+
+    for i in range(250):
+        idx[i] = i + 1
+    # 2 batches went in, the rest waits for flush
+    assert len(idx._pending) == 50
+    assert idx[10] == 11 and idx[240] == 241
+    assert len(idx) == 250
+    idx.flush()
+    assert len(idx._pending) == 0
+    idx[1000] = 1
+    idx.close()
+
+    idx = getIndex("test", tmp_path, config)
+    assert sorted(idx) == list(range(250)) + [1000]
+    assert idx[249] == 250
+    idx.close()
+
+
+def test_pragmas(tmp_path):
+    config = IndexConfig(**{"typ": "sqlite", "key_size": 8, "value_size": 8})
+    idx = getIndex("test", tmp_path, config)
+    # FULL, the wal of the db goes once flush returns
+    assert idx._conn.execute("PRAGMA synchronous;").fetchone()[0] == 2
+    idx.close()
+
+    config.params = {"synchronous": "normal; drop table kv"}
+    with pytest.raises(Exception, match="bad synchronous"):
+        getIndex("test", tmp_path, config)
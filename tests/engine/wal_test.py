@@ -0,0 +1,143 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from xxdb.engine.config import InstanceSettings, IOConfig, WalConfig
+from xxdb.engine.db import DB, create
+from xxdb.engine.disk import IOScheduler
+from xxdb.engine.index.hashtable import HashTable
+from xxdb.engine.wal import Wal, WalRecord
+
+
+def test_replay(tmp_path):
+    async def main():
+        sched = IOScheduler(IOConfig())
+        wal = Wal("test", tmp_path, WalConfig(enable=True), sched)
+        wal.open()
+        await asyncio.gather(*[wal.append(i, i // 2, i % 2 + 1, b"data %d" % i) for i in range(10)])
+        await wal.close()
+
+        # a torn record at the end
+        (fpath,) = tmp_path.glob("test.*.wal.xxdb")
+        with fpath.open("ab") as f:
+            f.write(Wal.HEADER.pack(0, 100, 0, 0, 0) + b"torn")
+
+        assert list(wal.replay()) == [WalRecord(i, i // 2, i % 2 + 1, b"data %d" % i) for i in range(10)]
+
+        # a new segment is started after the existing ones
+        wal.open()
+        await wal.append(10, 5, 1, b"data 10")
+        assert await wal.roll() == 2
+        # nothing to roll
+        assert await wal.roll() == 2
+        await wal.close()
+        assert [seq for seq, _ in wal.segments()] == [0, 1, 2]
+        assert list(wal.replay())[-1] == WalRecord(10, 5, 1, b"data 10")
+
+        wal.remove_segments_before(2)
+        assert [seq for seq, _ in wal.segments()] == [2]
+        await sched.close()
+
+    asyncio.run(main())
+
+
+def test_recovery(tmp_path):
+    cfg_fpath = tmp_path / "test.json"
+    cfg_fpath.write_text(json.dumps({"disk": {"page_size": 512}}))
+    meta_dpath = create("test", cfg_fpath)
+    settings = InstanceSettings(wal=WalConfig(enable=True), prometheus={"enable": False})
+
+    async def crash():
+        db = DB("test", meta_dpath, settings)
+        await db.init()
+        for i in range(100):
+            await db.put(i % 10, b"before %d" % i)
+        await db.flush()
+        await asyncio.gather(*[db.put(i % 10, b"after %d" % i) for i in range(100)])
+        # gone without writing the pages back
+
+    async def recover():
+        db = DB("test", meta_dpath, settings)
+        await db.init()
+        records = await db.get(3)
+        assert records == [b"before %d" % i for i in range(3, 100, 10)] + [b"after %d" % i for i in range(3, 100, 10)]
+        await db.put(3, b"later")
+        await db.close()
+
+        db = DB("test", meta_dpath, settings)
+        await db.init()
+        assert (await db.get(3))[-2:] == [b"after 93", b"later"]
+        await db.close()
+
+    asyncio.run(crash())
+    asyncio.run(recover())
+
+
+def test_checkpoint_sync(tmp_path, monkeypatch):
+    cfg_fpath = tmp_path / "test.json"
+    cfg_fpath.write_text(json.dumps({"disk": {"page_size": 512}}))
+    meta_dpath = create("test", cfg_fpath)
+    synced = []
+    sync = HashTable.sync
+    monkeypatch.setattr(HashTable, "sync", lambda self: synced.append(threading.current_thread()) or sync(self))
+
+    async def main(wal: bool):
+        db = DB("test", meta_dpath, InstanceSettings(wal=WalConfig(enable=wal), prometheus={"enable": False}))
+        await db.init()
+        await db.put(1, b"data")
+        await db.flush()
+        await db.close()
+
+    # nothing to make durable without the wal
+    asyncio.run(main(False))
+    assert synced == []
+    # the checkpoint syncs the index, off the event loop
+    asyncio.run(main(True))
+    assert synced and threading.main_thread() not in synced
+
+
+def test_checkpoint_write_error(tmp_path):
+    cfg_fpath = tmp_path / "test.json"
+    cfg_fpath.write_text(json.dumps({"disk": {"page_size": 512}}))
+    meta_dpath = create("test", cfg_fpath)
+    settings = InstanceSettings(
+        wal=WalConfig(enable=True),
+        buffer_pool={"max_pages": 4, "cleaner_low_watermark": 0.3, "cleaner_high_watermark": 0.5},
+        prometheus={"enable": False},
+    )
+
+    async def main():
+        db = DB("test", meta_dpath, settings)
+        await db.init()
+        # the first write, the cleaner's, fails once the flush waits for it
+        writing, failing = asyncio.Event(), asyncio.Event()
+        write_pages = db._disk.write_pages
+
+        async def fail_write_pages(pages):
+            if writing.is_set():
+                return await write_pages(pages)
+            writing.set()
+            await failing.wait()
+            raise OSError("disk failed")
+
+        db._disk.write_pages = fail_write_pages
+        for key in range(4):
+            await db.put(key, b"data %d" % key)
+        await asyncio.wait_for(writing.wait(), 1)
+
+        flush = asyncio.create_task(db.flush())
+        await asyncio.sleep(0.1)
+        failing.set()
+        with pytest.raises(Exception, match="page cleaner failed"):
+            await flush
+        # the wal of the records not on disk stays
+        assert [seq for seq, _ in db._wal.segments()] == [0, 1]
+
+        await db.flush()
+        assert [seq for seq, _ in db._wal.segments()] == [1]
+        assert [await db.get(key) for key in range(4)] == [[b"data %d" % key] for key in range(4)]
+        await db.close()
+
+    asyncio.run(main())
@@ -1,3 +1,4 @@
+from .buffer_pool import BufferPool, BufferPoolFullError
 from .buffer_pool_manager import BufferPoolManager
 
-__all__ = ('BufferPoolManager',)
+__all__ = ('BufferPoolManager', 'BufferPool', 'BufferPoolFullError')
@@ -0,0 +1,216 @@
+import asyncio
+import logging
+from collections.abc import Mapping
+from typing import TYPE_CHECKING, Optional
+
+from xxdb.engine.config import BufferPoolConfig as BufferPoolConfig
+from xxdb.engine.disk import Page
+from .replacer import getReplacer
+
+if TYPE_CHECKING:
+    from .buffer_pool_manager import BufferPoolManager
+
+__all__ = ("BufferPool", "BufferPoolConfig", "BufferPoolFullError")
+
+logger = logging.getLogger(__name__)
+
+# the replacer sees (member_id << PAGEID_BITS | pageid), pageids fit in 4 bytes
+PAGEID_BITS = 32
+PAGEID_MASK = (1 << PAGEID_BITS) - 1
+
+
+class BufferPoolFullError(Exception):
+    ...
+
+
+# all the pages of the members, passed to the replacer as its pool
+class _PoolView(Mapping):
+    __slots__ = ("_members",)
+
+    def __init__(self, members: dict[int, "BufferPoolManager"]):
+        self._members = members
+
+    def __getitem__(self, key: int) -> Page:
+        return self._members[key >> PAGEID_BITS].pool[key & PAGEID_MASK]
+
+    def get(self, key: int, default=None):
+        member = self._members.get(key >> PAGEID_BITS, None)
+        if member is None:
+            return default
+        return member.pool.get(key & PAGEID_MASK, default)
+
+    def __iter__(self):
+        for member_id, member in self._members.items():
+            for pageid in member.pool:
+                yield member_id << PAGEID_BITS | pageid
+
+    def __len__(self) -> int:
+        return sum(len(member.pool) for member in self._members.values())
+
+
+# passed to the replacer as its wait_list
+class _Unevictable:
+    __slots__ = ("_members", "_clean_only")
+
+    def __init__(self, members: dict[int, "BufferPoolManager"], clean_only: bool):
+        self._members = members
+        self._clean_only = clean_only
+
+    def __contains__(self, key) -> bool:
+        member = self._members[key >> PAGEID_BITS]
+        pageid = key & PAGEID_MASK
+        if pageid in member._fetching_pages:
+            return True
+        return self._clean_only and member.pool[pageid].is_dirty
+
+
+# The frames of one or more BufferPoolManagers: the page / byte budget, the replacer and
+# the background cleaner. Each BufferPoolManager owns one by default, a single instance
+# can also be shared by all the databases of a process, so memory goes to whichever is hot.
+class BufferPool:
+    def __init__(self, config: BufferPoolConfig):
+        self.config = config
+        self.max_pages = config.max_pages
+        self.max_bytes = config.max_bytes
+        self.replacer = getReplacer(config.replacer, config.max_pages, config.replacer_params)
+
+        self.used_pages = 0
+        self.used_bytes = 0
+        # frames taken by pages being read in
+        self._reserved_pages = 0
+        self._reserved_bytes = 0
+
+        self._members: dict[int, "BufferPoolManager"] = {}
+        self._next_member_id = 0
+        self._view = _PoolView(self._members)
+
+        # the cleaner keeps low_watermark ~ high_watermark of the budget free,
+        # so fetch_page never has to write a page out before reading another one in
+        self.low_watermark = self.config.cleaner_low_watermark
+        self.high_watermark = max(self.low_watermark, self.config.cleaner_high_watermark)
+        self._cleaner_task: Optional[asyncio.Task] = None
+        self._cleaner_wakeup = asyncio.Event()
+        self._cleaner_done = asyncio.Event()
+        self._cleaner_freed = 0
+
+    @property
+    def headroom(self) -> float:
+        """the free fraction of the budget"""
+        headroom = 1 - (self.used_pages + self._reserved_pages) / self.max_pages
+        if self.max_bytes:
+            headroom = min(headroom, 1 - (self.used_bytes + self._reserved_bytes) / self.max_bytes)
+        return headroom
+
+    def register(self, member: "BufferPoolManager") -> int:
+        member_id = self._next_member_id
+        self._next_member_id += 1
+        self._members[member_id] = member
+        return member_id
+
+    async def unregister(self, member_id: int) -> None:
+        member = self._members.pop(member_id)
+        for page in member.pool.values():
+            self.discharge(page)
+
+        if not self._members and self._cleaner_task is not None:
+            self._cleaner_task.cancel()
+            try:
+                await self._cleaner_task
+            except asyncio.CancelledError:
+                ...
+
+    def record_access(self, member_id: int, pageid: int) -> None:
+        self.replacer.record_access(member_id << PAGEID_BITS | pageid)
+
+    def charge(self, page: Page) -> None:
+        page.nbytes_charged = page.nbytes
+        self.used_pages += 1
+        self.used_bytes += page.nbytes_charged
+        self._check_watermark()
+
+    # the page has grown or shrunk since it was charged
+    def recharge(self, page: Page) -> None:
+        nbytes = page.nbytes
+        self.used_bytes += nbytes - page.nbytes_charged
+        page.nbytes_charged = nbytes
+        self._check_watermark()
+
+    def discharge(self, page: Page) -> None:
+        self.used_pages -= 1
+        self.used_bytes -= page.nbytes_charged
+
+    def _is_full(self, nbytes: int) -> bool:
+        if self.used_pages + self._reserved_pages + 1 > self.max_pages:
+            return True
+        return bool(self.max_bytes) and self.used_bytes + self._reserved_bytes + nbytes > self.max_bytes
+
+    # take a frame for a page about to be read in, evicting clean pages if needed
+    async def reserve(self, nbytes: int) -> None:
+        while self._is_full(nbytes):
+            if await self._evict_clean():
+                continue
+            # everything evictable is dirty, let the cleaner write some out
+            self._cleaner_done.clear()
+            self._wake_cleaner()
+            await self._cleaner_done.wait()
+            if self._cleaner_freed == 0 and not await self._evict_clean():
+                raise BufferPoolFullError(
+                    f"no evictable page in the buffer pool (pages: {self.used_pages}, bytes: {self.used_bytes})"
+                )
+        self._reserved_pages += 1
+        self._reserved_bytes += nbytes
+
+    def release(self, nbytes: int) -> None:
+        self._reserved_pages -= 1
+        self._reserved_bytes -= nbytes
+
+    async def _evict_clean(self) -> bool:
+        key = self.replacer.evict(self._view, _Unevictable(self._members, clean_only=True))  # type: ignore
+        if key is None:
+            return False
+        member = self._members[key >> PAGEID_BITS]
+        member._pool_remove(key & PAGEID_MASK)
+        await member._emit("evict")
+        return True
+
+    def _check_watermark(self) -> None:
+        if self.headroom < self.low_watermark:
+            self._wake_cleaner()
+
+    def _wake_cleaner(self) -> None:
+        if self._cleaner_task is None or self._cleaner_task.done():
+            self._cleaner_task = asyncio.create_task(self._run_cleaner())
+        self._cleaner_wakeup.set()
+
+    async def _run_cleaner(self) -> None:
+        while 1:
+            await self._cleaner_wakeup.wait()
+            self._cleaner_wakeup.clear()
+
+            freed = 0
+            try:
+                victims: dict[int, list[Page]] = {}
+                wait_list = _Unevictable(self._members, clean_only=False)
+                try:
+                    while self.headroom < self.high_watermark:
+                        key = self.replacer.evict(self._view, wait_list)  # type: ignore
+                        if key is None:
+                            break
+                        member_id = key >> PAGEID_BITS
+                        page = self._members[member_id]._pool_remove(key & PAGEID_MASK)
+                        victims.setdefault(member_id, []).append(page)
+                except Exception as exc:
+                    # the pages taken out of the pool so far are written back still
+                    logger.error(f"page cleaner failed to pick pages: {exc!r}")
+
+                freed = sum(
+                    await asyncio.gather(
+                        *[self._members[member_id]._write_back(pages) for member_id, pages in victims.items()]
+                    )
+                )
+            except Exception as exc:
+                logger.error(f"page cleaner failed: {exc!r}")
+            finally:
+                # reserve waits for this, whatever happened
+                self._cleaner_freed = freed
+                self._cleaner_done.set()
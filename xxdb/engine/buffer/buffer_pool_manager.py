@@ -1,110 +1,237 @@
-from concurrent.futures import ThreadPoolExecutor
 import asyncio
 import logging
+import time
 from contextlib import asynccontextmanager
+from typing import Any, Coroutine, Optional
 from weakref import WeakValueDictionary
 
 from xxdb.engine.config import BufferPoolConfig as BufferPoolConfig
 from xxdb.engine.disk import Page, Disk
 from xxdb.utils.event import EventEmitter
-from .replacer import getReplacer
+from .buffer_pool import BufferPool, BufferPoolFullError
 
-__all__ = ("BufferPoolManager", "BufferPoolConfig")
+__all__ = ("BufferPoolManager", "BufferPoolConfig", "BufferPoolFullError")
 
 logger = logging.getLogger(__name__)
 
 
 class BufferPoolManager(EventEmitter):
-    def __init__(self, disk: Disk, config: BufferPoolConfig):
+    # the max amount of pages handed to the disk in one write_pages call
+    FLUSH_BATCH_SIZE = 8192
+
+    # buffer_pool: share the frames with other BufferPoolManagers, config is ignored then
+    def __init__(self, disk: Disk, config: BufferPoolConfig, buffer_pool: Optional[BufferPool] = None):
         super().__init__()
         self.disk = disk
         self.config = config
 
         self.pool: dict[int, Page] = {}
-        self.replacer = getReplacer(self.config.replacer)
         self.dirty_pageids: set[int] = set()
-        self._max_page_amount = self.config.max_pages
-        self._thread_pool = ThreadPoolExecutor()
         self._flushing_pages: dict[int, asyncio.Event] = WeakValueDictionary()  # type: ignore
         self._fetching_pages: dict[int, asyncio.Event] = WeakValueDictionary()  # type: ignore
 
+        self._owns_buffer_pool = buffer_pool is None
+        self.buffer_pool = BufferPool(config) if buffer_pool is None else buffer_pool
+        self._member_id = self.buffer_pool.register(self)
+        self.used_bytes = 0
+        # the last error of the cleaner writing pages, flush_all raises it if it changed meanwhile
+        self._write_error: Optional[Exception] = None
+
+    @property
+    def replacer(self):
+        return self.buffer_pool.replacer
+
     def new_page(self) -> int:  # pageid
         page = self.disk.new_page()
         page.is_dirty = True
         self.dirty_pageids.add(page.id)
-        self.pool[page.id] = page
+        self._pool_add(page)
+        # let the replacer know the page, it may not be fetched before the next eviction
+        self.buffer_pool.record_access(self._member_id, page.id)
         return page.id
 
     @asynccontextmanager
     async def fetch_page(self, pageid):
-        if len(self.pool) >= self._max_page_amount and not await self.try_evict():
-            raise Exception()
-
         page = self.pool.get(pageid, None)
-
         if page is None:
-            if pageid in self._flushing_pages:
-                flush_event = self._flushing_pages[pageid]
-                await flush_event.wait()
-
-            if pageid in self._fetching_pages:
-                fetch_event = self._fetching_pages[pageid]
-                await fetch_event.wait()
-                page = self.pool[pageid]
-            else:
-                fetch_event = asyncio.Event()
-                self._fetching_pages[pageid] = fetch_event
-                page = await self.disk.read_page(pageid)
-                fetch_event.set()
-                self.pool[pageid] = page
-
-            # page = await asyncio.to_thread(self.disk.read_page, pageid)
+            page = await self._load_page(pageid)
 
-            # loop = asyncio.get_running_loop()
-            # page = await loop.run_in_executor(self._thread_pool, self.disk.read_page, pageid)
-
-        self.replacer.record_access(pageid)
+        self.buffer_pool.record_access(self._member_id, pageid)
         page.pin()
         try:
             yield page
         finally:
             if page.is_dirty:
                 self.dirty_pageids.add(page.id)
+                self._pool_recharge(page)
             page.unpin()
 
-    async def flush_all(self) -> None:
+    # fetch_page for many pages at once, pageid -> page, all of them pinned inside. the ones not
+    # in the pool are read in concurrently, in pageid order so the scheduler merges adjacent ones;
+    # the caller keeps them fewer than the pool holds
+    @asynccontextmanager
+    async def fetch_pages(self, pageids: list[int]):
+        results = await asyncio.gather(
+            *[self._pin_page(pageid) for pageid in sorted(set(pageids))], return_exceptions=True
+        )
+        pages = {page.id: page for page in results if isinstance(page, Page)}
+        try:
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+            yield pages
+        finally:
+            for page in pages.values():
+                if page.is_dirty:
+                    self.dirty_pageids.add(page.id)
+                    self._pool_recharge(page)
+                page.unpin()
+
+    async def _pin_page(self, pageid: int) -> Page:
+        page = self.pool.get(pageid, None)
+        if page is None:
+            page = await self._load_page(pageid)
+        # pinned before anything else runs, the other reads can't evict it
+        self.buffer_pool.record_access(self._member_id, pageid)
+        page.pin()
+        return page
+
+    def _pool_add(self, page: Page) -> None:
+        self.pool[page.id] = page
+        self.buffer_pool.charge(page)
+        self.used_bytes += page.nbytes_charged
+
+    def _pool_recharge(self, page: Page) -> None:
+        self.used_bytes -= page.nbytes_charged
+        self.buffer_pool.recharge(page)
+        self.used_bytes += page.nbytes_charged
+
+    def _pool_remove(self, pageid: int) -> Page:
+        page = self.pool.pop(pageid)
+        self.buffer_pool.discharge(page)
+        self.used_bytes -= page.nbytes_charged
+        return page
+
+    async def _load_page(self, pageid) -> Page:
         while 1:
-            if not self.dirty_pageids:
+            if (page := self.pool.get(pageid, None)) is not None:
+                return page
+            # the page is being written out or read in by someone else
+            if (event := self._flushing_pages.get(pageid, None)) is not None and not event.is_set():
+                await event.wait()
+            elif (event := self._fetching_pages.get(pageid, None)) is not None and not event.is_set():
+                await event.wait()
+            else:
                 break
-            pageid = self.dirty_pageids.pop()
-            # with page_lock(pageid):
-            await self._flush_page(self.pool[pageid])
+
+        fetch_event = asyncio.Event()
+        self._fetching_pages[pageid] = fetch_event
+        nbytes = Page.estimate_nbytes(self.disk.page_size)
+        try:
+            await self.buffer_pool.reserve(nbytes)
+            try:
+                page = await self.disk.read_page(pageid)
+            finally:
+                self.buffer_pool.release(nbytes)
+            self._pool_add(page)
+        finally:
+            fetch_event.set()
+
+        return page
+
+    # called by the cleaner with pages it took out of the pool, the returned coroutine
+    # writes the dirty ones and tells how many pages stay out of the pool
+    def _write_back(self, pages: list[Page]) -> Coroutine[Any, Any, int]:
+        dirty_pages = sorted((page for page in pages if page.is_dirty), key=lambda page: page.id)
+        # mark them as being flushed right away, before anyone tries to read them back
+        flush_events = self._begin_flush(dirty_pages)
+        return self._finish_write_back(pages, dirty_pages, flush_events)
+
+    async def _finish_write_back(self, pages: list[Page], dirty_pages: list[Page], flush_events) -> int:
+        try:
+            await self._write_pages(dirty_pages, flush_events)
+        except Exception as exc:
+            logger.error(f"page cleaner failed to write pages: {exc!r}")
+            self._write_error = exc
+            self._keep_dirty(dirty_pages)
+            pages = [page for page in pages if not page.is_dirty]
+            dirty_pages = []
+
+        for _ in pages:
+            await self._emit("evict")
+        await self._emit("cleaner_run", len(dirty_pages))
+        return len(pages)
+
+    async def flush_all(self) -> None:
+        t0 = time.perf_counter()
+        write_error = self._write_error
+        pageids = sorted(self.dirty_pageids)
+        for i in range(0, len(pageids), self.FLUSH_BATCH_SIZE):
+            # the cleaner may have written some of them out meanwhile
+            pages = [self.pool.get(pageid, None) for pageid in pageids[i : i + self.FLUSH_BATCH_SIZE]]
+            await self._flush_pages([page for page in pages if page is not None and page.is_dirty])
+
+        # and the writes of the cleaner still going on
+        for flush_event in list(self._flushing_pages.values()):
+            await flush_event.wait()
+        # those of them that failed are dirty again, not on disk
+        if self._write_error is not write_error:
+            raise Exception("page cleaner failed to write pages during flush_all") from self._write_error
 
         await self.disk.flush()
 
+        if pageids:
+            elapsed = time.perf_counter() - t0
+            nbytes = len(pageids) * self.disk.page_size
+            logger.info(
+                f"flushed {len(pageids)} pages in {elapsed:.3f}s, "
+                f"{len(pageids) / elapsed:.0f} pages/s, {nbytes / elapsed / 1024 / 1024:.2f} MB/s"
+            )
+            await self._emit("flush_all", len(pageids), nbytes, elapsed)
+
     async def _flush_page(self, page: Page) -> None:
         if page.is_dirty:
+            await self._flush_pages([page])
+
+    # pages should be sorted by pageid, so the disk can write adjacent ones together
+    async def _flush_pages(self, pages: list[Page]) -> None:
+        try:
+            await self._write_pages(pages, self._begin_flush(pages))
+        except Exception:
+            self._keep_dirty(pages)
+            raise
+
+    def _begin_flush(self, pages: list[Page]) -> list[asyncio.Event]:
+        flush_events = []
+        for page in pages:
             # logger.debug(f"flush dirty page: {page.id}")
             page.is_dirty = False
             self.dirty_pageids.discard(page.id)
-            # await asyncio.to_thread(self.disk.write_page, page)
-            await self.disk.write_page(page)
-            await self._emit("flush")
-
-    async def try_evict(self) -> bool:
-        pageid_evicted = self.replacer.evict(self.pool, self._fetching_pages)  # type: ignore
-        if pageid_evicted is not None:
-            page = self.pool.pop(pageid_evicted)
-            flush_event = asyncio.Event()
-            self._flushing_pages[pageid_evicted] = flush_event
-            await self._flush_page(page)
-            flush_event.set()
-            # logger.debug(f"evict page: {pageid_evicted}")
-            await self._emit("evict")
-            return True
-
-        return False
+            # an evicted page must not be read back before the write finishes
+            flush_events.append(asyncio.Event())
+            self._flushing_pages[page.id] = flush_events[-1]
+        return flush_events
+
+    # the write of the pages failed, keep them in memory rather than losing the data
+    def _keep_dirty(self, pages: list[Page]) -> None:
+        for page in pages:
+            page.is_dirty = True
+            self.dirty_pageids.add(page.id)
+            if page.id not in self.pool:
+                self._pool_add(page)
+                # the replacer forgot it on eviction, it could not be picked again otherwise
+                self.buffer_pool.record_access(self._member_id, page.id)
+
+    async def _write_pages(self, pages: list[Page], flush_events: list[asyncio.Event]) -> None:
+        if not pages:
+            return
+        try:
+            await self.disk.write_pages(pages)
+        finally:
+            for flush_event in flush_events:
+                flush_event.set()
+        await self._emit("flush", len(pages))
 
     async def close(self) -> None:
         await self.flush_all()
-        self._thread_pool.shutdown()
+        await self.buffer_pool.unregister(self._member_id)
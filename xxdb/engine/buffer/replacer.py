@@ -1,5 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import Generic, Optional, TypeVar, Container, Mapping
+from collections import OrderedDict
+from heapq import heapify, heappop, heappush
+from typing import Any, Generic, Optional, TypeVar, Container, Mapping
 
 
 class Evictable:
@@ -18,7 +20,7 @@ class Replacer(ABC, Generic[E]):
         ...
 
     @abstractmethod
-    def evict(self, pool: dict[int, E]) -> Optional[int]:
+    def evict(self, pool: Mapping[int, E], wait_list: Container) -> Optional[int]:
         ...
 
 
@@ -36,41 +38,236 @@ class FifoReplacer(Replacer):
         return None
 
 
+# the OrderedDict keeps pageids from least to most recently used,
+# so both record_access and evict are O(1) (besides skipping pinned pages)
 class LruReplacer(Replacer):
     def __init__(self) -> None:
-        raise NotImplementedError
+        self._order: OrderedDict[int, None] = OrderedDict()
 
     def record_access(self, pageid: int):
-        ...
+        try:
+            self._order.move_to_end(pageid)
+        except KeyError:
+            self._order[pageid] = None
 
-    def evict(self, pool: dict[int, E]) -> Optional[int]:
-        ...
+    def evict(self, pool: Mapping[int, E], wait_list: Container) -> Optional[int]:
+        victim = None
+        stale = []
+        for pageid in self._order:
+            page = pool.get(pageid, None)
+            if page is None:
+                # the page has left the pool without going through us
+                stale.append(pageid)
+            elif page.evictable and pageid not in wait_list:
+                victim = pageid
+                break
+
+        for pageid in stale:
+            del self._order[pageid]
+        if victim is not None:
+            del self._order[victim]
+        return victim
+
+
+class _LrukEntry:
+    __slots__ = ("hist", "last", "version")
+
+    def __init__(self, hist: list[int], last: int) -> None:
+        # hist[i] is the time of the (i+1)-th most recent uncorrelated reference, 0 for none
+        self.hist = hist
+        self.last = last
+        self.version = 0
 
 
+# LRU-K (O'Neil et al. 1993), times are measured in accesses instead of wall clock.
+# The victim is the page with the oldest k-th most recent reference, pages with fewer
+# than k references go first (LRU among them). Accesses within `correlated_period`
+# of the previous one are treated as a single reference, and such pages are not
+# evicted until the period is over, unless there is no other choice.
 class LrukReplacer(Replacer):
-    def __init__(self, k: int) -> None:
+    def __init__(self, k: int, history_size: int = 0, correlated_period: int = 0) -> None:
+        if k < 1:
+            raise Exception("lru-k requires k >= 1")
         self.k = k
-        raise NotImplementedError
+        self._history_size = history_size
+        self._crp = correlated_period
+        self._clock = 0
+        self._resident: dict[int, _LrukEntry] = {}
+        # reference history of evicted pages, so pages coming back are not treated as new
+        self._history: OrderedDict[int, list[int]] = OrderedDict()
+        # (hist[k-1], hist[0], version, pageid), stale items are dropped lazily
+        self._heap: list[tuple[int, int, int, int]] = []
 
     def record_access(self, pageid: int):
-        ...
+        self._clock += 1
+        t = self._clock
+        entry = self._resident.get(pageid, None)
 
-    def evict(self, pool: dict[int, E]) -> Optional[int]:
-        ...
+        if entry is None:
+            hist = self._history.pop(pageid, None)
+            if hist is None:
+                hist = [0] * self.k
+            hist.insert(0, t)
+            hist.pop()
+            entry = self._resident[pageid] = _LrukEntry(hist, t)
+
+        elif t - entry.last > self._crp:
+            # close the correlated period: shift the history by its length
+            hist = entry.hist
+            correl_period = entry.last - hist[0]
+            for i in range(self.k - 1, 0, -1):
+                hist[i] = hist[i - 1] + correl_period if hist[i - 1] else 0
+            hist[0] = t
+            entry.last = t
+
+        else:
+            entry.last = t
+            return
+
+        entry.version += 1
+        heappush(self._heap, (entry.hist[-1], entry.hist[0], entry.version, pageid))
+        if len(self._heap) > 2 * len(self._resident) + 64:
+            self._compact()
+
+    def evict(self, pool: Mapping[int, E], wait_list: Container) -> Optional[int]:
+        skipped = []
+        victim = fallback = None
+        while self._heap:
+            item = heappop(self._heap)
+            pageid = item[3]
+            entry = self._resident.get(pageid, None)
+            if entry is None or entry.version != item[2]:
+                continue
+            page = pool.get(pageid, None)
+            if page is None:
+                # the page has left the pool without going through us
+                self._forget(pageid)
+                continue
+            skipped.append(item)
+            if not page.evictable or pageid in wait_list:
+                continue
+            if self._clock - entry.last <= self._crp:
+                if fallback is None:
+                    fallback = item
+                continue
+            victim = item
+            break
+
+        if victim is None:
+            victim = fallback
+        for item in skipped:
+            if item is not victim:
+                heappush(self._heap, item)
+
+        if victim is None:
+            return None
+        self._forget(victim[3])
+        return victim[3]
+
+    def _forget(self, pageid: int) -> None:
+        entry = self._resident.pop(pageid)
+        if self._history_size > 0:
+            self._history[pageid] = entry.hist
+            if len(self._history) > self._history_size:
+                self._history.popitem(last=False)
+
+    def _compact(self) -> None:
+        self._heap = [
+            (entry.hist[-1], entry.hist[0], entry.version, pageid) for pageid, entry in self._resident.items()
+        ]
+        heapify(self._heap)
+
+
+# ARC (Megiddo & Modha 2003). t1 holds pages seen once recently, t2 pages seen at least twice,
+# b1/b2 are ghost lists of pageids recently evicted from t1/t2. A hit in a ghost list moves
+# the target size of t1 towards recency (b1) or frequency (b2), so no k needs to be picked.
+# The ghost lists are bounded as in the paper: |t1| + |b1| <= capacity, all four <= 2 * capacity.
+class ArcReplacer(Replacer):
+    def __init__(self, capacity: int) -> None:
+        if capacity < 1:
+            raise Exception("arc replacer requires a positive capacity")
+        self._cap = capacity
+        self._p = 0.0
+        self._t1: OrderedDict[int, None] = OrderedDict()
+        self._t2: OrderedDict[int, None] = OrderedDict()
+        self._b1: OrderedDict[int, None] = OrderedDict()
+        self._b2: OrderedDict[int, None] = OrderedDict()
+
+    @property
+    def target(self) -> float:
+        """the adaptive target size of t1"""
+        return self._p
+
+    def record_access(self, pageid: int):
+        if pageid in self._t1:
+            del self._t1[pageid]
+            self._t2[pageid] = None
+        elif pageid in self._t2:
+            self._t2.move_to_end(pageid)
+        elif pageid in self._b1:
+            self._p = min(self._cap, self._p + max(len(self._b2) / len(self._b1), 1))
+            del self._b1[pageid]
+            self._t2[pageid] = None
+        elif pageid in self._b2:
+            self._p = max(0, self._p - max(len(self._b1) / len(self._b2), 1))
+            del self._b2[pageid]
+            self._t2[pageid] = None
+        else:
+            self._t1[pageid] = None
+            if len(self._t1) + len(self._b1) > self._cap and self._b1:
+                self._b1.popitem(last=False)
+            if len(self._t1) + len(self._t2) + len(self._b1) + len(self._b2) > 2 * self._cap and self._b2:
+                self._b2.popitem(last=False)
+
+    def evict(self, pool: Mapping[int, E], wait_list: Container) -> Optional[int]:
+        if self._t1 and len(self._t1) > self._p:
+            order = ((self._t1, self._b1), (self._t2, self._b2))
+        else:
+            order = ((self._t2, self._b2), (self._t1, self._b1))
+
+        for resident, ghost in order:
+            victim = None
+            stale = []
+            for pageid in resident:
+                page = pool.get(pageid, None)
+                if page is None:
+                    # the page has left the pool without going through us
+                    stale.append(pageid)
+                elif page.evictable and pageid not in wait_list:
+                    victim = pageid
+                    break
+
+            for pageid in stale:
+                del resident[pageid]
+            if victim is not None:
+                del resident[victim]
+                ghost[victim] = None
+                return victim
+
+        return None
 
 
-def getReplacer(typ: str) -> Replacer:
+# capacity: the max amount of pages in the pool
+# params: replacer specific options, see BufferPoolConfig.replacer_params
+def getReplacer(typ: str, capacity: int = 0, params: Optional[dict[str, Any]] = None) -> Replacer:
+    params = params or {}
     typ = typ.lower()
     if typ == "fifo":
         return FifoReplacer()
     elif typ == "lru":
         return LruReplacer()
+    elif typ == "arc":
+        return ArcReplacer(capacity)
     elif typ.startswith("lru-"):
         try:
             k = int(typ[4:])
         except Exception:
             raise Exception("Unexpected buffer pool replacer type")
         else:
-            return LrukReplacer(k)
+            return LrukReplacer(
+                k,
+                history_size=params.get("history_size", capacity),
+                correlated_period=params.get("correlated_period", 0),
+            )
     else:
         return FifoReplacer()
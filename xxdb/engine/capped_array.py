@@ -1,57 +1,189 @@
 # Referenced by: Page, http.ws_client, http.rest_client
 
-from typing import List
+from array import array
+from typing import List, Optional
 
+__all__ = ("CappedArray", "DATA_FORMATS")
 
+# the framing of the records, | size | data | each:
+# 1: the size in 2 bytes
+# 2: the size in a LEB128 varint, 1 byte below 128, 2 below 16k
+DATA_FORMATS = (1, 2)
+
+
+def _encode_size(size: int, data_format: int) -> bytes:
+    if data_format == 1:
+        return size.to_bytes(CappedArray.DATA_SIZE_COST, "little")
+    if size < 0x80:
+        return bytes((size,))
+    out = bytearray()
+    while size >= 0x80:
+        out.append((size & 0x7F) | 0x80)
+        size >>= 7
+    out.append(size)
+    return bytes(out)
+
+
+# the size at offset and the offset of the data after it
+def _decode_size(raw_data, offset: int, data_format: int) -> tuple[int, int]:
+    if data_format == 1:
+        return int.from_bytes(raw_data[offset : offset + CappedArray.DATA_SIZE_COST], "little"), offset + 2
+    b = raw_data[offset]
+    if b < 0x80:
+        return b, offset + 1
+    size = shift = 0
+    while b >= 0x80:
+        size |= (b & 0x7F) << shift
+        shift += 7
+        offset += 1
+        b = raw_data[offset]
+    return size | (b << shift), offset + 1
+
+
+# The records are kept in a ring buffer of capacity bytes, appending drops the oldest ones
+# by moving the head past them, no copy. dumps_data linearizes them, oldest first.
+# The offsets of the records in it are indexed once some of them are read by position
+# (_spans), appending keeps the index up then.
 class CappedArray:
-    # TODO: use varint instead of fixed size
+    # of data format 1
     DATA_SIZE_COST = 2
+    # of data format 2, enough for any page
+    MAX_DATA_SIZE_COST = 3
 
-    __slots__ = ("_data", "_cap", "_curr_size")
+    __slots__ = ("_data", "_cap", "_head", "_curr_size", "data_format", "_offsets")
 
-    def __init__(self, array_data: bytes, capacity: int):
-        self._data = bytearray(array_data)
+    def __init__(self, array_data: bytes, capacity: int, data_format: int = 1):
+        buffer = bytearray(capacity)
+        buffer[: len(array_data)] = array_data
+        self._init_buffer(buffer, capacity, len(array_data), data_format)
+
+    # size bytes of records from the start of buffer on, the first capacity bytes of it are used
+    def _init_buffer(self, buffer: bytearray, capacity: int, size: int, data_format: int) -> None:
+        self._data = buffer
         self._cap = capacity
-        self._curr_size = len(array_data)
+        self._head = 0
+        self._curr_size = size
+        self.data_format = data_format
+        self._offsets: Optional[array] = None
 
     @property
     def free_size(self) -> int:
         return self._cap - self._curr_size
 
     def append(self, data):
-        data_size = len(data)
-        self._ensure_space(self.DATA_SIZE_COST + data_size)
-        self._append(data_size.to_bytes(self.DATA_SIZE_COST, "little"))
+        data = _encode_size(len(data), self.data_format) + data
+        if len(data) > self._cap - self._curr_size:
+            self._ensure_space(len(data))
         self._append(data)
 
     def gonna_full(self, size) -> bool:
         return size > self.free_size
 
     def _ensure_space(self, size) -> None:
-        while self.gonna_full(size):
-            data_size = int.from_bytes(self._data[0 : self.DATA_SIZE_COST], "little")
-            self._data = self._data[data_size + self.DATA_SIZE_COST :]
-            self._curr_size -= data_size + self.DATA_SIZE_COST
+        data, cap, data_format = self._data, self._cap, self.data_format
+        head, curr_size = self._head, self._curr_size
+        dropped = 0
+        while size > cap - curr_size:
+            if head + self.MAX_DATA_SIZE_COST <= cap:
+                data_size, end = _decode_size(data, head, data_format)
+                cost = end - head
+            else:
+                raw_size = self._read(head, min(self.MAX_DATA_SIZE_COST, curr_size))
+                data_size, cost = _decode_size(raw_size, 0, data_format)
+            head += data_size + cost
+            if head >= cap:
+                head -= cap
+            curr_size -= data_size + cost
+            dropped += 1
+        self._head = head if curr_size else 0
+        self._curr_size = curr_size
+        if self._offsets is not None:
+            del self._offsets[:dropped]
+
+    def _read(self, offset: int, size: int) -> bytes:
+        end = offset + size
+        if end <= self._cap:
+            return self._data[offset:end]
+        return self._data[offset : self._cap] + self._data[: end - self._cap]
 
     def _append(self, data):
-        self._data[self._curr_size :] = data
+        tail = self._head + self._curr_size
+        if tail >= self._cap:
+            tail -= self._cap
+        if self._offsets is not None:
+            self._offsets.append(tail)
+        n = min(len(data), self._cap - tail)
+        self._data[tail : tail + n] = data[:n]
+        if n < len(data):
+            self._data[: len(data) - n] = data[n:]
         self._curr_size += len(data)
 
     def dumps_data(self) -> bytes:
-        return bytes(self._data)
+        head, end = self._head, self._head + self._curr_size
+        with memoryview(self._data) as view:
+            if end <= self._cap:
+                return bytes(view[head:end])
+            return b"".join((view[head : self._cap], view[: end - self._cap]))
 
     def retrieve(self) -> List[bytes]:
-        return self.RetrieveFromRaw(self._data)
+        if self._head + self._curr_size > self._cap:
+            return self.RetrieveFromRaw(self.dumps_data(), self.data_format)
+        with memoryview(self._data) as view:
+            return self.RetrieveFromRaw(view[self._head : self._head + self._curr_size], self.data_format)
+
+    # the offsets of the records in the ring buffer, oldest first
+    def _index(self) -> array:
+        if self._offsets is None:
+            offsets = array("H" if self._cap <= 0xFFFF else "I")
+            raw_data, p = self._linear(), 0
+            while p < self._curr_size:
+                offsets.append((self._head + p) % self._cap)
+                data_size, p = _decode_size(raw_data, p, self.data_format)
+                p += data_size
+            self._offsets = offsets
+        return self._offsets
+
+    def _linear(self):
+        if self._head + self._curr_size > self._cap:
+            return self.dumps_data()
+        return memoryview(self._data)[self._head : self._head + self._curr_size]
+
+    def count(self) -> int:
+        return len(self._index())
+
+    # the records from the start-th to the stop-th (the oldest is the 0-th) as the linear raw
+    # data and the (start, end) of each of them in it, only their sizes are read
+    def _spans(self, start: int = 0, stop: Optional[int] = None) -> tuple[bytes, list[tuple[int, int]]]:
+        offsets, raw_data = self._index(), self._linear()
+        head, cap, data_format = self._head, self._cap, self.data_format
+        spans = []
+        for offset in offsets[start:stop]:
+            data_size, p = _decode_size(raw_data, (offset - head) % cap, data_format)
+            spans.append((p, p + data_size))
+        return raw_data, spans  # type: ignore
+
+    # re-frames the records in data_format, the oldest are dropped if they don't fit any more
+    def convert(self, data_format: int) -> None:
+        data_list = self.retrieve()
+        self._head = self._curr_size = 0
+        self.data_format = data_format
+        self._offsets = None
+        for data in data_list:
+            # not the append of a subclass, re-framing is not appending (Page counts the appends)
+            CappedArray.append(self, data)
 
     @staticmethod
-    def RetrieveFromRaw(raw_data: bytes) -> List[bytes]:
+    def RetrieveFromRaw(raw_data: bytes, data_format: int = 1) -> List[bytes]:
         _curr_size = len(raw_data)
         p = 0
         data_list = []
         while p < _curr_size:
-            data_size = int.from_bytes(raw_data[p : p + CappedArray.DATA_SIZE_COST], "little")
-            p += CappedArray.DATA_SIZE_COST
+            data_size, p = _decode_size(raw_data, p, data_format)
             data_list.append(bytes(raw_data[p : p + data_size]))
             p += data_size
 
         return data_list
+
+    @staticmethod
+    def DumpsRaw(data_list: List[bytes], data_format: int = 1) -> bytes:
+        return b"".join(_encode_size(len(data), data_format) + data for data in data_list)
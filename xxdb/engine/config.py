@@ -7,32 +7,49 @@ from xxdb import __version__
 
 
 class DiskConfig(BaseModel):
-    typ: Literal['singlefile', 'multifile'] = 'singlefile'
+    typ: Literal['singlefile', 'multifile', 'mmap'] = 'singlefile'
     # TODO：validate the page_size is a multiple of 512
     page_size: int = 2048
     key_size: Literal[4, 8] = 8
+    # the framing of the records in a page, 1: 2 bytes sizes, 2: varint sizes
+    # the pages of the other format are rewritten in this one once they get dirty
+    # the ws clients before it was added read only 1
+    page_format: Literal[1, 2] = 2
 
     pageid_size: int = 0  # will be auto filled based on typ
 
     # which will be passed to the disk class
     # multifile needs a block_size, sized in MB
+    # mmap takes a grow_size, sized in MB, 64 by default
     params: dict[str, Any] = {}
 
     def __init__(self, **data):
         super().__init__(**data)
         self.pageid_size = {
             'singlefile': 4,
+            'mmap': 4,
             'multifile': 4,
         }[self.typ]
 
 
 class IndexConfig(BaseModel):
-    typ: Literal['sqlite', 'hashtable'] = 'hashtable'
+    typ: Literal['sqlite', 'hashtable', 'mmap_hash', 'compact', 'lsm'] = 'hashtable'
 
     key_size: int = 0  # will be auto filled by DbMeta
     value_size: int = 0  # will be auto filled by DbMeta
 
     # which will be passed to the index class
+    # mmap_hash accepts initial_capacity (slots) and max_load (0 ~ 1) of its table
+    # compact accepts merge_ratio and min_delta, the new entries are merged into its arrays
+    #   once there are max(min_delta, merge_ratio * entries) of them
+    # sqlite accepts journal_mode ("wal"), synchronous ("full"), cache_size, mmap_size
+    #   and batch_size, the new entries are inserted on flush or once there are batch_size of them
+    # lsm accepts memtable_size and run_size (entries), l0_runs (level 0 is merged into level 1 once
+    #   it has this many runs), level_ratio (size of a level to the one above), bits_per_key and
+    #   max_immutables (the frozen memtables waiting for their runs, the puts of new keys block
+    #   the event loop once there are this many, until the background thread writes one)
+    # any of them accepts bloom: true or {bits_per_key: 10, capacity: 65536}, a bloom filter
+    #   in front of the index answers the lookups of absent keys
     params: dict[str, Any] = {}
 
 
@@ -73,7 +90,19 @@ class DbMeta(BaseModel):
 
 class BufferPoolConfig(BaseModel):
     max_pages: int = 300_000
+    # memory budget of the pages in bytes, 0 means only max_pages applies
+    max_bytes: int = 0
+    # fifo | lru | lru-<k> | arc
     replacer: str = "fifo"
+    # which will be passed to the replacer
+    # lru-<k> accepts:
+    #   history_size: how many evicted pages to remember the references of, defaults to max_pages
+    #   correlated_period: accesses within this many accesses are counted as one reference
+    replacer_params: dict[str, Any] = {}
+    # a background cleaner evicts pages (writing the dirty ones) once the free part of the budget
+    # (max_pages and max_bytes) drops below cleaner_low_watermark, until it is cleaner_high_watermark
+    cleaner_low_watermark: float = 0.01
+    cleaner_high_watermark: float = 0.02
 
 
 # class SingleFileDiskConfig(BaseModel):
@@ -91,6 +120,22 @@ class BufferPoolConfig(BaseModel):
 #     config: Union[SingleFileDiskConfig, MultiFileDiskConfig] = Field(SingleFileDiskConfig(), discriminator='typ')
 
 
+class IOConfig(BaseModel):
+    # threads doing the block io of a db
+    workers: int = 4
+    # max pages queued for reading and for writing each, submitters wait beyond that
+    queue_depth: int = 1024
+
+
+class WalConfig(BaseModel):
+    # log every put before acknowledging it, and replay the log on DB.init()
+    enable: bool = False
+    # fsync each group commit, otherwise the records only reach the os
+    fsync: bool = True
+    # wait this long (ms) for more puts before a group commit
+    commit_delay: float = 0
+
+
 class PrometheusSettings(BaseModel):
     enable: bool = True
 
@@ -99,4 +144,6 @@ class InstanceSettings(BaseModel):
     with_schema: bool = True
     meta_path: Optional[FilePath] = None
     buffer_pool: BufferPoolConfig = BufferPoolConfig()
+    io: IOConfig = IOConfig()
+    wal: WalConfig = WalConfig()
     prometheus: PrometheusSettings = PrometheusSettings()
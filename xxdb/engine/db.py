@@ -1,14 +1,17 @@
+import asyncio
 import logging
 from pathlib import Path
-from typing import Literal, Union
+from typing import Iterable, Literal, Optional, Union
 
-from xxdb.engine.buffer import BufferPoolManager
-from xxdb.engine.disk import getDisk
+from xxdb.engine.buffer import BufferPoolManager, BufferPool
+from xxdb.engine.capped_array import CappedArray
+from xxdb.engine.disk import getDisk, IOScheduler
 from xxdb.engine.meta import MetaManager
 from xxdb.engine.metrics import PrometheusClient
 from xxdb.engine.config import InstanceSettings, DbMeta
 from xxdb.engine.schema import Schema, SchemasConfig
 from xxdb.engine.index import getIndex
+from xxdb.engine.wal import Wal
 from xxdb.utils import cmp_version
 
 __all__ = ("DB", "create", "InstanceSettings", "DbMeta")
@@ -17,11 +20,15 @@ logger = logging.getLogger(__name__)
 
 
 class DB:
+    # the most pages get_many and put_many pin at a time, a quarter of the buffer pool at most
+    MANY_BATCH_PAGES = 1024
+
     def __init__(
         self,
         name: str,
         meta_dpath: Union[str, Path],
         settings: InstanceSettings,
+        buffer_pool: Optional[BufferPool] = None,  # shared with other dbs, settings.buffer_pool is ignored then
     ):
         self._config = settings
         self._name = name
@@ -45,65 +52,267 @@ class DB:
         if self._meta.schemas and self._config.with_schema:
             self._schema = Schema(self._meta.schemas)
 
-        self._disk = getDisk(self._name, meta_dpath, self._meta.disk)
+        self._scheduler = IOScheduler(self._config.io)
+        self._disk = getDisk(self._name, meta_dpath, self._meta.disk, self._scheduler)
         self._idx = getIndex(self._name, meta_dpath, self._meta.index)
-        self._buffer = BufferPoolManager(self._disk, self._config.buffer_pool)
+        self._buffer = BufferPoolManager(self._disk, self._config.buffer_pool, buffer_pool)
+
+        self._wal = None
+        if self._config.wal.enable:
+            self._wal = Wal(self._name, meta_dpath, self._config.wal, self._scheduler)
 
         self._prom_client = None
         if self._config.prometheus.enable:
-            self._prom_client = PrometheusClient(self._buffer, self._name)
+            self._prom_client = PrometheusClient(self._buffer, self._name, self._scheduler, self._wal, self._idx)
+
+    # replay the wal, must be called before serving
+    async def init(self):
+        if self._wal is None:
+            return
+
+        n = 0
+        for record in self._wal.replay():
+            pageid = self._idx[record.key]
+            if pageid is None:
+                self._idx[record.key] = pageid = record.pageid
+            # the page may have been allocated but never written
+            while self._disk.next_pageid <= pageid:
+                self._buffer.new_page()
+
+            async with self._buffer.fetch_page(pageid) as page:
+                if record.page_lsn > page.lsn:
+                    page.append(record.data)
+                    page.lsn = record.page_lsn
+                    n += 1
+        logger.info(f"replayed {n} wal records")
+
+        self._wal.open()
+        await self.flush()
 
     @property
     def data_schemas(self) -> None | SchemasConfig:
         return self._meta.schemas
 
+    @property
+    def data_format(self) -> int:
+        """the framing of the records get(mode="raw") returns"""
+        return self._meta.disk.page_format
+
     async def close(self):
+        if self._wal is not None:
+            await self._wal.close()
         await self._buffer.close()
         await self._disk.close()
+        await self._scheduler.close()
         self._idx.close()
 
+    # the records of key, oldest first, or newest first if reverse
+    # after: only the ones appended after the after-th append to the page of key
+    # limit: at most this many, from the start of the order
+    # with_cursor: also return the number of the newest record returned, to pass as after next time
+    # mode "columns": the records decoded column by column, see Schema.unpack_columns
+    # columns: only these columns of the records, the others are not decoded; the records of
+    # mode "bytes" and "raw" are cut down to them, see Schema.projector
+    # where: only the records matching this predicate on their columns, like "ts > 100 and
+    # uid == 5", see Predicate; limit counts them, the cursor is the newest record looked at
     async def get(
         self,
         key: int,
-        mode: Literal["bytes", "dict", "raw"] = "bytes",
-    ) -> None | list[bytes] | list[dict] | bytes:
+        mode: Literal["bytes", "dict", "raw", "columns"] = "bytes",
+        *,
+        limit: Optional[int] = None,
+        reverse: bool = False,
+        after: Optional[int] = None,
+        with_cursor: bool = False,
+        columns: Optional[list[str]] = None,
+        where: Optional[str] = None,
+    ) -> None | list[bytes] | list[dict] | bytes | dict | tuple[list[bytes] | list[dict] | bytes | dict, int]:
+        match = self._check_get(mode, columns, where)
+
         pageid = self._idx[key]
         if pageid is None:
             return None
         async with self._buffer.fetch_page(pageid) as page:
-            if mode == "dict":
-                if not self._schema:
-                    raise Exception()
-                return [self._schema.unpack(_) for _ in page.retrieve()]
+            data, cursor = self._select(page, mode == "raw" and columns is None, limit, reverse, after, match)
 
-            elif mode == "bytes":
-                return page.retrieve()
+        data = self._decode(data, mode, columns)
+        return (data, cursor) if with_cursor else data
 
-            elif mode == "raw":
-                return page.dumps_data()
+    # get for many keys, the results in the order of keys (None for a key not found). the pages
+    # are fetched together, see MANY_BATCH_PAGES
+    async def get_many(
+        self,
+        keys: list[int],
+        mode: Literal["bytes", "dict", "raw", "columns"] = "bytes",
+        *,
+        limit: Optional[int] = None,
+        reverse: bool = False,
+        columns: Optional[list[str]] = None,
+        where: Optional[str] = None,
+    ) -> list[None | list[bytes] | list[dict] | bytes | dict]:
+        match = self._check_get(mode, columns, where)
+        raw = mode == "raw" and columns is None
 
-        raise Exception()
+        pageids = [self._idx[key] for key in keys]
+        selected: dict[int, list[bytes] | bytes] = {}
+        for batch in self._page_batches(pageid for pageid in pageids if pageid is not None):
+            async with self._buffer.fetch_pages(batch) as pages:
+                for pageid, page in pages.items():
+                    selected[pageid] = self._select(page, raw, limit, reverse, None, match)[0]
+        return [None if pageid is None else self._decode(selected[pageid], mode, columns) for pageid in pageids]
 
-    async def put(self, key, data: bytes | dict, *, schema: str = '') -> None:
-        if isinstance(data, dict):
+    # compiles where before any page is fetched, a bad one fails here
+    def _check_get(self, mode: str, columns: Optional[list[str]], where: Optional[str]):
+        if mode not in ("bytes", "dict", "raw", "columns"):
+            raise Exception(f"unknown mode: {mode!r}")
+        if (mode == "dict" or mode == "columns" or columns is not None or where is not None) and not self._schema:
+            raise Exception("db does not have a schema")
+        return None if where is None else self._schema.matcher(where)  # type: ignore
+
+    def _select(self, page, raw: bool, limit, reverse, after, match) -> tuple[list[bytes] | bytes, int]:
+        if limit is None and not reverse and after is None and match is None:
+            return (page.dumps_data() if raw else page.retrieve()), page.lsn
+        data, cursor = page.select(limit, reverse, after, match)
+        return (page.DumpsRaw(data, page.target_format) if raw else data), cursor
+
+    def _decode(self, data, mode: str, columns: Optional[list[str]]):
+        if mode == "dict":
+            unpack = self._schema.unpacker(columns)  # type: ignore
+            return [unpack(_) for _ in data]
+        if mode == "columns":
+            return self._schema.unpack_columns(data, columns)  # type: ignore
+        if columns is not None:
+            project = self._schema.projector(columns)  # type: ignore
+            data = [project(_) for _ in data]
+            if mode == "raw":
+                data = CappedArray.DumpsRaw(data, self.data_format)
+        return data
+
+    # the pageids sorted and cut into batches, the pages of one are pinned together
+    def _page_batches(self, pageids: Iterable[int]) -> list[list[int]]:
+        pageids = sorted(set(pageids))
+        n = self._batch_pages
+        return [pageids[i : i + n] for i in range(0, len(pageids), n)]
+
+    @property
+    def _batch_pages(self) -> int:
+        return max(1, min(self.MANY_BATCH_PAGES, self._buffer.buffer_pool.max_pages // 4))
+
+    # delta reads for pollers that keep the records of key: the ones appended since the cursor
+    # after (the lsn of the page, returned as the cursor of the last read), oldest first.
+    # returns (records, first, cursor), records is None if nothing was appended, the ones
+    # the reader keeps numbered below first are dropped from the page; cursor below after
+    # means the page lost appends and records are all of them
+    async def get_since(
+        self,
+        key: int,
+        after: int,
+        mode: Literal["bytes", "dict", "raw"] = "bytes",
+    ) -> None | tuple[None | list[bytes] | list[dict] | bytes, int, int]:
+        pageid = self._idx[key]
+        if pageid is None:
+            return None
+        async with self._buffer.fetch_page(pageid) as page:
+            data, first, cursor = page.delta(after, raw=mode == "raw")
+
+        if mode == "dict" and data is not None:
             if not self._schema:
                 raise Exception("db does not have a schema")
-            elif schema == '':
-                raise Exception("schema(name) is required for multi schema db")
-            data = self._schema.pack(data, schema=schema)
+            data = [self._schema.unpack(_) for _ in data]
+        elif mode not in ("bytes", "dict", "raw"):
+            raise Exception(f"unknown mode: {mode!r}")
+        return data, first, cursor
+
+    async def put(self, key, data: bytes | dict, *, schema: str = '') -> None:
+        data = self._pack(data, schema)
 
         pageid = self._idx[key]
         if pageid is None:
             pageid = self._buffer.new_page()
             self._idx[key] = pageid
 
+        committed = None
         async with self._buffer.fetch_page(pageid) as page:
             page.append(data)
+            if self._wal is not None:
+                committed = self._wal.append(key, pageid, page.lsn, data)
+        if committed is not None:
+            await committed
+
+    # put for many (key, data), the ones of a key appended in order. each page is fetched once,
+    # the ones of the batch together, and the new keys get their pages a batch at a time.
+    # returns the number of each record in its key (the lsn of the page after it), as after
+    # of get takes it
+    async def put_many(self, items: list[tuple[int, bytes | dict]], *, schema: str = '') -> list[int]:
+        records = [(key, self._pack(data, schema)) for key, data in items]
+
+        by_key: dict[int, list[int]] = {}
+        for i, (key, _) in enumerate(records):
+            by_key.setdefault(key, []).append(i)
+        pageids: dict[int, int] = {}  # pageid -> key
+        new_keys = []
+        for key in by_key:
+            pageid = self._idx[key]
+            if pageid is None:
+                new_keys.append(key)
+            else:
+                pageids[pageid] = key
+
+        lsns = [0] * len(records)
+        committed = []
+
+        async def append(batch: list[int]) -> None:
+            async with self._buffer.fetch_pages(batch) as pages:
+                for pageid in batch:
+                    page, key = pages[pageid], pageids[pageid]
+                    for i in by_key[key]:
+                        data = records[i][1]
+                        page.append(data)
+                        lsns[i] = page.lsn
+                        if self._wal is not None:
+                            committed.append(self._wal.append(key, pageid, page.lsn, data))
+
+        try:
+            for batch in self._page_batches(pageids):
+                await append(batch)
+            n = self._batch_pages
+            for j in range(0, len(new_keys), n):
+                batch = []
+                for key in new_keys[j : j + n]:
+                    # a put of the key may have given it a page meanwhile
+                    pageid = self._idx[key]
+                    if pageid is None:
+                        pageid = self._idx[key] = self._buffer.new_page()
+                    pageids[pageid] = key
+                    batch.append(pageid)
+                await append(batch)
+        except BaseException:
+            # the wal writes of the records appended so far still finish
+            await asyncio.gather(*committed, return_exceptions=True)
+            raise
+
+        if committed:
+            await asyncio.gather(*committed)
+        return lsns
+
+    def _pack(self, data: bytes | dict, schema: str) -> bytes:
+        if isinstance(data, dict):
+            if not self._schema:
+                raise Exception("db does not have a schema")
+            elif schema == '':
+                raise Exception("schema(name) is required for multi schema db")
+            data = self._schema.pack(data, schema=schema)
+        return data
 
     async def flush(self):
         logger.info("xxdb flushing...")
+        # a checkpoint, the wal before it can go once the pages are durable
+        wal_seq = await self._wal.roll() if self._wal is not None else None
         await self._buffer.flush_all()
         self._idx.flush()
+        if self._wal is not None:
+            await asyncio.gather(self._disk.sync(), self._scheduler.run(self._idx.sync))
+            self._wal.remove_segments_before(wal_seq)  # type: ignore
         logger.info("xxdb flush done")
 
     @property
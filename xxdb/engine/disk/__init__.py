@@ -1,16 +1,22 @@
+from typing import Optional
+
 from xxdb.engine.config import DiskConfig
 from .page import Page
 from .singlefile import SingleFile
 from .multifile import MultiFile
+from .mmapfile import MmapFile
 from .disk import Disk
+from .scheduler import IOScheduler
 
-__all__ = ("getDisk", "Page")
+__all__ = ("getDisk", "Page", "IOScheduler")
 
 
-def getDisk(name: str, data_dpath, config: DiskConfig) -> Disk:
+def getDisk(name: str, data_dpath, config: DiskConfig, scheduler: Optional[IOScheduler] = None) -> Disk:
     if config.typ == "singlefile":
-        return SingleFile(name, data_dpath, config)
+        return SingleFile(name, data_dpath, config, scheduler)
     elif config.typ == "multifile":
-        return MultiFile(name, data_dpath, config)
+        return MultiFile(name, data_dpath, config, scheduler)
+    elif config.typ == "mmap":
+        return MmapFile(name, data_dpath, config, scheduler)
     else:
         raise Exception(f"unknown meta: disk.typ: {config.typ}")
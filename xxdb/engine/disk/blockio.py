@@ -1,66 +1,118 @@
+import os
 from threading import Lock
 
 from pathlib import Path
 
 __all__ = ("BlockIO",)
 
+try:
+    IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = 1024
+
+# positional io doesn't touch the file offset, so concurrent readers need no lock
+HAS_PREAD = hasattr(os, "pread")
+HAS_PREADV = hasattr(os, "preadv")
+
 
 class BlockIO:
     META_PAGE_SIZE = 16 * 1024
 
-    __slots__ = ("_fio", "_fpath", "_page_size", "_lock")
+    __slots__ = ("_fd", "_fpath", "_page_size", "_lock")
 
     def __init__(self, fpath: Path, page_size: int):
         self._page_size = page_size
         fpath.touch(exist_ok=True)
         self._fpath = fpath
-        self._fio = fpath.open('r+b', buffering=0)
+        self._fd = os.open(fpath, os.O_RDWR | getattr(os, "O_BINARY", 0))
+        # only used where pread / pwrite are not available
         self._lock = Lock()
 
     @property
     def page_len(self) -> int:
-        return (self._fpath.stat().st_size - self.META_PAGE_SIZE) // self._page_size
+        return max(0, (os.fstat(self._fd).st_size - self.META_PAGE_SIZE) // self._page_size)
 
     def flush(self):
-        self._fio.flush()
+        # writes are unbuffered
+        ...
+
+    def sync(self):
+        os.fsync(self._fd)
 
     def close(self):
-        self._fio.close()
-
-    def seek(self, pageid: int) -> None:
-        offset = self.META_PAGE_SIZE + pageid * self._page_size
-        self._fio.seek(offset)
-
-    def tell(self):
-        return (self._fio.tell() - self.META_PAGE_SIZE) // self._page_size
-
-    def read1(self) -> bytes:
-        # page_bytes = await asyncio.to_thread(self._fio.read, self._page_size)
-        page_bytes = self._fio.read(self._page_size)
-        if len(page_bytes) != self._page_size:
-            print(len(page_bytes))
-            print(self.page_len)
-            print(self.tell())
-            assert False
-        return page_bytes
-        # return self._fio.read(self._page_size)
-
-    def seek_read1(self, pageid: int) -> bytes:
-        with self._lock:
-            self.seek(pageid)
-            return self.read1()
-
-    def write(self, block_bytes: bytes) -> int:
+        os.close(self._fd)
+
+    def _offset(self, pageid: int) -> int:
+        return self.META_PAGE_SIZE + pageid * self._page_size
+
+    # the pages are read into buffers of their own, Page takes them over without a copy
+    def read_page(self, pageid: int) -> bytearray:
+        return self.read_pages(pageid, 1)[0]
+
+    # npages adjacent pages from pageid on
+    def read_pages(self, pageid: int, npages: int) -> list[bytearray]:
+        offset, size = self._offset(pageid), npages * self._page_size
+        buffers = [bytearray(self._page_size) for _ in range(npages)]
+        nread = 0
+        if HAS_PREADV:
+            for i in range(0, npages, IOV_MAX):
+                nread += os.preadv(self._fd, buffers[i : i + IOV_MAX], offset + nread)
+        else:
+            if HAS_PREAD:
+                pages_bytes = os.pread(self._fd, size, offset)
+            else:
+                with self._lock:
+                    os.lseek(self._fd, offset, os.SEEK_SET)
+                    pages_bytes = os.read(self._fd, size)
+            nread = len(pages_bytes)
+            for i, buffer in enumerate(buffers):
+                buffer[:] = pages_bytes[i * self._page_size : (i + 1) * self._page_size]
+
+        if nread != size:
+            raise Exception(f"short read of pages {pageid}..{pageid + npages - 1} in {self._fpath.name}: {nread} bytes")
+        return buffers
+
+    def write_page(self, pageid: int, block_bytes: bytes) -> None:
         if len(block_bytes) != self._page_size:
-            print("write failed")
-            # print(len(block_bytes))
-            # print(block_bytes)
-            # print(self._page_size)
-            assert False
-        # return await asyncio.to_thread(self._fio.write, block_bytes)
-        return self._fio.write(block_bytes)
-
-    def seek_write(self, pageid: int, block_bytes: bytes) -> None:
-        with self._lock:
-            self.seek(pageid)
-            self.write(block_bytes)
+            raise Exception(f"page {pageid} is {len(block_bytes)} bytes, expected {self._page_size}")
+        self._write_at(self._offset(pageid), block_bytes)
+
+    # pages: (pageid, page_bytes) sorted by pageid
+    # adjacent pages are written with a single pwritev where the platform has it
+    def write_pages(self, pages: list[tuple[int, bytes]]) -> None:
+        run_start, run = -1, []
+        for pageid, block_bytes in pages:
+            if len(block_bytes) != self._page_size:
+                raise Exception(f"page {pageid} is {len(block_bytes)} bytes, expected {self._page_size}")
+            if run and (pageid != run_start + len(run) or len(run) >= IOV_MAX):
+                self._write_run(run_start, run)
+                run = []
+            if not run:
+                run_start = pageid
+            run.append(block_bytes)
+        if run:
+            self._write_run(run_start, run)
+
+    def _write_run(self, pageid: int, blocks: list[bytes]) -> None:
+        offset = self._offset(pageid)
+        if hasattr(os, "pwritev"):
+            size = sum(len(block) for block in blocks)
+            written = os.pwritev(self._fd, blocks, offset)
+            if written == size:
+                return
+            # short write, finish the rest in one go
+            blocks = [b''.join(blocks)[written:]]
+            offset += written
+        self._write_at(offset, b''.join(blocks))
+
+    def _write_at(self, offset: int, data: bytes) -> None:
+        view = memoryview(data)
+        while view:
+            if HAS_PREAD:
+                written = os.pwrite(self._fd, view, offset)
+            else:
+                with self._lock:
+                    os.lseek(self._fd, offset, os.SEEK_SET)
+                    written = os.write(self._fd, view)
+            view = view[written:]
+            offset += written
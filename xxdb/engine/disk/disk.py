@@ -1,13 +1,26 @@
 # Referenced by: DB
 from abc import abstractmethod
-from typing import Literal
+from typing import Literal, Optional
 
+from xxdb.engine.config import IOConfig
 from .page import Page
+from .scheduler import IOScheduler
 
 __all__ = ("Disk",)
 
 
 class Disk:
+    scheduler: IOScheduler
+
+    # a disk made without a scheduler runs one of its own
+    def _init_scheduler(self, scheduler: Optional[IOScheduler]) -> None:
+        self._owns_scheduler = scheduler is None
+        self.scheduler = IOScheduler(IOConfig()) if scheduler is None else scheduler
+
+    async def _close_scheduler(self) -> None:
+        if self._owns_scheduler:
+            await self.scheduler.close()
+
     @property
     @abstractmethod
     def pageid_size(self) -> Literal[4, 8]:
@@ -21,15 +34,33 @@ class Disk:
     async def read_page(self, pageid: int) -> Page:
         ...
 
+    @property
+    def page_size(self) -> int:
+        return self._config.page_size  # type: ignore
+
+    # the pageid new_page() gives next
+    @property
+    def next_pageid(self) -> int:
+        return self._next_pageid  # type: ignore
+
     @abstractmethod
     async def write_page(self, page: Page) -> None:
         ...
 
+    # pages come sorted by pageid
+    async def write_pages(self, pages: list[Page]) -> None:
+        for page in pages:
+            await self.write_page(page)
+
     async def init(self):
         ...
 
     async def flush(self):
         ...
 
+    # make the written pages durable
+    async def sync(self):
+        ...
+
     async def close(self):
         ...
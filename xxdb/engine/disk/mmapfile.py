@@ -0,0 +1,137 @@
+import mmap
+import os
+from pathlib import Path
+from threading import Lock
+from typing import Optional
+
+from .page import Page
+from .blockio import BlockIO
+from .disk import Disk
+from .scheduler import IOScheduler
+
+__all__ = ("MmapFile",)
+
+
+# Same file layout as SingleFile, so a db can switch between the two.
+# The file is grown in chunks of params['grow_size'] MB (64 by default) ahead of new_page,
+# the zero filled tail is not counted as pages when the file is opened again.
+# Pages are decoded straight from the mapping on the event loop thread, which suits
+# datasets that fit in memory, a cold page costs a page fault there.
+class MmapFile(Disk):
+    PAGEID_SIZE = 4
+    META_PAGE_SIZE = BlockIO.META_PAGE_SIZE
+    # the most bytes msync'ed under the resize lock, a multiple of the memory pages
+    MSYNC_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, name, data_dpath, config, scheduler: Optional[IOScheduler] = None):
+        self._name = name
+        self._config = config
+        self._dat_fpath = Path(data_dpath) / f"{name}.dat.xxdb"
+
+        self._page_size = self._config.page_size
+        self.EMPTY_PAGE = b'\x00' * self._page_size
+        grow_size = int(self._config.params.get('grow_size', 64) * 1024 * 1024)
+        self._grow_pages = max(grow_size // self._page_size, 1)
+
+        self._dat_fpath.touch(exist_ok=True)
+        self._fp = self._dat_fpath.open('r+b')
+        if self._dat_fpath.stat().st_size < self.META_PAGE_SIZE + self._page_size:
+            self._fp.truncate(self.META_PAGE_SIZE + self._grow_pages * self._page_size)
+        self._mm = mmap.mmap(self._fp.fileno(), 0)
+        # msync runs in a thread, the mapping must not move under it
+        self._resize_lock = Lock()
+
+        self._next_pageid = self._scan_next_pageid()
+        self._dirty_pageids: set[int] = set()
+        self._init_scheduler(scheduler)
+
+    @property
+    def pageid_size(self):
+        return self.PAGEID_SIZE
+
+    @property
+    def _capacity(self) -> int:
+        return (len(self._mm) - self.META_PAGE_SIZE) // self._page_size
+
+    def _offset(self, pageid: int) -> int:
+        return self.META_PAGE_SIZE + pageid * self._page_size
+
+    def _scan_next_pageid(self) -> int:
+        pageid = self._capacity
+        while pageid > 0:
+            offset = self._offset(pageid - 1)
+            if self._mm[offset : offset + self._page_size] != self.EMPTY_PAGE:
+                break
+            pageid -= 1
+        return pageid
+
+    def _grow(self, min_capacity: int) -> None:
+        capacity = self._capacity
+        while capacity < min_capacity:
+            capacity += self._grow_pages
+        with self._resize_lock:
+            self._mm.resize(self._offset(capacity))
+
+    def new_page(self) -> Page:
+        pageid = self._next_pageid
+        if pageid >= self._capacity:
+            self._grow(pageid + 1)
+        self._next_pageid += 1
+        return Page(self.EMPTY_PAGE, pageid, self._config.page_format)
+
+    async def read_page(self, pageid: int) -> Page:
+        if pageid >= self._capacity:
+            raise Exception(f"page {pageid} is out of the data file")
+        offset = self._offset(pageid)
+        # the views must be gone before the mapping can be resized, Page keeps a copy
+        with memoryview(self._mm) as view:
+            return Page(view[offset : offset + self._page_size], pageid, self._config.page_format)
+
+    async def write_page(self, page: Page) -> None:
+        offset = self._offset(page.id)
+        self._mm[offset : offset + self._page_size] = page.dumps_page()
+        self._dirty_pageids.add(page.id)
+
+    async def write_pages(self, pages: list[Page]) -> None:
+        for page in pages:
+            await self.write_page(page)
+
+    async def flush(self):
+        if not self._dirty_pageids:
+            return
+        pageids = sorted(self._dirty_pageids)
+        self._dirty_pageids.clear()
+
+        # msync the runs of adjacent pages
+        runs = []
+        run_start = prev = pageids[0]
+        for pageid in pageids[1:]:
+            if pageid != prev + 1:
+                runs.append((run_start, prev + 1))
+                run_start = pageid
+            prev = pageid
+        runs.append((run_start, prev + 1))
+        await self.scheduler.run(self._msync, runs)
+
+    # the lock is taken for a chunk of a run at a time, new_page (on the event loop) may have to
+    # grow the mapping meanwhile
+    def _msync(self, runs: list[tuple[int, int]]) -> None:
+        for start, end in runs:
+            offset, end_offset = self._offset(start), self._offset(end)
+            # the offset of msync must be aligned to the memory pages
+            offset -= offset % mmap.ALLOCATIONGRANULARITY
+            while offset < end_offset:
+                size = min(self.MSYNC_CHUNK_SIZE, end_offset - offset)
+                with self._resize_lock:
+                    self._mm.flush(offset, size)
+                offset += size
+
+    async def sync(self):
+        await self.flush()
+        await self.scheduler.run(os.fsync, self._fp.fileno())
+
+    async def close(self):
+        await self.flush()
+        await self._close_scheduler()
+        self._mm.close()
+        self._fp.close()
@@ -1,16 +1,18 @@
 import asyncio
 from pathlib import Path
+from typing import Optional
 
 from .disk import Disk
 from .page import Page
 from .blockio import BlockIO
+from .scheduler import IOScheduler
 
 
 class MultiFile(Disk):
     PAGEID_SIZE = 4
     # SINGLE_FILE_SIZE = 64 * 1024 * 1024  # 64MB
 
-    def __init__(self, name, data_dpath, config):
+    def __init__(self, name, data_dpath, config, scheduler: Optional[IOScheduler] = None):
         self._name = name
         self._data_dpath = Path(data_dpath)
         self._config = config
@@ -22,6 +24,7 @@ class MultiFile(Disk):
         _block_fpath_list.sort(key=lambda fpath: int(fpath.name.split('.')[1]))
         self._block_list = [BlockIO(fpath, self._page_size) for fpath in _block_fpath_list]
         self._next_pageid = sum(bio.page_len for bio in self._block_list)
+        self._init_scheduler(scheduler)
 
     @property
     def gen_empty_page(self):
@@ -48,10 +51,14 @@ class MultiFile(Disk):
     async def flush(self):
         [_bio.flush() for _bio in self._block_list]
 
+    async def sync(self):
+        await asyncio.gather(*[self.scheduler.run(bio.sync) for bio in self._block_list])
+
     async def close(self):
         await self.flush()
         print(self._next_pageid, flush=True)
         print([bio.page_len for bio in self._block_list], flush=True)
+        await self._close_scheduler()
         [_bio.close() for _bio in self._block_list]
 
     def new_page(self) -> Page:
@@ -63,15 +70,14 @@ class MultiFile(Disk):
             print(f"new block: {blockid}", flush=True)
         self._next_pageid += 1
         page_data = self.gen_empty_page
-        return Page(page_data, pageid)
+        return Page(page_data, pageid, self._config.page_format)
 
     async def read_page(self, pageid: int) -> Page:
         blockid, part_pageid = self._calc_offset(pageid)
         bio = self._get_bio(blockid)
         try:
-            # return Page(bio.seek_read1(part_pageid), pageid)
-            page_data = await asyncio.to_thread(bio.seek_read1, part_pageid)
-            return Page(page_data, pageid)
+            page_data = await self.scheduler.read(bio, part_pageid)
+            return Page(page_data, pageid, self._config.page_format)
         except Exception as e:
             print(f"block: {blockid}")
             raise e
@@ -80,6 +86,15 @@ class MultiFile(Disk):
         pageid = page.id
         blockid, part_pageid = self._calc_offset(pageid)
         bio = self._get_bio(blockid)
-        await asyncio.to_thread(bio.seek_write, part_pageid, page.dumps_page())
-        # bio.seek_write(part_pageid, page.dumps_page())
-        bio.flush()
+        await self.scheduler.write(bio, [(part_pageid, page.dumps_page())])
+
+    async def write_pages(self, pages: list[Page]) -> None:
+        # the scheduler merges the adjacent pages of each block file
+        blocks: dict[int, list[tuple[int, bytes]]] = {}
+        for page in pages:
+            blockid, part_pageid = self._calc_offset(page.id)
+            blocks.setdefault(blockid, []).append((part_pageid, page.dumps_page()))
+
+        await asyncio.gather(
+            *[self.scheduler.write(self._get_bio(blockid), block_pages) for blockid, block_pages in blocks.items()]
+        )
@@ -1,3 +1,7 @@
+import struct
+import sys
+from typing import Callable, Optional
+
 from xxdb.engine.capped_array import CappedArray
 from xxdb.engine.buffer.replacer import Evictable
 
@@ -5,31 +9,33 @@ __all__ = ("Page",)
 
 
 class Page(CappedArray, Evictable):
-    LSN_COST = 8
-    SIZE_COST = 4
-    MAGIC_COST = 4
     MAGIC_FOOT = b'\x00\x00\x00\x00'
+    FOOTER = struct.Struct("<QI4s")  # lsn, size, magic foot
+    # the magic foot tells the data format of the page
+    MAGIC_FOOTS = {1: MAGIC_FOOT, 2: b'\x00\x00\x00\x02'}
+    DATA_FORMAT_OF_FOOT = {v: k for k, v in MAGIC_FOOTS.items()}
 
-    __slots__ = ("_id", "_pin_cnt", "is_dirty", "lsn")
+    __slots__ = ("_id", "_pin_cnt", "is_dirty", "lsn", "nbytes_charged", "target_format")
 
-    def __init__(self, page_bytes: bytes, id: int):
+    # data_format: of the db, a page of another one is converted once it gets dirty
+    def __init__(self, page_bytes: bytes, id: int, data_format: int = 1):
         self._id = id
         # self._lock = asyncio.Lock()
         self._pin_cnt = 0
         self.is_dirty = False
+        self.nbytes_charged = 0  # bookkeeping of the buffer pool
 
-        page_bytes_, magic = page_bytes[: -self.MAGIC_COST], page_bytes[-self.MAGIC_COST :]
-        assert magic == self.MAGIC_FOOT, "Page magic foot not match!"
-        page_bytes_, _curr_size, self.lsn = self._process_meta(page_bytes_)
-        _cap = len(page_bytes_)
-        super().__init__(page_bytes_[:_curr_size], _cap)
-
-    def _process_meta(self, page_bytes: bytes):
-        result = []
-        for n in reversed((self.LSN_COST, self.SIZE_COST)):
-            page_bytes, meta = page_bytes[:-n], page_bytes[-n:]
-            result.append(int.from_bytes(meta, "little"))
-        return page_bytes, *result
+        self.lsn, _curr_size, magic = self.FOOTER.unpack_from(page_bytes, len(page_bytes) - self.FOOTER.size)
+        page_format = self.DATA_FORMAT_OF_FOOT.get(magic)
+        assert page_format is not None, "Page magic foot not match!"
+        _cap = len(page_bytes) - self.FOOTER.size
+        self.target_format = data_format
+        data_format = data_format if _curr_size == 0 else page_format
+        if isinstance(page_bytes, bytearray):
+            # a buffer read for this page (BlockIO), taken over as it is
+            self._init_buffer(page_bytes, _cap, _curr_size, data_format)
+        else:
+            super().__init__(memoryview(page_bytes)[:_curr_size], _cap, data_format)
 
     @property
     # @override
@@ -46,16 +52,109 @@ class Page(CappedArray, Evictable):
     def id(self):
         return self._id
 
+    @property
+    def nbytes(self) -> int:
+        """memory footprint of the page"""
+        return sys.getsizeof(self) + sys.getsizeof(self._data)
+
+    @staticmethod
+    def estimate_nbytes(page_size: int) -> int:
+        return Page.__basicsize__ + sys.getsizeof(bytearray()) + page_size
+
     # @override
     def append(self, data: bytes):
+        if self.data_format != self.target_format:
+            self.convert(self.target_format)
         super().append(data)
+        # counts the appends to the page, the wal tells by it what a page on disk misses
+        self.lsn += 1
         self.is_dirty = True
 
+    # the records in the data format of the db
+    def dumps_data(self) -> bytes:
+        if self.data_format != self.target_format:
+            return self.DumpsRaw(self.retrieve(), self.target_format)
+        return super().dumps_data()
+
+    # the records appended after the after-th one (the lsn counts the appends), oldest first
+    # or newest first if reverse, limit of them at most; only the ones returned are copied.
+    # match: only the records it is true of (it is given a memoryview of each), the limit
+    # counts them.
+    # returns the records and the number of the newest record looked at (after, or the lsn if
+    # there is none), the one to continue after
+    def select(
+        self,
+        limit: Optional[int] = None,
+        reverse: bool = False,
+        after: Optional[int] = None,
+        match: Optional[Callable[[bytes], bool]] = None,
+    ) -> tuple[list[bytes], int]:
+        count = self.count()
+        # the number of the oldest record in the page is lsn - count + 1
+        start = 0 if after is None else min(max(after - self.lsn + count, 0), count)
+        if match is not None:
+            raw_data, spans = self._spans(start)
+            if reverse:
+                spans.reverse()
+            records = []
+            newest = start - 1
+            with memoryview(raw_data) as view:
+                for k, (i, j) in enumerate(spans):
+                    if limit is not None and len(records) >= limit:
+                        break
+                    if match(view[i:j]):
+                        records.append(bytes(view[i:j]))
+                    newest = count - 1 if reverse else start + k
+            if newest < start:
+                return records, self.lsn if after is None else after
+            return records, self.lsn - count + 1 + newest
+
+        if reverse:
+            raw_data, spans = self._spans(start if limit is None else max(start, count - limit), count)
+            spans.reverse()
+        else:
+            raw_data, spans = self._spans(start, None if limit is None else start + limit)
+
+        records = [bytes(raw_data[i:j]) for i, j in spans]
+        if not records:
+            return records, self.lsn if after is None else after
+        newest = count - 1 if reverse else start + len(records) - 1
+        return records, self.lsn - count + 1 + newest
+
+    # for pollers: the records appended after the after-th one, as a list or as raw data in
+    # the data format of the db, None if there is none (without reading the page). after past
+    # the lsn (the page lost appends the reader saw) gets all of them.
+    # returns them, the number of the oldest record in the page (0 if None) and the lsn
+    def delta(self, after: int, raw: bool = False) -> tuple[None | list[bytes] | bytes, int, int]:
+        if after == self.lsn:
+            return None, 0, self.lsn
+        count = self.count()
+        first = self.lsn - count + 1
+        start = 0 if after > self.lsn else min(max(after - first + 1, 0), count)
+        if raw and self.data_format == self.target_format:
+            # they are the tail of the raw data, framing included
+            if start == count:
+                return b"", first, self.lsn
+            offset = self._index()[start]
+            size = self._curr_size - (offset - self._head) % self._cap
+            return bytes(self._read(offset, size)), first, self.lsn
+        raw_data, spans = self._spans(start)
+        records = [bytes(raw_data[i:j]) for i, j in spans]
+        return (self.DumpsRaw(records, self.target_format) if raw else records), first, self.lsn
+
+    # for pollers: the records kept from the read at the cursor since with the ones of a delta
+    # (records, first, cursor), the kept ones the page dropped left out. first is not a marker,
+    # pages from before the lsn counted appends number their records from 0 or below
+    @staticmethod
+    def merge_delta(since: int, kept: list[bytes], records: list[bytes], first: int, cursor: int) -> list[bytes]:
+        if cursor < since:
+            # the page lost appends the reader saw, records are all of them
+            return records
+        return kept[max(first - (since - len(kept) + 1), 0) :] + records
+
     def dumps_page(self) -> bytes:
         _raw_data = super().dumps_data()
         _curr_size = len(_raw_data)
-        page_meta = (
-            self.lsn.to_bytes(self.LSN_COST, "little") + _curr_size.to_bytes(self.SIZE_COST, "little") + self.MAGIC_FOOT
-        )
+        page_meta = self.FOOTER.pack(self.lsn, _curr_size, self.MAGIC_FOOTS[self.data_format])
 
         return _raw_data + b'\x00' * super().free_size + page_meta
@@ -0,0 +1,269 @@
+import asyncio
+import time
+from bisect import bisect_left, insort
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Union
+
+from xxdb.engine.config import IOConfig
+from xxdb.utils.event import EventEmitter
+from .blockio import BlockIO
+
+__all__ = ("IOScheduler",)
+
+# (id(bio), pageid), so the requests of a file sort by offset
+_Key = tuple[int, int]
+
+
+# a write call, done when all of its pages are
+class _WriteWaiter:
+    __slots__ = ("fut", "remaining")
+
+    def __init__(self, fut: asyncio.Future, npages: int):
+        self.fut = fut
+        self.remaining = npages
+
+    def done(self) -> bool:
+        return self.fut.done()
+
+    def set_exception(self, exc: BaseException) -> None:
+        self.fut.set_exception(exc)
+
+    def set_result(self, _) -> None:
+        self.remaining -= 1
+        if self.remaining == 0:
+            self.fut.set_result(None)
+
+
+class _Request:
+    __slots__ = ("bio", "pageid", "data", "waiters", "queued_at")
+
+    def __init__(self, bio: BlockIO, pageid: int, data: Optional[bytes] = None):
+        self.bio = bio
+        self.pageid = pageid
+        self.data = data
+        self.waiters: list[Union[asyncio.Future, _WriteWaiter]] = []
+        self.queued_at = time.perf_counter()
+
+
+# reads the pages (sorted) of a file, one pread per run of adjacent pages
+def _read_pages(bio: BlockIO, pageids: list[int]) -> list[bytearray]:
+    results = []
+    i = 0
+    while i < len(pageids):
+        j = i + 1
+        while j < len(pageids) and pageids[j] == pageids[j - 1] + 1:
+            j += 1
+        results.extend(bio.read_pages(pageids[i], j - i))
+        i = j
+    return results
+
+
+# Runs the block io of the disks of a db on its own threads.
+# Reads go before writes, each queue is served in elevator (c-scan) order: a request takes
+# the queued pages of a file from the head on, adjacent ones are read / written together.
+# A full queue makes submitters wait.
+class IOScheduler(EventEmitter):
+    # the max amount of pages served by one request
+    MAX_BATCH_PAGES = 256
+    # the pages of a bulk write given to a thread at a time
+    BULK_BATCH_PAGES = 1024
+
+    def __init__(self, config: IOConfig):
+        super().__init__()
+        self.config = config
+        self._executor = ThreadPoolExecutor(max_workers=config.workers, thread_name_prefix="xxdb-io")
+        self._workers: list[asyncio.Task] = []
+
+        self._reads: dict[_Key, _Request] = {}
+        self._writes: dict[_Key, _Request] = {}
+        # the keys of the queues, sorted
+        self._read_keys: list[_Key] = []
+        self._write_keys: list[_Key] = []
+        # pages being read (None) or written (their bytes) by the threads
+        self._inflight: dict[_Key, Optional[bytes]] = {}
+        # where the last request ended
+        self._head: _Key = (0, 0)
+
+        self._wakeup = asyncio.Event()
+        self._dequeued = asyncio.Event()
+
+    @property
+    def read_queue_len(self) -> int:
+        return len(self._reads)
+
+    @property
+    def write_queue_len(self) -> int:
+        return len(self._writes)
+
+    @property
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+    async def read(self, bio: BlockIO, pageid: int) -> bytes:
+        key = (id(bio), pageid)
+        while 1:
+            # not on disk yet
+            if (req := self._writes.get(key, None)) is not None:
+                return req.data  # type: ignore
+            if (data := self._inflight.get(key, None)) is not None:
+                return data
+            if (req := self._reads.get(key, None)) is not None or len(self._reads) < self.config.queue_depth:
+                break
+            await self._wait_room()
+
+        if req is None:
+            req = self._reads[key] = _Request(bio, pageid)
+            insort(self._read_keys, key)
+            self._submit()
+        fut = asyncio.get_running_loop().create_future()
+        req.waiters.append(fut)
+        return await fut
+
+    # pages: (pageid, page_bytes)
+    async def write(self, bio: BlockIO, pages: list[tuple[int, bytes]]) -> None:
+        if not pages:
+            return
+        if len(pages) >= self.MAX_BATCH_PAGES:
+            keys = [(id(bio), pageid) for pageid, _ in pages]
+            # none of them queued or in flight, the queue keeps the order of the io of a page then
+            if not any(key in self._writes or key in self._reads or key in self._inflight for key in keys):
+                await self._write_bulk(bio, pages, keys)
+                return
+        waiter = _WriteWaiter(asyncio.get_running_loop().create_future(), len(pages))
+        for pageid, page_bytes in pages:
+            key = (id(bio), pageid)
+            while (req := self._writes.get(key, None)) is None and len(self._writes) >= self.config.queue_depth:
+                await self._wait_room()
+
+            if req is None:
+                req = self._writes[key] = _Request(bio, pageid, page_bytes)
+                insort(self._write_keys, key)
+            else:
+                # not written yet, the newer bytes win
+                req.data = page_bytes
+            req.waiters.append(waiter)
+
+        self._submit()
+        await waiter.fut
+
+    # the writes of flush_all and the cleaner: sorted already and bigger than a request, the
+    # queue would only add its bookkeeping per page. they go to the threads BULK_BATCH_PAGES at a
+    # time, one after the other, so the reads still get threads. the pages are in flight until
+    # written: the reads of them get these bytes, the writes of them made meanwhile wait
+    async def _write_bulk(self, bio: BlockIO, pages: list[tuple[int, bytes]], keys: list[_Key]) -> None:
+        loop = asyncio.get_running_loop()
+        for key, (_, page_bytes) in zip(keys, pages):
+            self._inflight[key] = page_bytes
+        written = 0
+        try:
+            while written < len(pages):
+                batch = pages[written : written + self.BULK_BATCH_PAGES]
+                dispatched_at = time.perf_counter()
+                await loop.run_in_executor(self._executor, bio.write_pages, batch)
+                for key in keys[written : written + len(batch)]:
+                    del self._inflight[key]
+                written += len(batch)
+                if self._writes:
+                    self._wakeup.set()
+                await self._emit("write", len(batch), 0.0, time.perf_counter() - dispatched_at)
+        finally:
+            # the pages of a failed batch and the ones after it, the others may be in flight again
+            for key in keys[written:]:
+                del self._inflight[key]
+            if self._writes:
+                self._wakeup.set()
+
+    # run a blocking call (fsync, msync...) on the io threads, outside of the queues
+    async def run(self, func: Callable, *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def close(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._executor.shutdown()
+
+    def _submit(self) -> None:
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.config.workers)]
+        # the workers only run once the submitter yields, so requests made together get merged
+        self._wakeup.set()
+
+    async def _wait_room(self) -> None:
+        self._submit()
+        self._dequeued.clear()
+        await self._dequeued.wait()
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while 1:
+            if self._reads:
+                is_read, batch = True, self._take(self._reads, self._read_keys, is_read=True)
+            else:
+                is_read, batch = False, self._take(self._writes, self._write_keys, is_read=False)
+            if not batch:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            self._dequeued.set()
+
+            bio = batch[0].bio
+            keys = [(id(bio), req.pageid) for req in batch]
+            for key, req in zip(keys, batch):
+                self._inflight[key] = req.data
+            dispatched_at = time.perf_counter()
+            try:
+                if is_read:
+                    call = (_read_pages, bio, [req.pageid for req in batch])
+                else:
+                    call = (bio.write_pages, [(req.pageid, req.data) for req in batch])
+                results = await loop.run_in_executor(self._executor, *call)
+            except Exception as exc:
+                for req in batch:
+                    for waiter in req.waiters:
+                        if not waiter.done():
+                            waiter.set_exception(exc)
+                continue
+            finally:
+                for key in keys:
+                    del self._inflight[key]
+                # writes held back by this batch can go now
+                if self._writes:
+                    self._wakeup.set()
+
+            service_time = time.perf_counter() - dispatched_at
+            for i, req in enumerate(batch):
+                for j, waiter in enumerate(req.waiters):
+                    if not waiter.done():
+                        # a page takes the buffer over, the other readers get copies
+                        waiter.set_result((results[i] if j == 0 else bytes(results[i])) if is_read else None)
+
+            wait_time = dispatched_at - min(req.queued_at for req in batch)
+            await self._emit("read" if is_read else "write", len(batch), wait_time, service_time)
+
+    # the queued pages of one file from the head on, the next request starts where it ends
+    def _take(self, queue: dict[_Key, _Request], keys: list[_Key], is_read: bool) -> list[_Request]:
+        head = bisect_left(keys, self._head)
+        for start, end in ((head, len(keys)), (0, head)):
+            # the earlier write of a page must land first
+            while start < end and not is_read and keys[start] in self._inflight:
+                start += 1
+            if start < end:
+                break
+        else:
+            return []
+
+        stop = start + 1
+        while (
+            stop < end
+            and stop - start < self.MAX_BATCH_PAGES
+            and keys[stop][0] == keys[start][0]
+            and (is_read or keys[stop] not in self._inflight)
+        ):
+            stop += 1
+
+        run = keys[start:stop]
+        del keys[start:stop]
+        self._head = (run[-1][0], run[-1][1] + 1)
+        return [queue.pop(key) for key in run]
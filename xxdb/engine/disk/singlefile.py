@@ -1,6 +1,9 @@
+from typing import Optional
+
 from .page import Page
 from .blockio import BlockIO
 from .disk import Disk
+from .scheduler import IOScheduler
 
 __all__ = ("SingleFile",)
 
@@ -8,15 +11,16 @@ __all__ = ("SingleFile",)
 class SingleFile(Disk):
     PAGEID_SIZE = 4
 
-    def __init__(self, name, data_dpath, config):
+    def __init__(self, name, data_dpath, config, scheduler: Optional[IOScheduler] = None):
         self._name = name
         self._config = config
         self._dat_fpath = data_dpath / f"{name}.dat.xxdb"
 
         self._page_size = self._config.page_size
         self._bio = BlockIO(self._dat_fpath, self._page_size)
-        self._next_pageid = self.dat_file_size // self._page_size
+        self._next_pageid = self._bio.page_len
         self.EMPTY_PAGE = b'\x00' * self._page_size
+        self._init_scheduler(scheduler)
 
     @property
     def pageid_size(self):
@@ -29,20 +33,25 @@ class SingleFile(Disk):
     async def flush(self):
         self._bio.flush()
 
+    async def sync(self):
+        await self.scheduler.run(self._bio.sync)
+
     async def close(self):
+        await self._close_scheduler()
         self._bio.close()
 
-    async def new_page(self) -> Page:
+    def new_page(self) -> Page:
         pageid = self._next_pageid
         self._next_pageid += 1
         page_data = self.EMPTY_PAGE
-        return Page(page_data, pageid)
+        return Page(page_data, pageid, self._config.page_format)
 
     async def read_page(self, pageid: int) -> Page:
-        self._bio.seek(pageid)
-        return Page(self._bio.read1(), pageid)
+        page_data = await self.scheduler.read(self._bio, pageid)
+        return Page(page_data, pageid, self._config.page_format)
 
     async def write_page(self, page: Page) -> None:
-        pageid = page.id
-        self._bio.seek(pageid)
-        self._bio.write(page.dumps_page())
+        await self.scheduler.write(self._bio, [(page.id, page.dumps_page())])
+
+    async def write_pages(self, pages: list[Page]) -> None:
+        await self.scheduler.write(self._bio, [(page.id, page.dumps_page()) for page in pages])
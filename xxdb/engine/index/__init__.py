@@ -8,13 +8,41 @@ __all__ = ("getIndex", "Index", "IndexConfig")
 
 def getIndex(db_name, idx_dpath, config) -> Index:
     idx_dpath = Path(idx_dpath)
+    params = dict(config.params)
+    bloom = params.pop("bloom", None)
+
+    idx: Index
     if config.typ == "hashtable":
         from .hashtable import HashTable
 
-        return HashTable(idx_dpath / f"{db_name}.ht.idx.xxdb", config.key_size, config.value_size)
+        idx = HashTable(idx_dpath / f"{db_name}.ht.idx.xxdb", config.key_size, config.value_size)
+    elif config.typ == "mmap_hash":
+        from .mmap_hash import MmapHash
+
+        idx = MmapHash(idx_dpath, db_name, config.key_size, config.value_size, **params)
+    elif config.typ == "compact":
+        from .compact import CompactIndex
+
+        idx = CompactIndex(
+            idx_dpath / f"{db_name}.ht.idx.xxdb",
+            idx_dpath / f"{db_name}.compact.idx.xxdb",
+            config.key_size,
+            config.value_size,
+            **params,
+        )
+    elif config.typ == "lsm":
+        from .lsm import LsmIndex
+
+        idx = LsmIndex(idx_dpath, db_name, config.key_size, config.value_size, **params)
     elif config.typ == "sqlite":
         from .sqlite import SQLite
 
-        return SQLite(idx_dpath / f"{db_name}.sqlite.idx.xxdb", config.key_size, config.value_size)
+        idx = SQLite(idx_dpath / f"{db_name}.sqlite.idx.xxdb", config.key_size, config.value_size, **params)
     else:
         raise Exception(f"unknown index type: {config.typ!r}")
+
+    if bloom:
+        from .bloom import BloomIndex
+
+        idx = BloomIndex(idx, idx_dpath / f"{db_name}.bloom.idx.xxdb", **(bloom if isinstance(bloom, dict) else {}))
+    return idx
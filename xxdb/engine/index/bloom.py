@@ -0,0 +1,156 @@
+import os
+import struct
+from pathlib import Path
+from typing import Iterator
+
+from .index import Index
+
+__all__ = ("BloomFilter", "BloomIndex")
+
+HASH_MUL = 0x9E3779B97F4A7C15
+HASH_MUL2 = 0xBF58476D1CE4E5B9
+U64_MASK = (1 << 64) - 1
+
+
+# A blocked bloom filter, all the bits of a key fall in one 512 bit block.
+# The bits are any buffer from offset on (a bytearray, or a mmap of a file holding it).
+class BloomFilter:
+    __slots__ = ("bits", "blocks", "k", "_offset")
+
+    BLOCK_BYTES = 64
+
+    def __init__(self, bits, blocks: int, bits_per_key: int, offset: int = 0):
+        self.bits = bits
+        self.blocks = blocks
+        # k = ln2 * bits per key is the best, 9 bits each from a 64 bit hash
+        self.k = min(max(round(bits_per_key * 0.69), 1), 7)
+        self._offset = offset
+
+    @classmethod
+    def new(cls, capacity: int, bits_per_key: int) -> "BloomFilter":
+        blocks = max(-(-capacity * bits_per_key // (cls.BLOCK_BYTES * 8)), 1)
+        return cls(bytearray(blocks * cls.BLOCK_BYTES), blocks, bits_per_key)
+
+    # the hashes picking the block and the bits of the key in it, the same for any filter,
+    # so a key probing many filters hashes once
+    @staticmethod
+    def hash(key: int) -> tuple[int, int]:
+        return ((key * HASH_MUL) & U64_MASK) >> 32, ((key ^ (key >> 29)) * HASH_MUL2) & U64_MASK
+
+    def add(self, key: int) -> None:
+        h, h2 = self.hash(key)
+        base = ((h * self.blocks) >> 32) * self.BLOCK_BYTES + self._offset
+        bits = self.bits
+        for _ in range(self.k):
+            bits[base + ((h2 >> 3) & 63)] |= 1 << (h2 & 7)
+            h2 >>= 9
+
+    def contains_hash(self, h: int, h2: int) -> bool:
+        base = ((h * self.blocks) >> 32) * self.BLOCK_BYTES + self._offset
+        bits = self.bits
+        for _ in range(self.k):
+            if not bits[base + ((h2 >> 3) & 63)] & (1 << (h2 & 7)):
+                return False
+            h2 >>= 9
+        return True
+
+    def __contains__(self, key: int) -> bool:
+        h, h2 = self.hash(key)
+        return self.contains_hash(h, h2)
+
+
+# A bloom filter in front of an index, the keys it has never seen are answered
+# without touching the index.
+#
+# Saved on close and loaded on open if it holds as many keys as the index, rebuilt from
+# the keys of the index otherwise (after a crash) and whenever it gets full.
+class BloomIndex(Index):
+    MAGIC = b"XXBF"
+    HEADER = struct.Struct("<4sQQQ")  # magic, blocks, keys, bits per key
+
+    def __init__(self, index: Index, fpath: Path, bits_per_key: int = 10, capacity: int = 1 << 16):
+        self._index = index
+        self._fpath = fpath
+        self._bits_per_key = bits_per_key
+
+        # lookups the filter answered, and the ones it let through for keys not in the index
+        self.negatives = 0
+        self.false_positives = 0
+
+        if not self._load():
+            self._rebuild(max(capacity, len(self._index) * 2))  # type: ignore
+
+    @property
+    def false_positive_rate(self) -> float:
+        return self.false_positives / max(self.false_positives + self.negatives, 1)
+
+    def _load(self) -> bool:
+        try:
+            with open(self._fpath, "rb") as f:
+                magic, blocks, count, bits_per_key = self.HEADER.unpack(f.read(self.HEADER.size))
+                bits = bytearray(f.read())
+        except (FileNotFoundError, struct.error):
+            return False
+        if magic != self.MAGIC or bits_per_key != self._bits_per_key:
+            return False
+        if len(bits) != blocks * BloomFilter.BLOCK_BYTES or count != len(self._index):  # type: ignore
+            return False
+        self._filter = BloomFilter(bits, blocks, bits_per_key)
+        self._count = count
+        return True
+
+    def _save(self) -> None:
+        tmp_fpath = self._fpath.with_suffix(".tmp")
+        with open(tmp_fpath, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, self._filter.blocks, self._count, self._bits_per_key))
+            f.write(self._filter.bits)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_fpath, self._fpath)
+
+    def _rebuild(self, capacity: int) -> None:
+        self._filter = BloomFilter.new(capacity, self._bits_per_key)
+        self._count = 0
+        for key in self._index:  # type: ignore
+            self._filter.add(key)
+            self._count += 1
+
+    @property
+    def _capacity(self) -> int:
+        return self._filter.blocks * BloomFilter.BLOCK_BYTES * 8 // self._bits_per_key
+
+    def __len__(self) -> int:
+        return len(self._index)  # type: ignore
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._index)  # type: ignore
+
+    def __contains__(self, key: int) -> bool:
+        return self[key] is not None
+
+    def __getitem__(self, key: int) -> int | None:
+        if key not in self._filter:
+            self.negatives += 1
+            return None
+        value = self._index[key]
+        if value is None:
+            self.false_positives += 1
+        return value
+
+    def __setitem__(self, key: int, value: int) -> None:
+        self._index[key] = value
+        if self._count + 1 > self._capacity:
+            self._rebuild(self._capacity * 2)
+        else:
+            self._filter.add(key)
+            self._count += 1
+
+    def flush(self):
+        self._index.flush()
+
+    def sync(self):
+        self._index.sync()
+
+    def close(self):
+        self._index.close()
+        self._save()
@@ -0,0 +1,209 @@
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from pathlib import Path
+from typing import Iterator, Literal
+
+from .index import Index
+
+__all__ = ("CompactIndex",)
+
+
+# bisect on an array makes an int per probe, the fences narrow it down to this many
+FENCE_STEP = 64
+
+
+def _typecode(size: int) -> str:
+    for typecode in ("I", "L", "Q"):
+        if array(typecode).itemsize == size:
+            return typecode
+    raise Exception(f"no array type of {size} bytes")
+
+
+# The keys and values in two sorted arrays (12 or 16 bytes an entry, against ~100 of a dict),
+# looked up by binary search. A list of every FENCE_STEP-th key (the fences) narrows the search
+# down to FENCE_STEP keys, the high bits of the key pick the fences to search in.
+# New entries go to a dict first, merged into the arrays once it holds merge_ratio of them.
+#
+# The entries are logged like in HashTable (the same file, so a db can switch between the two),
+# the arrays are saved to a snapshot on flush / close and the log after it is replayed on open.
+class CompactIndex(Index):
+    SNAPSHOT_MAGIC = b"XXCI"
+    SNAPSHOT_HEADER = struct.Struct("<4sBBxxQQ")  # magic, key_size, value_size, count, log offset
+
+    def __init__(
+        self,
+        log_fpath: Path,
+        snapshot_fpath: Path,
+        key_size: Literal[4, 8],
+        value_size: Literal[4, 8],
+        merge_ratio: float = 0.01,
+        min_delta: int = 4096,
+    ):
+        self._key_size = key_size
+        self._value_size = value_size
+        self._kv_size = key_size + value_size
+        self._struct = {
+            (4, 4): struct.Struct("<II"),
+            (8, 4): struct.Struct("<QI"),
+            (4, 8): struct.Struct("<IQ"),
+            (8, 8): struct.Struct("<QQ"),
+        }[(key_size, value_size)]
+        self._merge_ratio = merge_ratio
+        self._min_delta = min_delta
+
+        self._keys = array(_typecode(key_size))
+        self._values = array(_typecode(value_size))
+        self._delta: dict[int, int] = {}
+        self._fences: list[int] = []
+        # the fences of keys k with k >> _radix_shift == b start at _radix[b]
+        self._radix = array("I", [0, 0])
+        self._radix_shift = self._radix_max = 0
+
+        log_fpath.touch(exist_ok=True)
+        self._fp = open(log_fpath, "r+b", buffering=0)
+        self._snapshot_fpath = snapshot_fpath
+        log_size = log_fpath.stat().st_size
+        log_size -= log_size % self._kv_size
+        self._snapshot_offset = self._load_snapshot(log_size)
+
+        # the entries logged after the snapshot
+        self._fp.seek(self._snapshot_offset)
+        tail = self._fp.read(log_size - self._snapshot_offset)
+        self._delta = dict(self._struct.iter_unpack(tail))
+        self._fp.seek(log_size)
+        self._log_size = log_size
+        self._build_fences()
+        self._maybe_merge()
+
+    def _load_snapshot(self, log_size: int) -> int:
+        try:
+            with open(self._snapshot_fpath, "rb") as f:
+                magic, key_size, value_size, count, offset = self.SNAPSHOT_HEADER.unpack(
+                    f.read(self.SNAPSHOT_HEADER.size)
+                )
+                # made from another log, or a longer one
+                if magic != self.SNAPSHOT_MAGIC or (key_size, value_size) != (self._key_size, self._value_size):
+                    return 0
+                if offset > log_size:
+                    return 0
+                self._keys.fromfile(f, count)
+                self._values.fromfile(f, count)
+        except (FileNotFoundError, EOFError, struct.error):
+            self._keys = array(self._keys.typecode)
+            self._values = array(self._values.typecode)
+            return 0
+
+        if sys.byteorder != "little":
+            self._keys.byteswap()
+            self._values.byteswap()
+        return offset
+
+    def _save_snapshot(self) -> None:
+        self._merge()
+        keys, values = self._keys, self._values
+        if sys.byteorder != "little":
+            keys, values = array(keys.typecode, keys), array(values.typecode, values)
+            keys.byteswap()
+            values.byteswap()
+
+        tmp_fpath = self._snapshot_fpath.with_suffix(".tmp")
+        with open(tmp_fpath, "wb") as f:
+            f.write(
+                self.SNAPSHOT_HEADER.pack(
+                    self.SNAPSHOT_MAGIC, self._key_size, self._value_size, len(keys), self._log_size
+                )
+            )
+            keys.tofile(f)
+            values.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_fpath, self._snapshot_fpath)
+        self._snapshot_offset = self._log_size
+
+    def __len__(self) -> int:
+        return len(self._keys) + len(self._delta)
+
+    def __iter__(self) -> Iterator[int]:
+        yield from self._keys
+        yield from self._delta
+
+    def __contains__(self, key: int) -> bool:
+        return self[key] is not None
+
+    def __getitem__(self, key: int) -> int | None:
+        value = self._delta.get(key, None)
+        if value is not None:
+            return value
+        b = key >> self._radix_shift
+        if b > self._radix_max:
+            b = self._radix_max
+        radix = self._radix
+        j = bisect_right(self._fences, key, radix[b], radix[b + 1])
+        if j == 0:
+            return None
+        keys = self._keys
+        lo = (j - 1) * FENCE_STEP
+        i = bisect_left(keys, key, lo, lo + FENCE_STEP if j < len(self._fences) else len(keys))
+        if i < len(keys) and keys[i] == key:
+            return self._values[i]
+        return None
+
+    def __setitem__(self, key: int, value: int) -> None:
+        assert self[key] is None
+
+        self._fp.write(key.to_bytes(self._key_size, "little") + value.to_bytes(self._value_size, "little"))
+        self._log_size += self._kv_size
+
+        self._delta[key] = value
+        self._maybe_merge()
+
+    def _maybe_merge(self) -> None:
+        if len(self._delta) >= max(self._min_delta, len(self._keys) * self._merge_ratio):
+            self._merge()
+
+    # one pass over the arrays, copying the runs between the new keys
+    def _merge(self) -> None:
+        if not self._delta:
+            return
+        keys, values = self._keys, self._values
+        new_keys, new_values = array(keys.typecode), array(values.typecode)
+        start = 0
+        for key in sorted(self._delta):
+            i = bisect_left(keys, key, start)
+            new_keys += keys[start:i]
+            new_values += values[start:i]
+            new_keys.append(key)
+            new_values.append(self._delta[key])
+            start = i
+        new_keys += keys[start:]
+        new_values += values[start:]
+
+        self._keys, self._values = new_keys, new_values
+        self._delta = {}
+        self._build_fences()
+
+    def _build_fences(self) -> None:
+        self._fences = fences = self._keys[::FENCE_STEP].tolist()
+        # about a fence per bucket
+        bits = max(len(fences) - 1, 1).bit_length()
+        self._radix_shift = shift = max((fences[-1] if fences else 0).bit_length() - bits, 0)
+        counts = [0] * (1 << bits)
+        for fence in fences:
+            counts[fence >> shift] += 1
+        self._radix = array(_typecode(4) if len(fences) < 1 << 32 else "Q", accumulate(counts, initial=0))
+        self._radix_max = len(counts) - 1
+
+    def flush(self):
+        os.fsync(self._fp.fileno())
+        # the log after the snapshot is replayed on open, keep it short
+        if self._log_size - self._snapshot_offset >= max(self._min_delta, len(self)) * self._kv_size // 4:
+            self._save_snapshot()
+
+    def close(self):
+        if self._log_size != self._snapshot_offset:
+            self._save_snapshot()
+        self._fp.close()
@@ -1,6 +1,7 @@
 # Referenced by: DB
 from typing import Iterator, Literal
 from pathlib import Path
+import os
 import struct
 
 from .index import Index
@@ -52,6 +53,9 @@ class HashTable(Index):
     def flush(self):
         ...
 
+    def sync(self):
+        os.fsync(self._fp.fileno())
+
     def close(self):
         self._fp.close()
         del self._table
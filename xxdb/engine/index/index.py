@@ -19,6 +19,10 @@ class Index(ABC):
     def flush(self):
         ...
 
+    # make what flush wrote durable, run by the checkpoint of the wal in an executor thread
+    def sync(self):
+        ...
+
     def close(self):
         self.flush()
         ...
@@ -0,0 +1,442 @@
+import heapq
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+from pathlib import Path
+from typing import Iterator, Literal, Optional
+
+from .bloom import BloomFilter
+from .compact import _typecode
+from .index import Index
+
+__all__ = ("LsmIndex",)
+
+logger = logging.getLogger(__name__)
+
+# the keys between two fences fill a 4k page (of 8 byte keys)
+FENCE_STEP = 512
+LOG_BUFFER_SIZE = 1 << 20
+# entries read at a time when merging runs
+MERGE_CHUNK = 1 << 14
+
+
+def _little(arr: array) -> array:
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr
+
+
+# | header | padding up to HEADER_SIZE | keys | values | fences | bloom filter |
+# the keys are sorted, the fences are every FENCE_STEP-th of them
+class _Run:
+    MAGIC = b"XXLR"
+    HEADER = struct.Struct("<4sBBBxQQ")  # magic, key_size, value_size, bits per key, count, bloom blocks
+    HEADER_SIZE = 4096
+
+    def __init__(self, fpath: Path, key_size: int, value_size: int):
+        self.id = int(fpath.name.split(".")[-4])
+        self.fpath = fpath
+        with fpath.open("rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, key_size_, value_size_, bits_per_key, self.count, blocks = self.HEADER.unpack_from(self.mm, 0)
+        if magic != self.MAGIC or (key_size_, value_size_) != (key_size, value_size):
+            raise Exception(f"{fpath.name} is not a lsm run of {key_size} / {value_size} bytes")
+
+        self._key_size, self._value_size = key_size, value_size
+        self._key_typecode, self._value_typecode = _typecode(key_size), _typecode(value_size)
+        self._values_offset = self.HEADER_SIZE + self.count * key_size
+        fences_offset = self._values_offset + self.count * value_size
+        bloom_offset = fences_offset + -(-self.count // FENCE_STEP) * key_size
+
+        self.fences = self._keys(fences_offset, -(-self.count // FENCE_STEP))
+        self.min_key = self.fences[0]
+        self.max_key = self._keys(self._values_offset - key_size, 1)[0]
+        self.bloom = BloomFilter(self.mm, blocks, bits_per_key, bloom_offset)
+        self._value = struct.Struct("<I" if value_size == 4 else "<Q")
+
+    @classmethod
+    def write(cls, fpath: Path, keys: array, values: array, key_size: int, value_size: int, bits_per_key: int):
+        bloom = BloomFilter.new(len(keys), bits_per_key)
+        for key in keys:
+            bloom.add(key)
+        with fpath.open("wb") as f:
+            f.write(cls.HEADER.pack(cls.MAGIC, key_size, value_size, bits_per_key, len(keys), bloom.blocks))
+            f.seek(cls.HEADER_SIZE)
+            for arr in (keys, values, keys[::FENCE_STEP]):
+                if sys.byteorder != "little":
+                    arr = array(arr.typecode, arr)
+                    arr.byteswap()
+                arr.tofile(f)
+            f.write(bloom.bits)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _keys(self, offset: int, n: int) -> array:
+        keys = array(self._key_typecode)
+        keys.frombytes(self.mm[offset : offset + n * self._key_size])
+        return _little(keys)
+
+    # h, h2: BloomFilter.hash of the key
+    def get(self, key: int, h: int, h2: int) -> Optional[int]:
+        if key < self.min_key or key > self.max_key or not self.bloom.contains_hash(h, h2):
+            return None
+        lo = (bisect_right(self.fences, key) - 1) * FENCE_STEP
+        keys = self._keys(self.HEADER_SIZE + lo * self._key_size, min(FENCE_STEP, self.count - lo))
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            return self._value.unpack_from(self.mm, self._values_offset + (lo + i) * self._value_size)[0]
+        return None
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        for lo in range(0, self.count, MERGE_CHUNK):
+            n = min(MERGE_CHUNK, self.count - lo)
+            values = array(self._value_typecode)
+            offset = self._values_offset + lo * self._value_size
+            values.frombytes(self.mm[offset : offset + n * self._value_size])
+            yield from zip(self._keys(self.HEADER_SIZE + lo * self._key_size, n), _little(values))
+
+    def overlaps(self, min_key: int, max_key: int) -> bool:
+        return self.min_key <= max_key and min_key <= self.max_key
+
+    def close(self) -> None:
+        self.mm.close()
+
+
+# level 0 holds the runs of the memtables, newest first, their keys overlap.
+# The runs of the other levels are sorted by key and don't overlap.
+class _Level:
+    __slots__ = ("runs", "mins", "count")
+
+    def __init__(self, runs: list[_Run]):
+        self.runs = runs
+        self.mins = [run.min_key for run in runs]
+        self.count = sum(run.count for run in runs)
+
+    def get(self, key: int, h: int, h2: int) -> Optional[int]:
+        i = bisect_right(self.mins, key) - 1
+        return self.runs[i].get(key, h, h2) if i >= 0 else None
+
+
+# A log-structured merge tree. New entries go to a dict (the memtable) and a log, a full
+# memtable is frozen and written to a sorted run in level 0 by a background thread, which
+# also merges the runs down the levels: all of level 0 into level 1 once it has l0_runs runs,
+# a run of level n into the overlapping ones of level n+1 while level n holds more than
+# run_size * level_ratio ** n entries. The runs are mmaped, a lookup reads the bloom filter
+# and one page of keys of at most a run per level.
+#
+# The manifest lists the runs of each level, it is replaced after the runs it lists are written.
+# The logs of the memtables not written to a run yet are replayed on open.
+class LsmIndex(Index):
+    def __init__(
+        self,
+        idx_dpath: Path,
+        db_name: str,
+        key_size: Literal[4, 8],
+        value_size: Literal[4, 8],
+        memtable_size: int = 1 << 18,
+        run_size: int = 1 << 22,
+        l0_runs: int = 4,
+        level_ratio: int = 10,
+        bits_per_key: int = 10,
+        max_immutables: int = 2,
+    ):
+        self._dpath = Path(idx_dpath)
+        self._db_name = db_name
+        self._key_size = key_size
+        self._value_size = value_size
+        self._kv = struct.Struct({(4, 4): "<II", (8, 4): "<QI", (4, 8): "<IQ", (8, 8): "<QQ"}[(key_size, value_size)])
+        self._memtable_size = memtable_size
+        self._run_size = run_size
+        self._l0_runs = l0_runs
+        self._level_ratio = level_ratio
+        self._bits_per_key = bits_per_key
+        self._max_immutables = max_immutables
+
+        self._manifest_fpath = self._dpath / f"{db_name}.lsm.manifest.idx.xxdb"
+        self._levels: tuple[_Level, ...] = ()
+        self._next_id = 0
+        # the logs before it are in the runs
+        self._log_min = 0
+        self._load_manifest()
+        # the key the next run of each level to merge down starts after
+        self._cursors: dict[int, int] = {}
+
+        # frozen memtables (with the seqs of their logs), oldest first, waiting to be written
+        self._immutables: tuple[tuple[dict[int, int], list[int]], ...] = ()
+        self._memtable: dict[int, int] = {}
+        self._log_seqs: list[int] = []
+        for seq in self._log_segments():
+            if seq < self._log_min:
+                self._log_fpath(seq).unlink()
+                continue
+            with self._log_fpath(seq).open("rb") as f:
+                data = f.read()
+            self._memtable.update(self._kv.iter_unpack(data[: len(data) - len(data) % self._kv.size]))
+            self._log_seqs.append(seq)
+        self._log_seq = max(self._log_seqs, default=self._log_min - 1) + 1
+        self._log_seqs.append(self._log_seq)
+        self._fp = self._open_log()
+
+        self._cond = threading.Condition()
+        self._closing = False
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run_background, name=f"lsm-{db_name}", daemon=True)
+        self._thread.start()
+        if len(self._memtable) >= self._memtable_size:
+            self._freeze()
+
+    def _run_fpath(self, run_id: int) -> Path:
+        return self._dpath / f"{self._db_name}.lsm.{run_id}.run.idx.xxdb"
+
+    def _log_fpath(self, seq: int) -> Path:
+        return self._dpath / f"{self._db_name}.lsm.{seq}.log.idx.xxdb"
+
+    # a write of the buffer lets the background thread take the GIL for a while, keep them rare
+    def _open_log(self):
+        return self._log_fpath(self._log_seq).open("ab", buffering=LOG_BUFFER_SIZE)
+
+    def _log_segments(self) -> list[int]:
+        pattern = re.compile(rf"{re.escape(self._db_name)}\.lsm\.(\d+)\.log\.idx\.xxdb")
+        return sorted(int(m[1]) for p in self._dpath.iterdir() if (m := pattern.fullmatch(p.name)))
+
+    def _load_manifest(self) -> None:
+        if self._manifest_fpath.exists():
+            manifest = json.loads(self._manifest_fpath.read_text())
+            self._next_id = manifest["next_id"]
+            self._log_min = manifest["log_min"]
+            self._levels = tuple(
+                _Level([_Run(self._run_fpath(run_id), self._key_size, self._value_size) for run_id in level])
+                for level in manifest["levels"]
+            )
+        # left by a crash before the manifest listed them, or after it stopped to
+        listed = {run.id for level in self._levels for run in level.runs}
+        pattern = re.compile(rf"{re.escape(self._db_name)}\.lsm\.(\d+)\.run\.idx\.xxdb")
+        for p in self._dpath.iterdir():
+            if (m := pattern.fullmatch(p.name)) and int(m[1]) not in listed:
+                p.unlink()
+
+    def _save_manifest(self, levels: tuple[_Level, ...]) -> None:
+        manifest = {
+            "next_id": self._next_id,
+            "log_min": self._log_min,
+            "levels": [[run.id for run in level.runs] for level in levels],
+        }
+        tmp_fpath = self._manifest_fpath.with_suffix(".tmp")
+        with tmp_fpath.open("w") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_fpath, self._manifest_fpath)
+
+    def __len__(self) -> int:
+        return (
+            len(self._memtable)
+            + sum(len(memtable) for memtable, _ in self._immutables)
+            + sum(level.count for level in self._levels)
+        )
+
+    def __iter__(self) -> Iterator[int]:
+        yield from list(self._memtable)
+        for memtable, _ in self._immutables:
+            yield from memtable
+        for level in self._levels:
+            for run in level.runs:
+                for key, _ in run:
+                    yield key
+
+    def __contains__(self, key: int) -> bool:
+        return self[key] is not None
+
+    def __getitem__(self, key: int) -> int | None:
+        value = self._memtable.get(key, None)
+        if value is not None:
+            return value
+        for memtable, _ in reversed(self._immutables):
+            value = memtable.get(key, None)
+            if value is not None:
+                return value
+        levels = self._levels
+        if levels:
+            h, h2 = BloomFilter.hash(key)
+            for run in levels[0].runs:
+                value = run.get(key, h, h2)
+                if value is not None:
+                    return value
+            for level in levels[1:]:
+                value = level.get(key, h, h2)
+                if value is not None:
+                    return value
+        return None
+
+    def __setitem__(self, key: int, value: int) -> None:
+        assert self[key] is None
+
+        self._fp.write(self._kv.pack(key, value))
+        self._memtable[key] = value
+        if len(self._memtable) >= self._memtable_size:
+            self._freeze()
+
+    def _freeze(self) -> None:
+        with self._cond:
+            # the writes stall until the background thread catches up
+            while len(self._immutables) >= self._max_immutables and self._error is None:
+                self._cond.wait()
+            # before the log is closed: the writes after a failure still go to it, the next freeze raises again
+            self._raise_error()
+            self._fp.close()
+            self._immutables += ((self._memtable, self._log_seqs),)
+            self._cond.notify_all()
+        self._memtable = {}
+        self._log_seq += 1
+        self._log_seqs = [self._log_seq]
+        self._fp = self._open_log()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise Exception("lsm background thread failed") from self._error
+
+    def _run_background(self) -> None:
+        try:
+            while 1:
+                with self._cond:
+                    while not self._immutables and not self._closing and not self._compaction():
+                        self._cond.wait()
+                    if not self._immutables and self._closing:
+                        return
+                    memtable = self._immutables[0] if self._immutables else None
+                if memtable is not None:
+                    self._write_memtable(*memtable)
+                elif not self._closing:
+                    self._compact(*self._compaction())  # type: ignore
+        except BaseException as exc:
+            logger.error(f"lsm background thread failed: {exc!r}")
+            with self._cond:
+                self._error = exc
+                self._cond.notify_all()
+
+    def _write_memtable(self, memtable: dict[int, int], log_seqs: list[int]) -> None:
+        keys = array(_typecode(self._key_size), sorted(memtable))
+        values = array(_typecode(self._value_size), map(memtable.__getitem__, keys))
+        run = self._write_run(keys, values)
+
+        levels = self._levels or (_Level([]),)
+        levels = (_Level([run] + levels[0].runs),) + levels[1:]
+        self._log_min = max(log_seqs) + 1
+        self._save_manifest(levels)
+        with self._cond:
+            self._levels = levels
+            self._immutables = self._immutables[1:]
+            self._cond.notify_all()
+        for seq in log_seqs:
+            self._log_fpath(seq).unlink()
+
+    # the memtables frozen during a compaction are written in between, the puts stall on them otherwise
+    def _write_immutables(self) -> None:
+        while self._immutables:
+            self._write_memtable(*self._immutables[0])
+
+    def _write_run(self, keys: array, values: array) -> _Run:
+        with self._cond:
+            run_id = self._next_id
+            self._next_id += 1
+        fpath = self._run_fpath(run_id)
+        _Run.write(fpath, keys, values, self._key_size, self._value_size, self._bits_per_key)
+        return _Run(fpath, self._key_size, self._value_size)
+
+    # the level to merge down and its runs to merge, or None
+    def _compaction(self) -> Optional[tuple[int, list[_Run]]]:
+        levels = self._levels
+        if levels and len(levels[0].runs) >= self._l0_runs:
+            return 0, levels[0].runs
+        for n in range(1, len(levels)):
+            if levels[n].count > self._run_size * self._level_ratio**n:
+                # round robin over the key space
+                runs = levels[n].runs
+                i = bisect_right(levels[n].mins, self._cursors.get(n, -1))
+                return n, [runs[i if i < len(runs) else 0]]
+        return None
+
+    def _compact(self, n: int, runs: list[_Run]) -> None:
+        levels = self._levels
+        if len(levels) == n + 1:
+            levels += (_Level([]),)
+        min_key, max_key = min(run.min_key for run in runs), max(run.max_key for run in runs)
+        below = [run for run in levels[n + 1].runs if run.overlaps(min_key, max_key)]
+
+        # equal keys come from the first run having them, the newer one
+        merged = heapq.merge(*runs, *below, key=itemgetter(0))
+        new_runs = []
+        keys, values = array(_typecode(self._key_size)), array(_typecode(self._value_size))
+        last_key = -1
+        for key, value in merged:
+            if key == last_key:
+                continue
+            last_key = key
+            keys.append(key)
+            values.append(value)
+            if len(keys) >= self._run_size:
+                new_runs.append(self._write_run(keys, values))
+                keys, values = array(keys.typecode), array(values.typecode)
+                self._write_immutables()
+            elif len(keys) % MERGE_CHUNK == 0:
+                self._write_immutables()
+        if keys:
+            new_runs.append(self._write_run(keys, values))
+
+        self._cursors[n] = max_key
+        with self._cond:
+            # level 0 may have got new runs meanwhile
+            levels = self._levels
+            if len(levels) == n + 1:
+                levels += (_Level([]),)
+            merged_ids = {run.id for run in runs} | {run.id for run in below}
+            upper = _Level([run for run in levels[n].runs if run.id not in merged_ids])
+            lower = sorted(
+                [run for run in levels[n + 1].runs if run.id not in merged_ids] + new_runs, key=lambda r: r.min_key
+            )
+            levels = levels[:n] + (upper, _Level(lower)) + levels[n + 2 :]
+            self._save_manifest(levels)
+            self._levels = levels
+        # the lookups going on still have them mmaped
+        for run in runs + below:
+            run.fpath.unlink()
+
+    def flush(self):
+        self._raise_error()
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+        # the logs of the frozen memtables were only closed, their entries are durable once the
+        # runs are written, which may be long after
+        with self._cond:
+            log_seqs = [seq for _, seqs in self._immutables for seq in seqs]
+        for seq in log_seqs:
+            try:
+                fd = os.open(self._log_fpath(seq), os.O_RDONLY)
+            except FileNotFoundError:
+                # in a run by now
+                continue
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def close(self):
+        self.flush()
+        self._fp.close()
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join()
+        for level in self._levels:
+            for run in level.runs:
+                run.close()
+        self._levels = ()
+        self._raise_error()
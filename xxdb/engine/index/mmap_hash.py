@@ -0,0 +1,225 @@
+import mmap
+import struct
+from pathlib import Path
+from typing import Iterator, Literal, Optional
+
+from .index import Index
+
+__all__ = ("MmapHash",)
+
+HASH_MUL = 0x9E3779B97F4A7C15
+U64_MASK = (1 << 64) - 1
+
+
+# | header | padding up to HEADER_SIZE | slot 0 | slot 1 | ... | slot capacity-1 |
+# a slot is | key | value + 1 |, 0 in the value means the slot is empty
+class _Table:
+    MAGIC = b"XXMH"
+    HEADER = struct.Struct("<4sBBxxQQQQ")  # magic, key_size, value_size, capacity, count, cursor, migrated
+    HEADER_SIZE = 4096
+
+    def __init__(self, fpath: Path, slot: struct.Struct, key_size: int, value_size: int, capacity: int = 0):
+        self.fpath = fpath
+        self._slot = slot
+        if capacity:
+            # a new table, the file is sparse until slots get written
+            with fpath.open("wb") as f:
+                f.truncate(self.HEADER_SIZE + capacity * slot.size)
+        self._fp = fpath.open("r+b")
+        self.mm = mmap.mmap(self._fp.fileno(), 0)
+
+        if capacity:
+            self.capacity, self.count, self.cursor, self.migrated = capacity, 0, 0, 0
+            self.write_header(key_size, value_size)
+        else:
+            (
+                magic,
+                key_size_,
+                value_size_,
+                self.capacity,
+                self.count,
+                self.cursor,
+                self.migrated,
+            ) = self.HEADER.unpack_from(self.mm, 0)
+            if magic != self.MAGIC or (key_size_, value_size_) != (key_size, value_size):
+                raise Exception(f"{fpath.name} is not a mmap_hash index of {key_size} / {value_size} bytes")
+        self.bits = self.capacity.bit_length() - 1
+
+    def write_header(self, key_size: int, value_size: int) -> None:
+        self.HEADER.pack_into(
+            self.mm, 0, self.MAGIC, key_size, value_size, self.capacity, self.count, self.cursor, self.migrated
+        )
+
+    def _home(self, key: int) -> int:
+        return ((key * HASH_MUL) & U64_MASK) >> (64 - self.bits)
+
+    # the slot of the key, or the empty slot it would go to
+    def probe(self, key: int) -> tuple[int, int]:
+        mm, unpack_from, slot_size = self.mm, self._slot.unpack_from, self._slot.size
+        mask = self.capacity - 1
+        i = self._home(key)
+        while 1:
+            key_, value = unpack_from(mm, self.HEADER_SIZE + i * slot_size)
+            if value == 0 or key_ == key:
+                return i, value
+            i = (i + 1) & mask
+
+    def get(self, key: int) -> Optional[int]:
+        _, value = self.probe(key)
+        return value - 1 if value else None
+
+    def put_slot(self, i: int, key: int, value: int) -> None:
+        self._slot.pack_into(self.mm, self.HEADER_SIZE + i * self._slot.size, key, value + 1)
+        self.count += 1
+
+    def slot(self, i: int) -> tuple[int, int]:
+        return self._slot.unpack_from(self.mm, self.HEADER_SIZE + i * self._slot.size)
+
+    def __iter__(self) -> Iterator[int]:
+        return self.iter_from(0)
+
+    def iter_from(self, start: int) -> Iterator[int]:
+        for i in range(start, self.capacity):
+            key, value = self.slot(i)
+            if value:
+                yield key
+
+    def flush(self) -> None:
+        self.mm.flush()
+
+    def close(self) -> None:
+        self.mm.close()
+        self._fp.close()
+
+
+# An open addressing (linear probing) hash table in memory mapped files, opened in
+# constant time, lookups only touch the slots they probe.
+# The table doubles once it is max_load full: the keys move to a table of the next
+# generation, {db}.{gen}.mh.idx.xxdb, a few slots per insert (and more on flush),
+# lookups check both tables meanwhile.
+class MmapHash(Index):
+    # slots moved to the new table per insert while resizing, and per flush
+    MIGRATE_STEP = 16
+    FLUSH_MIGRATE_STEP = 64 * 1024
+
+    def __init__(
+        self,
+        idx_dpath: Path,
+        db_name: str,
+        key_size: Literal[4, 8],
+        value_size: Literal[4, 8],
+        initial_capacity: int = 1 << 16,
+        max_load: float = 0.7,
+    ):
+        self._dpath = idx_dpath
+        self._db_name = db_name
+        self._key_size = key_size
+        self._value_size = value_size
+        self._slot = {
+            (4, 4): struct.Struct("<II"),
+            (8, 4): struct.Struct("<QI"),
+            (4, 8): struct.Struct("<IQ"),
+            (8, 8): struct.Struct("<QQ"),
+        }[(key_size, value_size)]
+        # a full table would leave the probing of an absent key without an end
+        if not 0 < max_load < 1:
+            raise Exception(f"max_load must be between 0 and 1, got {max_load}")
+        self._max_load = max_load
+
+        # the newest 2 generations are the table and the one being moved into it
+        gens = sorted(int(fpath.name.split('.')[-4]) for fpath in idx_dpath.glob(f"{db_name}.*.mh.idx.xxdb"))
+        self._gen = gens[-1] if gens else 0
+        self._old: Optional[_Table] = None
+        if gens:
+            self._table = self._open_table(self._gen)
+            if len(gens) > 1:
+                self._old = self._open_table(gens[-2])
+                for gen in gens[:-2]:
+                    self._fpath(gen).unlink()
+        else:
+            capacity = 1 << max(initial_capacity - 1, 1).bit_length()
+            self._table = self._open_table(self._gen, capacity)
+
+    def _fpath(self, gen: int) -> Path:
+        return self._dpath / f"{self._db_name}.{gen}.mh.idx.xxdb"
+
+    def _open_table(self, gen: int, capacity: int = 0) -> _Table:
+        return _Table(self._fpath(gen), self._slot, self._key_size, self._value_size, capacity)
+
+    def __len__(self) -> int:
+        n = self._table.count
+        if self._old is not None:
+            n += self._old.count - self._table.migrated
+        return n
+
+    def __iter__(self) -> Iterator[int]:
+        yield from self._table
+        if self._old is not None:
+            yield from self._old.iter_from(self._table.cursor)
+
+    def __contains__(self, key: int) -> bool:
+        return self[key] is not None
+
+    def __getitem__(self, key: int) -> int | None:
+        value = self._table.get(key)
+        if value is None and self._old is not None:
+            value = self._old.get(key)
+        return value
+
+    def __setitem__(self, key: int, value: int) -> None:
+        assert self[key] is None
+
+        if self._old is not None:
+            self._migrate(self.MIGRATE_STEP)
+        if self._table.count + 1 > self._table.capacity * self._max_load:
+            self._grow()
+
+        i, _ = self._table.probe(key)
+        self._table.put_slot(i, key, value)
+        self._table.write_header(self._key_size, self._value_size)
+
+    def _grow(self) -> None:
+        # the previous resize has to be done first
+        while self._old is not None:
+            self._migrate(self.FLUSH_MIGRATE_STEP)
+        self._old = self._table
+        self._gen += 1
+        self._table = self._open_table(self._gen, self._old.capacity * 2)
+
+    # move the next n slots of the old table
+    def _migrate(self, n: int) -> None:
+        old, table = self._old, self._table
+        assert old is not None
+        end = min(table.cursor + n, old.capacity)
+        for i in range(table.cursor, end):
+            key, value = old.slot(i)
+            if not value:
+                continue
+            j, existing = table.probe(key)
+            # may be there already if the process stopped in the middle of a migration
+            if not existing:
+                table.put_slot(j, key, value - 1)
+            table.migrated += 1
+        table.cursor = end
+        table.write_header(self._key_size, self._value_size)
+
+        if table.cursor == old.capacity:
+            table.flush()
+            old.close()
+            old.fpath.unlink()
+            self._old = None
+            table.cursor = table.migrated = 0
+            table.write_header(self._key_size, self._value_size)
+
+    def flush(self):
+        if self._old is not None:
+            self._migrate(self.FLUSH_MIGRATE_STEP)
+            if self._old is not None:
+                self._old.flush()
+        self._table.flush()
+
+    def close(self):
+        self.flush()
+        if self._old is not None:
+            self._old.close()
+        self._table.close()
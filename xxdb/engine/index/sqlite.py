@@ -1,21 +1,53 @@
-from typing import Union
+from typing import Iterator, Optional, Union
 from pathlib import Path
 import sqlite3 as sqlite
 
 from .index import Index
 
+JOURNAL_MODES = ("delete", "truncate", "persist", "memory", "wal", "off")
+SYNCHRONOUS = ("off", "normal", "full", "extra")
 
+
+# New mappings are kept in memory and inserted in one transaction on flush (or once there are
+# batch_size of them). The ones not flushed yet are lost on a crash, like the pages written since
+# the last flush, the wal (settings.wal) brings both back.
 class SQLite(Index):
-    def __init__(self, idx_fpath: Union[str, Path], key_size, value_size) -> None:
+    def __init__(
+        self,
+        idx_fpath: Union[str, Path],
+        key_size,
+        value_size,
+        journal_mode: str = "wal",
+        # full: the mappings are durable once flush returns, DB.flush drops the wal segments after it
+        synchronous: str = "full",
+        cache_size: Optional[int] = None,  # pages, or KiB if negative
+        mmap_size: Optional[int] = None,  # bytes
+        batch_size: int = 65536,
+    ) -> None:
         super().__init__()
+        journal_mode, synchronous = journal_mode.lower(), synchronous.lower()
+        if journal_mode not in JOURNAL_MODES:
+            raise Exception(f"bad journal_mode: {journal_mode!r}, expected one of {JOURNAL_MODES}")
+        if synchronous not in SYNCHRONOUS:
+            raise Exception(f"bad synchronous: {synchronous!r}, expected one of {SYNCHRONOUS}")
         self._conn = sqlite.connect(Path(idx_fpath), isolation_level=None)
-        # self._cur = self._conn.cursor()
+        self._conn.execute(f"PRAGMA journal_mode = {journal_mode};")
+        self._conn.execute(f"PRAGMA synchronous = {synchronous};")
+        if cache_size is not None:
+            self._conn.execute(f"PRAGMA cache_size = {int(cache_size)};")
+        if mmap_size is not None:
+            self._conn.execute(f"PRAGMA mmap_size = {int(mmap_size)};")
         self._conn.execute("create table if not exists kv (key integer primary key, value integer);")
-        self._conn.execute("create UNIQUE index if not exists kv_key on kv (key);")
-        # self._conn.execute("PRAGMA journal_mode = MEMORY;")
-        # self._conn.execute("PRAGMA synchronous = 1;")
+        # the primary key is the rowid already, the index only doubled the writes
+        self._conn.execute("drop index if exists kv_key;")
+
+        self._batch_size = batch_size
+        self._pending: dict[int, int] = {}
 
     def __getitem__(self, key) -> int | None:
+        value = self._pending.get(key, None)
+        if value is not None:
+            return value
         cur = self._conn.execute("select value from kv where key = ?;", (key,))
         ret = cur.fetchone()
         if ret is None:
@@ -24,13 +56,33 @@ class SQLite(Index):
             return ret[0]
 
     def __setitem__(self, key, value) -> None:
-        self._conn.execute("insert into kv values (?, ?);", (key, value))
+        self._pending[key] = value
+        if self._batch_size and len(self._pending) >= self._batch_size:
+            self.flush()
 
     def __contains__(self, key) -> bool:
         return self[key] is not None
 
+    def __len__(self) -> int:
+        return self._conn.execute("select count(*) from kv;").fetchone()[0] + len(self._pending)
+
+    def __iter__(self) -> Iterator[int]:
+        for (key,) in self._conn.execute("select key from kv;"):
+            yield key
+        yield from list(self._pending)
+
     def flush(self):
-        ...
+        if not self._pending:
+            return
+        self._conn.execute("begin;")
+        try:
+            self._conn.executemany("insert into kv values (?, ?);", self._pending.items())
+        except BaseException:
+            self._conn.execute("rollback;")
+            raise
+        self._conn.execute("commit;")
+        self._pending = {}
 
     def close(self):
+        self.flush()
         self._conn.close()
@@ -1,9 +1,27 @@
 from functools import partial
-from prometheus_client import Counter, CollectorRegistry, Gauge
+from typing import Optional
+
+from prometheus_client import Counter, CollectorRegistry, Gauge, Histogram
+
+from xxdb.engine.buffer.replacer import ArcReplacer
+from xxdb.engine.disk import IOScheduler
+from xxdb.engine.index import Index
+from xxdb.engine.index.bloom import BloomIndex
+from xxdb.engine.wal import Wal
+
+# block io takes ~100us on ssd, the default buckets start at 5ms
+IO_SECONDS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
 
 
 class PrometheusClient:
-    def __init__(self, bp_mgr, dbname: str = '') -> None:
+    def __init__(
+        self,
+        bp_mgr,
+        dbname: str = '',
+        io_scheduler: Optional[IOScheduler] = None,
+        wal: Optional[Wal] = None,
+        index: Optional[Index] = None,
+    ) -> None:
         self._reg = CollectorRegistry()
 
         Counter_ = partial(Counter, registry=self._reg, labelnames=["dbname"])
@@ -24,8 +42,110 @@ class PrometheusClient:
         self._bufferpool_flush_cnt = Counter_("bufferpool_flush_cnt", "")
 
         @bp_mgr.on("flush")
-        def on_bufferpool_flush():
-            self._bufferpool_flush_cnt.labels(dbname).inc()
+        def on_bufferpool_flush(pages: int = 1):
+            self._bufferpool_flush_cnt.labels(dbname).inc(pages)
+
+        self._bufferpool_flush_bytes_cnt = Counter_("bufferpool_flush_bytes", "")
+        self._bufferpool_flush_pages_rate = Gauge_("bufferpool_flush_pages_per_second", "")
+        self._bufferpool_flush_mb_rate = Gauge_("bufferpool_flush_mb_per_second", "")
+
+        @bp_mgr.on("flush_all")
+        def on_bufferpool_flush_all(pages: int, nbytes: int, elapsed: float):
+            self._bufferpool_flush_bytes_cnt.labels(dbname).inc(nbytes)
+            if elapsed > 0:
+                self._bufferpool_flush_pages_rate.labels(dbname).set(pages / elapsed)
+                self._bufferpool_flush_mb_rate.labels(dbname).set(nbytes / elapsed / 1024 / 1024)
+
+        self._bufferpool_bytes = Gauge_("bufferpool_bytes", "")
+        self._bufferpool_bytes.labels(dbname).set_function(lambda: bp_mgr.used_bytes)
+
+        # of the whole buffer pool, which may be shared by several dbs
+        buffer_pool = bp_mgr.buffer_pool
+        self._bufferpool_total_bytes = Gauge_("bufferpool_total_bytes", "")
+        self._bufferpool_total_bytes.labels(dbname).set_function(lambda: buffer_pool.used_bytes)
+        self._bufferpool_total_pages = Gauge_("bufferpool_total_pages", "")
+        self._bufferpool_total_pages.labels(dbname).set_function(lambda: buffer_pool.used_pages)
+        self._bufferpool_headroom = Gauge_("bufferpool_headroom", "")
+        self._bufferpool_headroom.labels(dbname).set_function(lambda: buffer_pool.headroom)
+
+        self._bufferpool_cleaner_low_watermark = Gauge_("bufferpool_cleaner_low_watermark", "")
+        self._bufferpool_cleaner_low_watermark.labels(dbname).set(buffer_pool.low_watermark)
+        self._bufferpool_cleaner_high_watermark = Gauge_("bufferpool_cleaner_high_watermark", "")
+        self._bufferpool_cleaner_high_watermark.labels(dbname).set(buffer_pool.high_watermark)
+
+        self._bufferpool_cleaner_run_cnt = Counter_("bufferpool_cleaner_run", "")
+        self._bufferpool_cleaner_write_cnt = Counter_("bufferpool_cleaner_write", "")
+
+        @bp_mgr.on("cleaner_run")
+        def on_bufferpool_cleaner_run(pages_written: int):
+            self._bufferpool_cleaner_run_cnt.labels(dbname).inc()
+            self._bufferpool_cleaner_write_cnt.labels(dbname).inc(pages_written)
+
+        if isinstance(bp_mgr.replacer, ArcReplacer):
+            self._bufferpool_arc_target = Gauge_("bufferpool_arc_target", "")
+            self._bufferpool_arc_target.labels(dbname).set_function(lambda: bp_mgr.replacer.target)
+
+        if io_scheduler is not None:
+            self._register_io(io_scheduler, dbname)
+        if wal is not None:
+            self._register_wal(wal, dbname)
+        if isinstance(index, BloomIndex):
+            self._register_bloom(index, dbname)
+
+    def _register_io(self, io_scheduler: IOScheduler, dbname: str) -> None:
+        Counter_ = partial(Counter, registry=self._reg, labelnames=["dbname"])
+        Gauge_ = partial(Gauge, registry=self._reg, labelnames=["dbname"])
+        Histogram_ = partial(Histogram, registry=self._reg, labelnames=["dbname"], buckets=IO_SECONDS_BUCKETS)
+
+        self._io_read_queue_len = Gauge_("io_read_queue_length", "")
+        self._io_read_queue_len.labels(dbname).set_function(lambda: io_scheduler.read_queue_len)
+        self._io_write_queue_len = Gauge_("io_write_queue_length", "")
+        self._io_write_queue_len.labels(dbname).set_function(lambda: io_scheduler.write_queue_len)
+        self._io_inflight = Gauge_("io_inflight_pages", "")
+        self._io_inflight.labels(dbname).set_function(lambda: io_scheduler.inflight)
+
+        self._io_read_pages_cnt = Counter_("io_read_pages", "")
+        self._io_read_wait = Histogram_("io_read_wait_seconds", "")
+        self._io_read_service = Histogram_("io_read_service_seconds", "")
+
+        @io_scheduler.on("read")
+        def on_io_read(pages: int, wait_time: float, service_time: float):
+            self._io_read_pages_cnt.labels(dbname).inc(pages)
+            self._io_read_wait.labels(dbname).observe(wait_time)
+            self._io_read_service.labels(dbname).observe(service_time)
+
+        self._io_write_pages_cnt = Counter_("io_write_pages", "")
+        self._io_write_wait = Histogram_("io_write_wait_seconds", "")
+        self._io_write_service = Histogram_("io_write_service_seconds", "")
+
+        @io_scheduler.on("write")
+        def on_io_write(pages: int, wait_time: float, service_time: float):
+            self._io_write_pages_cnt.labels(dbname).inc(pages)
+            self._io_write_wait.labels(dbname).observe(wait_time)
+            self._io_write_service.labels(dbname).observe(service_time)
+
+    def _register_wal(self, wal: Wal, dbname: str) -> None:
+        Counter_ = partial(Counter, registry=self._reg, labelnames=["dbname"])
+
+        self._wal_commit_cnt = Counter_("wal_commit", "")
+        self._wal_records_cnt = Counter_("wal_records", "")
+        self._wal_bytes_cnt = Counter_("wal_bytes", "")
+
+        @wal.on("commit")
+        def on_wal_commit(records: int, nbytes: int):
+            self._wal_commit_cnt.labels(dbname).inc()
+            self._wal_records_cnt.labels(dbname).inc(records)
+            self._wal_bytes_cnt.labels(dbname).inc(nbytes)
+
+    def _register_bloom(self, bloom: BloomIndex, dbname: str) -> None:
+        Gauge_ = partial(Gauge, registry=self._reg, labelnames=["dbname"])
+
+        self._index_bloom_negatives = Gauge_("index_bloom_negatives", "")
+        self._index_bloom_negatives.labels(dbname).set_function(lambda: bloom.negatives)
+        self._index_bloom_false_positives = Gauge_("index_bloom_false_positives", "")
+        self._index_bloom_false_positives.labels(dbname).set_function(lambda: bloom.false_positives)
+        self._index_bloom_fpr = Gauge_("index_bloom_false_positive_rate", "")
+        self._index_bloom_fpr.labels(dbname).set_function(lambda: bloom.false_positive_rate)
 
     @property
     def registry(self):
@@ -0,0 +1,96 @@
+# Referenced in: engine.schema
+import ast
+
+__all__ = ("Predicate",)
+
+# the python types the constants compared with a column of a type may have
+_NUMBER = (int, float)
+_CONSTANT_TYPES = {"string": (str,), "bytes": (bytes,)}
+
+_COMPARE_OPS = {
+    ast.Eq: "==",
+    ast.NotEq: "!=",
+    ast.Lt: "<",
+    ast.LtE: "<=",
+    ast.Gt: ">",
+    ast.GtE: ">=",
+    ast.In: "in",
+    ast.NotIn: "not in",
+}
+
+
+# A filter on the columns of the records, like `ts > 100 and (uid == 5 or text != "a")`:
+# comparisons of columns and constants (==, !=, <, <=, >, >=, chained too, and in / not in a
+# tuple of constants), combined by and, or, not and parentheses. It is parsed with ast, only
+# these nodes are taken, and turned into a python expression once (source), the records are
+# then matched by compiled code. A comparison of a column a record's schema does not have is
+# False.
+class Predicate:
+    def __init__(self, text: str):
+        try:
+            tree = ast.parse(text.strip(), mode="eval")
+        except SyntaxError as exc:
+            raise Exception(f"bad predicate {text!r}: {exc.msg}")
+        self.text = text
+        self._expr = tree.body
+        self.columns: frozenset[str] = frozenset()
+        self._check(self._expr)
+
+    def _check(self, node: ast.AST) -> None:
+        if isinstance(node, ast.BoolOp):
+            for value in node.values:
+                self._check(value)
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            self._check(node.operand)
+        elif isinstance(node, ast.Compare):
+            for op, operand in zip(node.ops, node.comparators):
+                if type(op) not in _COMPARE_OPS:
+                    raise Exception(f"bad predicate {self.text!r}: unsupported comparison")
+                constants = isinstance(operand, ast.Tuple) and all(isinstance(e, ast.Constant) for e in operand.elts)
+                if isinstance(op, (ast.In, ast.NotIn)) != constants:
+                    raise Exception(f"bad predicate {self.text!r}: in takes a tuple of constants")
+            for operand in (node.left, *node.comparators):
+                if isinstance(operand, ast.Name):
+                    self.columns |= {operand.id}
+                elif isinstance(operand, ast.Constant):
+                    continue
+                elif operand is node.left or not isinstance(operand, ast.Tuple):
+                    raise Exception(f"bad predicate {self.text!r}: compares columns and constants only")
+        else:
+            raise Exception(f"bad predicate {self.text!r}: unsupported {type(node).__name__}")
+
+    # the python expression: columns maps the names of the columns of a schema to the names of
+    # the variables holding their values, types to their types
+    def source(self, columns: dict[str, str], types: dict[str, str]) -> str:
+        return self._source(self._expr, columns, types)
+
+    def _source(self, node: ast.AST, columns: dict[str, str], types: dict[str, str]) -> str:
+        if isinstance(node, ast.BoolOp):
+            op = " and " if isinstance(node.op, ast.And) else " or "
+            return "(" + op.join(self._source(value, columns, types) for value in node.values) + ")"
+        if isinstance(node, ast.UnaryOp):
+            return f"(not {self._source(node.operand, columns, types)})"
+
+        assert isinstance(node, ast.Compare)
+        operands = [node.left, *node.comparators]
+        names = [operand.id for operand in operands if isinstance(operand, ast.Name)]
+        if any(name not in columns for name in names):
+            return "False"
+        allowed = tuple({t for name in names for t in _CONSTANT_TYPES.get(types[name], _NUMBER)})
+        parts = []
+        for operand in operands:
+            if isinstance(operand, ast.Name):
+                parts.append(columns[operand.id])
+                continue
+            if isinstance(operand, ast.Tuple):
+                values = tuple(e.value for e in operand.elts)  # type: ignore
+            else:
+                values = (operand.value,)  # type: ignore
+            for value in values:
+                if names and not isinstance(value, allowed):
+                    raise Exception(f"bad predicate {self.text!r}: {names[0]} compared with {value!r}")
+            parts.append(repr(values) if isinstance(operand, ast.Tuple) else repr(values[0]))
+        source = parts[0]
+        for op, part in zip(node.ops, parts[1:]):
+            source += f" {_COMPARE_OPS[type(op)]} {part}"
+        return f"({source})"
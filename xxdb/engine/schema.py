@@ -1,18 +1,249 @@
 # Referenced in: engine.DB, http.ws_client
+import struct
+import sys
+from array import array
 from collections import namedtuple
+from typing import Callable, Iterable, Optional, Union
 
 from pb_encoding import getEncoder, getDecoder
 
 from xxdb.engine.config import SchemasConfig as SchemasConfig
+from xxdb.engine.predicate import Predicate
 
 __all__ = ("Schema", "SchemasConfig")
 
 
-SchemaColumn = namedtuple("SchemaColumn", ["name", "encode", "decode"])
+SchemaColumn = namedtuple("SchemaColumn", ["name", "encode", "decode", "typ"])
+
+# the fixed size types, a run of columns of them is packed by one struct
+_STRUCT_FORMATS = {
+    "fixed32": "I",
+    "fixed64": "Q",
+    "sfixed32": "i",
+    "sfixed64": "q",
+    "float": "f",
+    "double": "d",
+}
+_UNSIGNED_VARINTS = ("uint32", "uint64")
+_SIGNED_VARINTS = ("int32", "int64")
+_ZIGZAG_VARINTS = ("sint32", "sint64")
+_BYTE = [bytes((i,)) for i in range(0x80)]
+# the array typecodes of the numeric types, for unpack_columns
+_ARRAY_TYPECODES = {
+    "int32": "i",
+    "int64": "q",
+    "uint32": "I",
+    "uint64": "Q",
+    "sint32": "i",
+    "sint64": "q",
+    "fixed32": "I",
+    "fixed64": "Q",
+    "sfixed32": "i",
+    "sfixed64": "q",
+    "float": "f",
+    "double": "d",
+}
+
+
+def _encode_varint(value: int) -> bytes:
+    if value < 0:
+        # as pb_encoding does
+        data = bytearray()
+        getEncoder("uint64")(data.__iadd__, value)
+        return bytes(data)
+    data = bytearray()
+    while value > 0x7F:
+        data.append(0x80 | (value & 0x7F))
+        value >>= 7
+    data.append(value)
+    return bytes(data)
+
+
+def _encode_signed_varint(value: int) -> bytes:
+    return _encode_varint(value + (1 << 64) if value < 0 else value)
+
+
+# The codecs of a schema are generated when the Schema is built: one function for each schema
+# code, with the columns unrolled, a run of fixed size columns read or written by one struct,
+# and the varints of up to 2 bytes inlined. The other cases go to pb_encoding, the bytes are the same.
+# as_row: unpack returns the tuple of the values instead of the dict
+# wanted: the names of the columns to decode, the others are skipped, the ones after the last
+# wanted one not even that
+def _compile_unpack(
+    code: int,
+    name: str,
+    columns: list[SchemaColumn],
+    as_row: bool = False,
+    wanted: Optional[frozenset] = None,
+) -> Callable[[bytes], Union[dict, tuple]]:
+    if wanted is not None:
+        columns = columns[: max((i + 1 for i, col in enumerate(columns) if col.name in wanted), default=0)]
+    namespace: dict = {"decode_size": getDecoder("uint64")}
+    lines = ["def unpack(buffer):", "    pos = 1"]
+    values = []
+    decoded = []
+    i = 0
+    while i < len(columns):
+        col = columns[i]
+        if col.typ in _STRUCT_FORMATS:
+            run = []
+            formats = []
+            while i < len(columns) and columns[i].typ in _STRUCT_FORMATS:
+                fmt = _STRUCT_FORMATS[columns[i].typ]
+                if wanted is None or columns[i].name in wanted:
+                    run.append(f"v{i}")
+                    decoded.append(columns[i])
+                    formats.append(fmt)
+                else:
+                    formats.append(f"{struct.calcsize(fmt)}x")
+                i += 1
+            fmt = struct.Struct("<" + "".join(formats))
+            if run:
+                namespace[f"s{i}"] = fmt
+                lines.append(f"    {', '.join(run)}, = s{i}.unpack_from(buffer, pos)")
+            lines.append(f"    pos += {fmt.size}")
+            values += run
+            continue
+
+        if wanted is not None and col.name not in wanted:
+            lines += _skip_lines(col)
+            i += 1
+            continue
+        v = f"v{i}"
+        if col.typ in ("string", "bytes"):
+            lines.append("    b = buffer[pos]")
+            lines.append("    if b < 0x80:")
+            lines.append("        end = pos + 1 + b")
+            lines.append(f"        {v} = buffer[pos + 1 : end]")
+            lines.append("    else:")
+            lines.append("        size, pos = decode_size(buffer, pos)")
+            lines.append("        end = pos + size")
+            lines.append(f"        {v} = buffer[pos:end]")
+            lines.append("    pos = end")
+            # str() takes a memoryview too
+            lines.append(f"    {v} = str({v}, 'utf-8')" if col.typ == "string" else f"    {v} = bytes({v})")
+        else:
+            # of 1 or 2 bytes, below the sign bit of any of the types
+            namespace[f"d{i}"] = col.decode
+            lines.append("    b = buffer[pos]")
+            zigzag = f"        {v} = ({v} >> 1) ^ -({v} & 1)"
+            lines.append("    if b < 0x80:")
+            lines.append(f"        {v} = b")
+            lines.append("        pos += 1")
+            if col.typ in _ZIGZAG_VARINTS:
+                lines.append(zigzag)
+            lines.append("    elif buffer[pos + 1] < 0x80:")
+            lines.append(f"        {v} = (b & 0x7F) | (buffer[pos + 1] << 7)")
+            lines.append("        pos += 2")
+            if col.typ in _ZIGZAG_VARINTS:
+                lines.append(zigzag)
+            lines.append("    else:")
+            lines.append(f"        {v}, pos = d{i}(buffer, pos)")
+        values.append(v)
+        decoded.append(col)
+        i += 1
+
+    if as_row:
+        lines.append(f"    return ({''.join(v + ', ' for v in values)})")
+    else:
+        items = [f"{col.name!r}: {v}" for col, v in zip(decoded, values)]
+        items.append(f"'schema_': {name!r}")
+        lines.append(f"    return {{{', '.join(items)}}}")
+    exec("\n".join(lines), namespace)
+    return namespace["unpack"]
+
+
+# the lines moving pos past a column, of a size not known in advance
+def _skip_lines(col: SchemaColumn) -> list[str]:
+    if col.typ in _STRUCT_FORMATS:
+        return [f"    pos += {struct.calcsize(_STRUCT_FORMATS[col.typ])}"]
+    if col.typ in ("string", "bytes"):
+        return [
+            "    b = buffer[pos]",
+            "    if b < 0x80:",
+            "        pos += 1 + b",
+            "    else:",
+            "        size, pos = decode_size(buffer, pos)",
+            "        pos += size",
+        ]
+    return [
+        "    while buffer[pos] & 0x80:",
+        "        pos += 1",
+        "    pos += 1",
+    ]
+
+
+# the records cut down to the wanted columns: the schema code and the bytes of the wanted
+# columns as they are, the ones of a run of wanted columns sliced at once
+def _compile_project(columns: list[SchemaColumn], wanted: frozenset) -> Callable[[bytes], bytes]:
+    namespace: dict = {"decode_size": getDecoder("uint64")}
+    lines = ["def project(buffer):", "    pos = 1"]
+    slices = ["buffer[:1]"]
+    start = None
+    last = max((i for i, col in enumerate(columns) if col.name in wanted), default=-1)
+    for i, col in enumerate(columns[: last + 1]):
+        if col.name in wanted and start is None:
+            start = f"a{i}"
+            lines.append(f"    {start} = pos")
+        elif col.name not in wanted and start is not None:
+            lines.append(f"    b{i} = pos")
+            slices.append(f"buffer[{start}:b{i}]")
+            start = None
+        lines += _skip_lines(col)
+    if start is not None:
+        slices.append(f"buffer[{start}:pos]")
+    lines.append(f"    return b''.join(({''.join(s + ', ' for s in slices)}))")
+    exec("\n".join(lines), namespace)
+    return namespace["project"]
+
+
+def _compile_pack(code: int, columns: list[SchemaColumn]) -> Callable[[dict], bytes]:
+    namespace: dict = {
+        "BYTE": _BYTE,
+        "encode_varint": _encode_varint,
+        "encode_signed_varint": _encode_signed_varint,
+    }
+    lines = ["def pack(raw_data):", "    data = bytearray()"]
+    # the schema code heads the first struct
+    run = [str(code)]
+    formats = ["B"]
+    for i, col in enumerate(columns):
+        if col.typ in _STRUCT_FORMATS:
+            run.append(f"raw_data[{col.name!r}]")
+            formats.append(_STRUCT_FORMATS[col.typ])
+            continue
+        if run:
+            namespace[f"s{i}"] = struct.Struct("<" + "".join(formats))
+            lines.append(f"    data += s{i}.pack({', '.join(run)})")
+            run, formats = [], []
+
+        lines.append(f"    v = raw_data[{col.name!r}]")
+        if col.typ in ("string", "bytes"):
+            if col.typ == "string":
+                lines.append("    v = v.encode('utf-8')")
+            lines.append("    size = len(v)")
+            lines.append("    data += BYTE[size] if size < 0x80 else encode_varint(size)")
+            lines.append("    data += v")
+        elif col.typ in _UNSIGNED_VARINTS:
+            lines.append("    data += BYTE[v] if 0 <= v < 0x80 else encode_varint(v)")
+        elif col.typ in _SIGNED_VARINTS:
+            lines.append("    data += BYTE[v] if 0 <= v < 0x80 else encode_signed_varint(v)")
+        else:
+            lines.append("    v = v << 1 if v >= 0 else (v << 1) ^ ~0")
+            lines.append("    data += BYTE[v] if 0 <= v < 0x80 else encode_signed_varint(v)")
+    if run:
+        namespace["s"] = struct.Struct("<" + "".join(formats))
+        lines.append(f"    data += s.pack({', '.join(run)})")
+    lines.append("    return bytes(data)")
+    exec("\n".join(lines), namespace)
+    return namespace["pack"]
 
 
 # TODO: add validation for schemas
 class Schema:
+    # the codecs of the projections are compiled on demand, up to this many are kept
+    MAX_PROJECTIONS = 256
+
     def __init__(self, schemas: SchemasConfig) -> None:
         # make sure no duplicate schema code
         _validate = len(schemas) == len({s.code for s in schemas})
@@ -22,40 +253,238 @@ class Schema:
         self._schema_name_map = {s.code: s.name for s in schemas}
         self._cols: dict[int, list[SchemaColumn]] = {
             s.code: [
-                SchemaColumn(col.name, getEncoder(col.typ), getDecoder(col.typ))
+                SchemaColumn(col.name, getEncoder(col.typ), getDecoder(col.typ), col.typ)
                 for col in sorted(s.columns, key=lambda col: col.num)
             ]
             for s in schemas
         }
+        self._col_names = {col.name for cols in self._cols.values() for col in cols}
+        self._unpackers = {
+            code: _compile_unpack(code, self._schema_name_map[code], cols) for code, cols in self._cols.items()
+        }
+        self._row_unpackers = {
+            code: _compile_unpack(code, self._schema_name_map[code], cols, as_row=True)
+            for code, cols in self._cols.items()
+        }
+        self._packers = {self._schema_name_map[code]: _compile_pack(code, cols) for code, cols in self._cols.items()}
+        self._projections: dict[tuple, Callable] = {}
 
-    def unpack(self, data_bytes: bytes) -> dict:
+    # columns: only these are decoded, the records of a schema without any of them have
+    # only "schema_"; projected: the records are cut down to the columns by project
+    def unpack(self, data_bytes: bytes, columns: Optional[Iterable[str]] = None, projected: bool = False) -> dict:
+        if columns is not None:
+            return self.unpacker(columns, projected)(data_bytes)
         schema_code = data_bytes[0]
-        pos = 1  # skip schema code
-        data = {}
-
-        try:
-            for schema_col in self._cols[schema_code]:
-                result, pos = schema_col.decode(data_bytes, pos)
-                data[schema_col.name] = result
-            data["schema_"] = self._schema_name_map[schema_code]
-        except KeyError:
+        unpack = self._unpackers.get(schema_code)
+        if unpack is None:
             raise Exception(f"skip unknown schema code: {schema_code}")
+        return unpack(data_bytes)
+
+    # unpack of the columns, for many records
+    def unpacker(self, columns: Optional[Iterable[str]] = None, projected: bool = False) -> Callable[[bytes], dict]:
+        if columns is None:
+            return self.unpack
+        wanted = self._wanted(columns)
+        kind = "projected" if projected else "unpack"
+        projection = self._projection
+
+        def unpack(data_bytes: bytes) -> dict:
+            return projection(kind, data_bytes[0], wanted)(data_bytes)
+
+        return unpack
+
+    # the records cut down to the columns: the bytes of the others are left out, no column is
+    # decoded. unpack(..., projected=True) of the same columns decodes them
+    def projector(self, columns: Iterable[str]) -> Callable[[bytes], bytes]:
+        wanted = self._wanted(columns)
+        projection = self._projection
+
+        def project(data_bytes: bytes) -> bytes:
+            return projection("project", data_bytes[0], wanted)(data_bytes)
+
+        return project
+
+    # a filter of the records by a predicate on their columns (see Predicate), compiled for a
+    # schema the first time one of its records comes; only the columns it compares are decoded
+    def matcher(self, predicate: Union[str, Predicate]) -> Callable[[bytes], bool]:
+        if isinstance(predicate, str):
+            predicate = Predicate(predicate)
+        wanted = self._wanted(predicate.columns)
+        matchers: dict[int, Callable[[bytes], bool]] = {}
+
+        def compile_match(code: int) -> Callable[[bytes], bool]:
+            cols = [col for col in self._cols.get(code, ()) if col.name in wanted]
+            variables = {col.name: f"v{i}" for i, col in enumerate(cols)}
+            source = predicate.source(variables, {col.name: col.typ for col in cols})  # type: ignore
+            namespace = {"row": self._projection("row", code, wanted)}
+            lines = ["def match(buffer):"]
+            if cols:
+                lines.append(f"    {''.join(v + ', ' for v in variables.values())}= row(buffer)")
+            lines.append(f"    return {source}")
+            exec("\n".join(lines), namespace)
+            return namespace["match"]  # type: ignore
+
+        def match(data_bytes: bytes) -> bool:
+            code = data_bytes[0]
+            if code not in matchers:
+                matchers[code] = compile_match(code)
+            return matchers[code](data_bytes)
 
-        return data
+        return match
+
+    def _wanted(self, columns: Iterable[str]) -> frozenset:
+        wanted = frozenset(columns)
+        for name in wanted - self._col_names:
+            raise Exception(f"column {name} not found")
+        return wanted
+
+    # kind: "unpack" or "row" (see _compile_unpack), "project", or "projected" and
+    # "projected_row" for the records project cut down
+    def _projection(self, kind: str, code: int, wanted: frozenset) -> Callable:
+        key = (kind, code, wanted)
+        codec = self._projections.get(key)
+        if codec is not None:
+            return codec
+        columns = self._cols.get(code)
+        if columns is None:
+            raise Exception(f"skip unknown schema code: {code}")
+        name = self._schema_name_map[code]
+        if kind == "project":
+            codec = _compile_project(columns, wanted)
+        elif kind in ("projected", "projected_row"):
+            projected = [col for col in columns if col.name in wanted]
+            codec = _compile_unpack(code, name, projected, as_row=kind == "projected_row")
+        else:
+            codec = _compile_unpack(code, name, columns, as_row=kind == "row", wanted=wanted)
+        if len(self._projections) >= self.MAX_PROJECTIONS:
+            self._projections.clear()
+        self._projections[key] = codec
+        return codec
 
     def pack(self, raw_data: dict, schema: str) -> bytes:
         try:
-            schema_code = self._schema_code_map[schema]
+            pack = self._packers[schema]
         except KeyError:
             raise Exception(f"schema {schema} not found")
 
-        data = bytearray()
-        data += schema_code.to_bytes(1, "little")
+        try:
+            return pack(raw_data)
+        except KeyError as exc:
+            raise Exception(f"column {exc.args[0]} not found")
+
+    # The records decoded column by column: the column name -> the values of the records, in an
+    # array if the column is numeric and every record has it (numpy.frombuffer takes one
+    # without a copy), in a list else, None for the records without it. The "schema_" column
+    # has the schema names. No dict is made for a record; the records of a schema of only
+    # fixed size columns and of the same size are decoded a column at a time by strided slices.
+    # columns, projected: see unpack
+    def unpack_columns(
+        self, data_list: list[bytes], columns: Optional[Iterable[str]] = None, projected: bool = False
+    ) -> dict[str, Union[array, list]]:
+        if not data_list:
+            return {"schema_": []}
+        wanted = None if columns is None else self._wanted(columns)
+        schema_code = data_list[0][0]
+        schema_cols = self._cols.get(schema_code)
+        if schema_cols is None:
+            raise Exception(f"skip unknown schema code: {schema_code}")
+        decoded = schema_cols if wanted is None else [col for col in schema_cols if col.name in wanted]
+        # the columns the records have
+        stored = decoded if projected else schema_cols
 
-        for schema_col in self._cols[schema_code]:
-            try:
-                schema_col.encode(data.__iadd__, raw_data[schema_col.name])
-            except KeyError:
-                raise Exception(f"column {schema_col.name} not found")
+        if all(col.typ in _STRUCT_FORMATS for col in stored):
+            size = struct.calcsize("<B" + "".join(_STRUCT_FORMATS[col.typ] for col in stored))
+            if set(map(len, data_list)) == {size}:
+                joined = b"".join(data_list)
+                if joined[::size].count(schema_code) == len(data_list):
+                    return self._strided_columns(schema_code, stored, decoded, joined, size, len(data_list))
 
-        return bytes(data)
+        if wanted is None:
+            kind = "full"
+        else:
+            kind = "projected_row" if projected else "row"
+        # the columns, the indexes among the records and the rows of the records of each schema
+        rows: dict[int, tuple[list[SchemaColumn], list[int], list[tuple]]] = {}
+        unpackers = {}
+        for i, data in enumerate(data_list):
+            schema_code = data[0]
+            if schema_code not in rows:
+                if schema_code not in self._cols:
+                    raise Exception(f"skip unknown schema code: {schema_code}")
+                cols = self._cols[schema_code]
+                if kind == "full":
+                    unpackers[schema_code] = self._row_unpackers[schema_code]
+                else:
+                    unpackers[schema_code] = self._projection(kind, schema_code, wanted)  # type: ignore
+                    cols = [col for col in cols if col.name in wanted]  # type: ignore
+                rows[schema_code] = (cols, [], [])
+            _, indexes, code_rows = rows[schema_code]
+            indexes.append(i)
+            code_rows.append(unpackers[schema_code](data))
+        return self._build_columns(
+            {code: (cols, indexes, list(zip(*code_rows))) for code, (cols, indexes, code_rows) in rows.items()},
+            len(data_list),
+        )
+
+    # the records of a schema of only fixed size columns (stored), of size bytes each and
+    # joined: the bytes of a column are gathered by strided slices and taken by the array as
+    # they are
+    def _strided_columns(
+        self,
+        schema_code: int,
+        stored: list[SchemaColumn],
+        decoded: list[SchemaColumn],
+        joined: bytes,
+        size: int,
+        n: int,
+    ) -> dict[str, Union[array, list]]:
+        result: dict[str, Union[array, list]] = {}
+        offset = 1
+        for col in stored:
+            fmt = _STRUCT_FORMATS[col.typ]
+            col_size = struct.calcsize(fmt)
+            if col in decoded:
+                col_bytes = bytearray(n * col_size)
+                for i in range(col_size):
+                    col_bytes[i::col_size] = joined[offset + i :: size]
+                column = array(_ARRAY_TYPECODES[col.typ])
+                if column.itemsize == col_size:
+                    column.frombytes(col_bytes)
+                    if sys.byteorder == "big":
+                        column.byteswap()
+                else:
+                    column.fromlist(list(struct.unpack(f"<{n}{fmt}", col_bytes)))
+                result[col.name] = column
+            offset += col_size
+        result["schema_"] = [self._schema_name_map[schema_code]] * n
+        return result
+
+    # by_code: schema code -> its columns decoded, the indexes of its records and the values
+    # of each of the columns
+    def _build_columns(self, by_code: dict, n: int) -> dict[str, Union[array, list]]:
+        result: dict[str, Union[array, list]] = {}
+        if len(by_code) == 1:
+            ((code, (cols, _, values)),) = by_code.items()
+            for col, col_values in zip(cols, values):
+                typecode = _ARRAY_TYPECODES.get(col.typ)
+                result[col.name] = array(typecode, col_values) if typecode else list(col_values)
+            result["schema_"] = [self._schema_name_map[code]] * n
+            return result
+
+        typecodes: dict[str, set] = {}
+        names = [""] * n
+        for code, (cols, indexes, values) in by_code.items():
+            for col, col_values in zip(cols, values):
+                column = result.setdefault(col.name, [None] * n)
+                for i, value in zip(indexes, col_values):
+                    column[i] = value  # type: ignore
+                typecodes.setdefault(col.name, set()).add(_ARRAY_TYPECODES.get(col.typ))
+            name = self._schema_name_map[code]
+            for i in indexes:
+                names[i] = name
+        for col_name, column in result.items():
+            col_typecodes = typecodes[col_name]
+            if len(col_typecodes) == 1 and None not in col_typecodes and None not in column:
+                result[col_name] = array(col_typecodes.pop(), column)
+        result["schema_"] = names
+        return result
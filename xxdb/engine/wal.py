@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Iterator, NamedTuple, Optional
+
+from xxdb.engine.config import WalConfig
+from xxdb.engine.disk import IOScheduler
+from xxdb.utils.event import EventEmitter
+
+__all__ = ("Wal", "WalRecord", "WalConfig")
+
+logger = logging.getLogger(__name__)
+
+
+class WalRecord(NamedTuple):
+    key: int
+    pageid: int
+    page_lsn: int
+    data: bytes
+
+
+# A segment is a run of records:
+# | crc32 | data length | key | pageid | page_lsn | data |
+# crc32 covers everything after itself. A torn record ends the log.
+#
+# Segments are named {name}.{seq}.wal.xxdb, a checkpoint rolls a new one and,
+# once the pages are on disk, drops the older ones.
+class Wal(EventEmitter):
+    HEADER = struct.Struct("<IIQQQ")
+
+    def __init__(self, name: str, dpath: Path, config: WalConfig, scheduler: IOScheduler):
+        super().__init__()
+        self._name = name
+        self._dpath = dpath
+        self.config = config
+        self._scheduler = scheduler
+
+        self._fd: Optional[int] = None
+        self._seq = -1
+        self._segment_bytes = 0
+
+        self._buf = bytearray()
+        self._waiters: list[asyncio.Future] = []
+        # of the batch being written
+        self._committing: list[asyncio.Future] = []
+        self._wakeup = asyncio.Event()
+        # held while writing a segment, so it is not rolled meanwhile
+        self._lock = asyncio.Lock()
+        self._writer_task: Optional[asyncio.Task] = None
+
+    def _segment_fpath(self, seq: int) -> Path:
+        return self._dpath / f"{self._name}.{seq}.wal.xxdb"
+
+    def segments(self) -> list[tuple[int, Path]]:
+        segments = [(int(fpath.name.split('.')[-3]), fpath) for fpath in self._dpath.glob(f"{self._name}.*.wal.xxdb")]
+        return sorted(segments)
+
+    def replay(self) -> Iterator[WalRecord]:
+        for seq, fpath in self.segments():
+            data = fpath.read_bytes()
+            offset = 0
+            while offset + self.HEADER.size <= len(data):
+                crc, length, key, pageid, page_lsn = self.HEADER.unpack_from(data, offset)
+                end = offset + self.HEADER.size + length
+                if end > len(data) or zlib.crc32(data[offset + 4 : end]) != crc:
+                    break
+                yield WalRecord(key, pageid, page_lsn, data[offset + self.HEADER.size : end])
+                offset = end
+
+            if offset != len(data):
+                logger.warning(f"wal segment {seq} ends with a torn record, {len(data) - offset} bytes dropped")
+
+    # start a new segment after the existing ones
+    def open(self) -> None:
+        segments = self.segments()
+        self._open_segment(segments[-1][0] + 1 if segments else 0)
+
+    def _open_segment(self, seq: int) -> None:
+        flags = os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, "O_BINARY", 0)
+        self._fd = os.open(self._segment_fpath(seq), flags)
+        self._seq = seq
+        self._segment_bytes = 0
+
+    # the returned future is done once the record is durable
+    def append(self, key: int, pageid: int, page_lsn: int, data: bytes) -> asyncio.Future:
+        body = self.HEADER.pack(0, len(data), key, pageid, page_lsn)[4:] + data
+        self._buf += zlib.crc32(body).to_bytes(4, "little")
+        self._buf += body
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        if self._writer_task is None:
+            self._writer_task = asyncio.create_task(self._run_writer())
+        self._wakeup.set()
+        return fut
+
+    # group commit: the records appended while the last batch was written go out together
+    async def _run_writer(self) -> None:
+        while 1:
+            await self._wakeup.wait()
+            if self.config.commit_delay:
+                await asyncio.sleep(self.config.commit_delay / 1000)
+            self._wakeup.clear()
+
+            buf, waiters = self._buf, self._waiters
+            self._buf, self._waiters = bytearray(), []
+            self._committing = waiters
+            try:
+                async with self._lock:
+                    await self._scheduler.run(self._write, self._fd, buf)
+                    self._segment_bytes += len(buf)
+            except Exception as exc:
+                logger.error(f"wal write failed: {exc!r}")
+                for fut in waiters:
+                    if not fut.done():
+                        fut.set_exception(exc)
+                continue
+
+            for fut in waiters:
+                if not fut.done():
+                    fut.set_result(None)
+            await self._emit("commit", len(waiters), len(buf))
+
+    def _write(self, fd: int, buf: bytearray) -> None:
+        view = memoryview(buf)
+        while view:
+            view = view[os.write(fd, view) :]
+        if self.config.fsync:
+            getattr(os, "fdatasync", os.fsync)(fd)
+
+    # the records appended from now on go to a new segment,
+    # returns its seq for remove_segments_before() once the pages are on disk
+    async def roll(self) -> int:
+        async with self._lock:
+            if self._segment_bytes == 0:
+                return self._seq
+            os.close(self._fd)  # type: ignore
+            self._open_segment(self._seq + 1)
+            return self._seq
+
+    def remove_segments_before(self, seq: int) -> None:
+        for segment_seq, fpath in self.segments():
+            if segment_seq < seq:
+                fpath.unlink()
+
+    async def close(self) -> None:
+        if self._writer_task is not None:
+            while self._waiters or self._committing:
+                await asyncio.gather(*self._waiters, *self._committing, return_exceptions=True)
+                self._committing = [fut for fut in self._committing if not fut.done()]
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                ...
+            self._writer_task = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
@@ -8,6 +8,7 @@ from starlette.middleware.trustedhost import TrustedHostMiddleware
 from starlette.middleware.cors import CORSMiddleware
 from prometheus_client import make_asgi_app
 
+from xxdb.engine.buffer import BufferPool
 from xxdb.engine.db import DB, create as db_create
 from .config import AppConfig as AppConfig
 from .database import DATABASE
@@ -59,6 +60,10 @@ def create_app(config: AppConfig) -> Starlette:
 
     app.mount("/rest", rest_router)
 
+    shared_buffer_pool = None
+    if config.shared_buffer_pool is not None:
+        shared_buffer_pool = BufferPool(config.shared_buffer_pool)
+
     for db in config.databases:
         if db.path:
             meta_dpath = Path(db.path)
@@ -71,8 +76,9 @@ def create_app(config: AppConfig) -> Starlette:
         else:
             raise Exception()
 
-        db_instance = DB(db.name, meta_dpath, db.settings)
+        db_instance = DB(db.name, meta_dpath, db.settings, shared_buffer_pool)
         DATABASE[db.name] = db_instance
+        app.add_event_handler("startup", db_instance.init)
         app.add_event_handler("startup", partial(flush_db_periodically, db_instance, db.flush_period))
         app.add_event_handler("shutdown", partial(close_db, db_instance))
         assert db_instance.data_schemas is not None
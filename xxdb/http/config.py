@@ -1,6 +1,8 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
-from xxdb.engine.config import InstanceSettings
+from xxdb.engine.config import InstanceSettings, BufferPoolConfig
 
 
 class DbSettings(BaseModel):
@@ -9,7 +11,8 @@ class DbSettings(BaseModel):
     path: str = ''
     cfg: str = ''
     settings: InstanceSettings = InstanceSettings()
-    flush_period: int = 5  # in seconds
+    # in seconds, with settings.wal enabled it can be much longer
+    flush_period: int = 5
 
 
 class AppConfig(BaseModel):
@@ -17,6 +20,9 @@ class AppConfig(BaseModel):
     cors_origins: list[str] = ["*"]
     allowed_hosts: list[str] = ["*"]
     auto_create: bool = True
+    # one buffer pool (budget and replacer) for all the databases,
+    # overrides settings.buffer_pool of each database
+    shared_buffer_pool: Optional[BufferPoolConfig] = None
 
     # for debug use
     tracemalloc: bool = False
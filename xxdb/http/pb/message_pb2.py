@@ -13,7 +13,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rmessage.proto\x12\x04xxdb\".\n\x0b\x41uthRequest\x12\x0e\n\x06\x64\x62name\x18\x01 \x01(\t\x12\x0f\n\x07payload\x18\x02 \x01(\t\"\x88\x03\n\rCommonRequest\x12,\n\x07\x63ommand\x18\x01 \x01(\x0e\x32\x1b.xxdb.CommonRequest.Command\x12\'\n\x0c\x61uth_payload\x18\x02 \x01(\x0b\x32\x11.xxdb.AuthRequest\x12\x33\n\x0bget_payload\x18\x03 \x01(\x0b\x32\x1e.xxdb.CommonRequest.GetRequest\x12\x33\n\x0bput_payload\x18\x04 \x01(\x0b\x32\x1e.xxdb.CommonRequest.PutRequest\x12\x37\n\x0f\x62ulkput_payload\x18\x05 \x03(\x0b\x32\x1e.xxdb.CommonRequest.PutRequest\x1a\x19\n\nGetRequest\x12\x0b\n\x03key\x18\x01 \x01(\t\x1a(\n\nPutRequest\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x0c\"8\n\x07\x43ommand\x12\r\n\tHEARTBEAT\x10\x00\x12\x07\n\x03GET\x10\x03\x12\x07\n\x03PUT\x10\x04\x12\x0c\n\x08\x42ULK_PUT\x10\x05\"\xa8\x01\n\x0e\x43ommonResponse\x12+\n\x06status\x18\x01 \x01(\x0e\x32\x1b.xxdb.CommonResponse.Status\x12\x14\n\x0c\x61uth_payload\x18\x02 \x01(\t\x12\x15\n\rerror_payload\x18\x03 \x01(\t\x12\x13\n\x0bget_payload\x18\x04 \x01(\x0c\"\'\n\x06Status\x12\x06\n\x02OK\x10\x00\x12\n\n\x06\x46\x41ILED\x10\x01\x12\t\n\x05\x45RROR\x10\x02\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rmessage.proto\x12\x04xxdb\".\n\x0b\x41uthRequest\x12\x0e\n\x06\x64\x62name\x18\x01 \x01(\t\x12\x0f\n\x07payload\x18\x02 \x01(\t\"\x85\x04\n\rCommonRequest\x12,\n\x07\x63ommand\x18\x01 \x01(\x0e\x32\x1b.xxdb.CommonRequest.Command\x12\'\n\x0c\x61uth_payload\x18\x02 \x01(\x0b\x32\x11.xxdb.AuthRequest\x12\x33\n\x0bget_payload\x18\x03 \x01(\x0b\x32\x1e.xxdb.CommonRequest.GetRequest\x12\x33\n\x0bput_payload\x18\x04 \x01(\x0b\x32\x1e.xxdb.CommonRequest.PutRequest\x12\x37\n\x0f\x62ulkput_payload\x18\x05 \x03(\x0b\x32\x1e.xxdb.CommonRequest.PutRequest\x1a\x95\x01\n\nGetRequest\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\x0f\n\x07reverse\x18\x02 \x01(\x08\x12\r\n\x05limit\x18\x03 \x01(\r\x12\x12\n\x05\x61\x66ter\x18\x04 \x01(\x03H\x00\x88\x01\x01\x12\x12\n\x05since\x18\x05 \x01(\x03H\x01\x88\x01\x01\x12\x0f\n\x07\x63olumns\x18\x06 \x03(\t\x12\r\n\x05where\x18\x07 \x01(\tB\x08\n\x06_afterB\x08\n\x06_since\x1a(\n\nPutRequest\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x0c\"8\n\x07\x43ommand\x12\r\n\tHEARTBEAT\x10\x00\x12\x07\n\x03GET\x10\x03\x12\x07\n\x03PUT\x10\x04\x12\x0c\n\x08\x42ULK_PUT\x10\x05\"\xee\x01\n\x0e\x43ommonResponse\x12+\n\x06status\x18\x01 \x01(\x0e\x32\x1b.xxdb.CommonResponse.Status\x12\x14\n\x0c\x61uth_payload\x18\x02 \x01(\t\x12\x15\n\rerror_payload\x18\x03 \x01(\t\x12\x13\n\x0bget_payload\x18\x04 \x01(\x0c\x12\x13\n\x0b\x64\x61ta_format\x18\x05 \x01(\r\x12\x0e\n\x06\x63ursor\x18\x06 \x01(\x03\x12\r\n\x05\x66irst\x18\x07 \x01(\x03\"9\n\x06Status\x12\x06\n\x02OK\x10\x00\x12\n\n\x06\x46\x41ILED\x10\x01\x12\t\n\x05\x45RROR\x10\x02\x12\x10\n\x0cNOT_MODIFIED\x10\x03\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -24,15 +24,15 @@ if _descriptor._USE_C_DESCRIPTORS == False:
   _globals['_AUTHREQUEST']._serialized_start=23
   _globals['_AUTHREQUEST']._serialized_end=69
   _globals['_COMMONREQUEST']._serialized_start=72
-  _globals['_COMMONREQUEST']._serialized_end=464
-  _globals['_COMMONREQUEST_GETREQUEST']._serialized_start=339
-  _globals['_COMMONREQUEST_GETREQUEST']._serialized_end=364
-  _globals['_COMMONREQUEST_PUTREQUEST']._serialized_start=366
-  _globals['_COMMONREQUEST_PUTREQUEST']._serialized_end=406
-  _globals['_COMMONREQUEST_COMMAND']._serialized_start=408
-  _globals['_COMMONREQUEST_COMMAND']._serialized_end=464
-  _globals['_COMMONRESPONSE']._serialized_start=467
-  _globals['_COMMONRESPONSE']._serialized_end=635
-  _globals['_COMMONRESPONSE_STATUS']._serialized_start=596
-  _globals['_COMMONRESPONSE_STATUS']._serialized_end=635
+  _globals['_COMMONREQUEST']._serialized_end=589
+  _globals['_COMMONREQUEST_GETREQUEST']._serialized_start=340
+  _globals['_COMMONREQUEST_GETREQUEST']._serialized_end=489
+  _globals['_COMMONREQUEST_PUTREQUEST']._serialized_start=491
+  _globals['_COMMONREQUEST_PUTREQUEST']._serialized_end=531
+  _globals['_COMMONREQUEST_COMMAND']._serialized_start=533
+  _globals['_COMMONREQUEST_COMMAND']._serialized_end=589
+  _globals['_COMMONRESPONSE']._serialized_start=592
+  _globals['_COMMONRESPONSE']._serialized_end=830
+  _globals['_COMMONRESPONSE_STATUS']._serialized_start=773
+  _globals['_COMMONRESPONSE_STATUS']._serialized_end=830
 # @@protoc_insertion_point(module_scope)
@@ -32,11 +32,32 @@ class Client:
     async def close(self) -> None:
         await self._http_client.aclose()
 
+    # limit, reverse, after, columns, where: see DB.get
     @retry(stop=stop_after_attempt(2), reraise=True)
-    async def get(self, key) -> list[dict]:
+    async def get(
+        self,
+        key,
+        *,
+        limit: int | None = None,
+        reverse: bool = False,
+        after: int | None = None,
+        columns: list[str] | None = None,
+        where: str | None = None,
+    ) -> list[dict]:
         assert self._schema is not None
 
-        data = await self._common_request("get", f"/data/{key}")
+        params: dict = {}
+        if reverse:
+            params["reverse"] = "true"
+        if limit is not None:
+            params["limit"] = limit
+        if after is not None:
+            params["after"] = after
+        if columns is not None:
+            params["columns"] = ",".join(columns)
+        if where is not None:
+            params["where"] = where
+        data = await self._common_request("get", f"/data/{key}", params=params)
 
         return data
 
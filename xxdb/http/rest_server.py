@@ -37,6 +37,7 @@ async def put_data(request):
 # @router.get("/data/{dbname}/{key}")
 async def get_data(request):
     resp = {}
+    headers = None
     try:
         dbname = request.path_params['dbname']
         key = int(request.path_params['key'])
@@ -46,7 +47,32 @@ async def get_data(request):
 
         db = DATABASE[dbname]
 
-        resp = {"ok": True, "data": await db.get(key, mode="dict")}
+        # ?limit=&reverse=&after=&columns=a,b&where=, see DB.get
+        params = request.query_params
+        # the whole records of the key are tagged by the cursor (the lsn of its page)
+        plain = not any(name in params for name in ("limit", "reverse", "after", "where"))
+        etag = request.headers.get("if-none-match", "").strip('"')
+        if plain and etag.isdigit():
+            delta = await db.get_since(key, int(etag))
+            if delta is not None and delta[0] is None:
+                return Response(status_code=304, headers={"ETag": f'"{etag}"'})
+
+        result = await db.get(
+            key,
+            mode="dict",
+            limit=int(params["limit"]) if "limit" in params else None,
+            reverse=params.get("reverse", "false").lower() in ("1", "true"),
+            after=int(params["after"]) if "after" in params else None,
+            with_cursor=True,
+            columns=params["columns"].split(",") if "columns" in params else None,
+            where=params.get("where"),
+        )
+        if result is None:
+            resp = {"ok": True, "data": None}
+        else:
+            resp = {"ok": True, "data": result[0], "cursor": result[1]}
+            if plain:
+                headers = {"ETag": f'"{result[1]}"'}
 
     except Exception as e:
         resp = {
@@ -54,7 +80,7 @@ async def get_data(request):
             "detail": repr(e),
         }
 
-    return Response(json.dumps(resp), media_type="application/json")
+    return Response(json.dumps(resp), media_type="application/json", headers=headers)
 
 
 async def get_schema(request):
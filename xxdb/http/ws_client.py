@@ -1,11 +1,14 @@
 import logging
 import asyncio
+from collections import OrderedDict
 from contextlib import suppress, AsyncExitStack
+from typing import Literal
 from tenacity import retry, stop_after_attempt, wait_fixed
 
 import websockets
 
 from xxdb.engine.capped_array import CappedArray
+from xxdb.engine.disk import Page
 from xxdb.engine.schema import Schema, SchemasConfig
 from xxdb.http.pb import message_pb2 as pb
 
@@ -16,7 +19,9 @@ logger = logging.getLogger(__name__)
 class Client:
     HEARTBEAT_INTERVAL = 30
 
-    def __init__(self, dsn: str, dbname: str):
+    # cache_keys: the plain gets of this many keys (the most recent ones) are delta reads, only
+    # the records appended since the last get of the key are sent, 0 turns it off
+    def __init__(self, dsn: str, dbname: str, cache_keys: int = 1024):
         self._dbname = dbname
         # TODO: use regex to check dsn
         if dsn[-1] != '/':
@@ -28,6 +33,9 @@ class Client:
         self._schema: None | Schema = None
         self._idle_cnt = 0
         self._heartbeat_task = None
+        self._cache_keys = cache_keys
+        # key -> the cursor and the records of the last get
+        self._cache: OrderedDict[int, tuple[int, list[bytes]]] = OrderedDict()
 
     async def connect(self):
         assert self._ws is None
@@ -131,23 +139,73 @@ class Client:
 
         raise Exception("failed to send request")
 
-    async def get(self, key: int) -> list[dict] | None:
+    # limit, reverse, after, columns, where: see DB.get
+    # mode "columns": the records decoded column by column, see Schema.unpack_columns
+    async def get(
+        self,
+        key: int,
+        *,
+        limit: int | None = None,
+        reverse: bool = False,
+        after: int | None = None,
+        mode: Literal["dict", "columns"] = "dict",
+        columns: list[str] | None = None,
+        where: str | None = None,
+    ) -> list[dict] | dict | None:
         assert self._schema is not None
 
         pb_req = pb.CommonRequest()
         pb_req.command = pb.CommonRequest.Command.GET
-        pb_req.op_key = str(key)
+        pb_req.get_payload.key = str(key)
+        pb_req.get_payload.reverse = reverse
+        if limit is not None:
+            pb_req.get_payload.limit = limit
+        if after is not None:
+            pb_req.get_payload.after = after
+        if columns is not None:
+            pb_req.get_payload.columns.extend(columns)
+        if where is not None:
+            pb_req.get_payload.where = where
+
+        plain = limit is None and not reverse and after is None and columns is None and where is None
+        plain = plain and self._cache_keys > 0
+        cached = self._cache.get(key) if plain else None
+        if cached is not None:
+            pb_req.get_payload.since = cached[0]
 
         pb_resp = await self._common_request(pb_req)
 
-        if pb_resp.status == pb.CommonResponse.Status.OK:
-            data_list = [self._schema.unpack(data) for data in CappedArray.RetrieveFromRaw(pb_resp.get_payload)]
-            return data_list
+        if pb_resp.status == pb.CommonResponse.Status.NOT_MODIFIED and cached is not None:
+            self._cache.move_to_end(key)
+            records = cached[1]
+        elif pb_resp.status == pb.CommonResponse.Status.OK:
+            records = CappedArray.RetrieveFromRaw(pb_resp.get_payload, pb_resp.data_format or 1)
+            if cached is not None:
+                # a delta, since was sent
+                records = Page.merge_delta(*cached, records, pb_resp.first, pb_resp.cursor)
+            if plain:
+                self._cache_records(key, pb_resp.cursor, records)
         else:
             logger.debug(pb_resp.status)
             logger.debug(pb_resp.error_payload)
             return None
 
+        # the records are cut down to the columns
+        if mode == "columns":
+            return self._schema.unpack_columns(records, columns, projected=True)
+        unpack = self._schema.unpacker(columns, projected=True)
+        return [unpack(data) for data in records]
+
+    def _cache_records(self, key: int, cursor: int, records: list[bytes]) -> None:
+        if cursor == 0:
+            # no such key
+            self._cache.pop(key, None)
+            return
+        self._cache[key] = (cursor, records)
+        self._cache.move_to_end(key)
+        if len(self._cache) > self._cache_keys:
+            self._cache.popitem(last=False)
+
     async def put(
         self,
         key: int,
@@ -157,9 +215,9 @@ class Client:
     ) -> bool:
         pb_req = pb.CommonRequest()
         pb_req.command = pb.CommonRequest.Command.PUT
-        pb_req.op_key = str(key)
+        pb_req.put_payload.key = str(key)
         assert self._schema is not None
-        pb_req.put_payload = self._schema.pack(value, schema=schema)
+        pb_req.put_payload.value = self._schema.pack(value, schema=schema)
 
         pb_resp = await self._common_request(pb_req)
 
@@ -1,4 +1,3 @@
-import asyncio
 import logging
 from functools import partial
 
@@ -60,7 +59,13 @@ async def ws_handler(ws, db: DB):
             pb_resp.error_payload = "parse request failed"
 
         else:
-            pb_resp = await _process_cmd(pb_req, db)
+            try:
+                pb_resp = await _process_cmd(pb_req, db)
+            except Exception as exc:
+                # a bad request (a predicate that does not parse, an unknown column), not the connection
+                pb_resp = pb.CommonResponse()
+                pb_resp.status = pb.CommonResponse.Status.ERROR
+                pb_resp.error_payload = repr(exc)
 
         await ws.send_bytes(pb_resp.SerializeToString())
 
@@ -73,15 +78,36 @@ async def _process_cmd(pb_req, db) -> pb.CommonResponse:
         await db.put(key, pb_req.put_payload.value)
         pb_resp.status = pb.CommonResponse.Status.OK
 
-    if pb_req.command == pb_req.Command.BULK_PUT:
-        await asyncio.gather(
-            *[db.put(int(put_payload.key), put_payload.value) for put_payload in pb_req.bulkput_payload]
-        )
+    elif pb_req.command == pb_req.Command.BULK_PUT:
+        await db.put_many([(int(put_payload.key), put_payload.value) for put_payload in pb_req.bulkput_payload])
+        pb_resp.status = pb.CommonResponse.Status.OK
 
     elif pb_req.command == pb_req.Command.GET:
-        data = await db.get(int(pb_req.op_key), mode="raw")
-        pb_resp.status = pb.CommonResponse.Status.OK
-        pb_resp.get_payload = data
+        get_req = pb_req.get_payload
+        pb_resp.data_format = db.data_format
+        if get_req.HasField("since"):
+            delta = await db.get_since(int(get_req.key), get_req.since, mode="raw")
+            pb_resp.status = pb.CommonResponse.Status.OK
+            if delta is not None:
+                data, pb_resp.first, pb_resp.cursor = delta
+                if data is None:
+                    pb_resp.status = pb.CommonResponse.Status.NOT_MODIFIED
+                else:
+                    pb_resp.get_payload = data
+        else:
+            result = await db.get(
+                int(get_req.key),
+                mode="raw",
+                limit=get_req.limit or None,
+                reverse=get_req.reverse,
+                after=get_req.after if get_req.HasField("after") else None,
+                with_cursor=True,
+                columns=list(get_req.columns) or None,
+                where=get_req.where or None,
+            )
+            pb_resp.status = pb.CommonResponse.Status.OK
+            if result is not None:
+                pb_resp.get_payload, pb_resp.cursor = result
 
     elif pb_req.command == pb_req.Command.HEARTBEAT:
         pb_resp.status = pb.CommonResponse.Status.OK